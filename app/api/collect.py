@@ -1,26 +1,81 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from app.db.session import get_db
-from app.db.models import Run, Video, Template
-from app.services.youtube_collector import collect_youtube_data
-from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
+from fastapi.responses import StreamingResponse
+from collections import Counter
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy import desc, func, select
+from app.db.session import get_async_db, AsyncSessionLocal
+from app.db.models import Run, RunVideo, Template, Batch, BatchItem
+from app.db.bulk import run_videos_query
+from app.services.job_queue import enqueue_run, retry_run, RUN_STAGES
+from app.services.status_cache import status_cache, CachedStatus, TERMINAL_STATUSES, FINISHED_STATUSES, etag_matches
+from app.services.events import get_event_broker
+from app.services.popularity import get_popularity_tracker
+from app.services import cache_policy
+from app.core.metrics import cache_result, CACHE_REQUESTS, KEYWORD_CACHE_MATCHES
+from app.core.config import settings
+from app.utils.keywords import normalize_keyword, normalize_locale
+import asyncio
+import json
 import uuid
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional
 
 router = APIRouter()
 
 class CollectRequest(BaseModel):
-    keyword: str
+    keyword: str = Field(min_length=1)
+    hl: str = "id"
+    gl: str = "ID"
     force_refresh: bool = False
+    mode: Optional[Literal["browser", "http"]] = None  # default: settings.COLLECT_MODE
 
 class CollectResponse(BaseModel):
     job_id: uuid.UUID
     status: str
     cached: bool
+    coalesced: bool = False  # attached to an already queued/running run for the same keyword
+    # Freshness of a cached result: age in seconds, stale = older than the keyword's TTL,
+    # refreshing = a background run (refresh_job_id) will replace it
+    age: Optional[int] = None
+    stale: bool = False
+    refreshing: bool = False
+    refresh_job_id: Optional[uuid.UUID] = None
+    matched_keyword: Optional[str] = None  # keyword of the cached run when it was written differently
     result: Optional[dict] = None
 
+class RetryResponse(BaseModel):
+    job_id: uuid.UUID
+    status: str
+    resume_stages: List[str]  # stages the retry will run; the others keep their saved results
+
+class BatchCollectRequest(BaseModel):
+    keywords: List[str] = Field(..., min_length=1)
+    hl: str = "id"
+    gl: str = "ID"
+    force_refresh: bool = False
+    parallelism: Optional[int] = None  # parallel contexts in the shared session
+    mode: Optional[Literal["browser", "http"]] = None  # default: settings.COLLECT_MODE
+
+class BatchItemObject(BaseModel):
+    keyword: str
+    job_id: uuid.UUID
+    status: str
+    cached: bool
+    coalesced: bool
+    stale: bool = False  # cached result past its TTL, a refresh run was enqueued
+
+class BatchCollectResponse(BaseModel):
+    batch_id: uuid.UUID
+    items: List[BatchItemObject]
+
+class BatchStatusResponse(BaseModel):
+    batch_id: uuid.UUID
+    status: str  # running, success, partial, failed
+    total: int
+    counts: Dict[str, int]
+    items: List[BatchItemObject]
+
 class VideoObject(BaseModel):
     source: str
     rank: int
@@ -44,82 +99,327 @@ class StatusResponse(BaseModel):
     status: str
     hl: str
     gl: str
+    mode: str = "browser"
     search_top: List[VideoObject]
     people_also_watched_top: List[VideoObject]
     related_fallback_top: List[VideoObject]
     templates: List[TemplateObject]
     error_message: Optional[str]
+    stages_completed: List[str] = []
 
 @router.post("/collect/youtube", response_model=CollectResponse)
 async def trigger_collection(
     req: CollectRequest, 
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # Check cache (24 hours)
+    # Whitespace or zero-width characters only: would coalesce every such request onto one empty search
+    if not normalize_keyword(req.keyword):
+        raise HTTPException(status_code=400, detail="No keyword given")
+
+    # Every request counts towards the keyword's popularity (the cache warmer keeps popular ones fresh)
+    get_popularity_tracker().record(req.keyword, req.hl, req.gl)
+
+    # Check cache: newest successful run within the hard max age, by canonical keyword (or fuzzy)
     if not req.force_refresh:
-        yesterday = datetime.utcnow() - timedelta(hours=24)
-        cached_run = db.query(Run).filter(
-            Run.keyword == req.keyword,
-            Run.status == "success",
-            Run.finished_at >= yesterday
-        ).order_by(desc(Run.finished_at)).first()
-
-        if cached_run:
-            # Build result for cached response
-            return CollectResponse(
-                job_id=cached_run.id,
-                status="success",
-                cached=True,
-                result=construct_status_response(cached_run, db).dict()
+        cached_run, match = await cache_policy.find_cached_run(db, req.keyword, req.hl, req.gl)
+
+        status = await load_status(db, cached_run.id) if cached_run else None
+        if status is None:
+            cache_result("run", False)
+        else:
+            fresh = cache_policy.freshness(req.keyword, cached_run.finished_at, cache_policy.max_search_views(status.body))
+            refresh_job_id = None
+            if fresh.stale:
+                # Stale-while-revalidate: answer with the old result now and enqueue one
+                # refresh (concurrent stale hits coalesce onto the same in-flight run)
+                refresh, _ = await enqueue_run(
+                    db, req.keyword, hl=req.hl, gl=req.gl, coalesce=True, mode=req.mode, trigger="refresh"
+                )
+                refresh_job_id = refresh.id
+            CACHE_REQUESTS.labels(cache="run", result="stale" if fresh.stale else "hit").inc()
+
+            # Cached response: splice the pre-serialized status into the envelope
+            envelope = CollectResponse(
+                job_id=cached_run.id, status="success", cached=True, age=int(fresh.age),
+                stale=fresh.stale, refreshing=refresh_job_id is not None, refresh_job_id=refresh_job_id,
+                matched_keyword=cached_run.keyword if match != "raw" else None,
             )
+            body = envelope.model_dump_json(exclude={"result"})[:-1].encode() + b',"result":' + status.body + b"}"
+            return Response(content=body, media_type="application/json", headers={"Age": str(int(fresh.age))})
 
-    # Create new run
-    new_run = Run(
-        keyword=req.keyword,
-        status="queued"
+    # Create new run (or join the in-flight one); a worker process (app/worker.py)
+    # claims it from the queue. force_refresh always starts a new run.
+    run, coalesced = await enqueue_run(
+        db, req.keyword, hl=req.hl, gl=req.gl, coalesce=not req.force_refresh, mode=req.mode
     )
-    db.add(new_run)
-    db.commit()
-    db.refresh(new_run)
-    
-    # Enqueue background task
-    background_tasks.add_task(collect_youtube_data, new_run.id, req.keyword)
     
     return CollectResponse(
-        job_id=new_run.id,
-        status="queued",
-        cached=False
+        job_id=run.id,
+        status=run.status,
+        cached=False,
+        coalesced=coalesced
     )
 
-@router.get("/collect/status/{job_id}", response_model=StatusResponse)
-def get_status(job_id: uuid.UUID, db: Session = Depends(get_db)):
-    run = db.query(Run).filter(Run.id == job_id).first()
+@router.post("/collect/retry/{job_id}", response_model=RetryResponse)
+async def retry_collection(job_id: uuid.UUID, db: AsyncSession = Depends(get_async_db)):
+    """Requeues a partial run; only the stages that did not finish are run again."""
+    run = await db.get(Run, job_id)
     if not run:
         raise HTTPException(status_code=404, detail="Job not found")
-    
-    return construct_status_response(run, db)
+    resume_stages = [s for s in RUN_STAGES if s not in (run.stages_completed or [])]
+    if not await retry_run(db, job_id):
+        raise HTTPException(status_code=409, detail=f"Only partial runs can be retried (status: {run.status})")
+    return RetryResponse(job_id=job_id, status="queued", resume_stages=resume_stages)
+
+@router.get("/collect/status/{job_id}", response_model=StatusResponse)
+async def get_status(
+    job_id: uuid.UUID,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    status = await load_status(db, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    headers = {"ETag": status.etag}
+    if etag_matches(if_none_match, status.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=status.body, media_type="application/json", headers=headers)
+
+@router.get("/collect/stream/{job_id}")
+async def stream_status(job_id: uuid.UUID):
+    """
+    Server-sent events for one run, instead of polling /collect/status:
+    a `snapshot` event (the full StatusResponse) first, then `status`, `video` and
+    `template` events as the worker produces them, and a final `snapshot` when the
+    run finishes, after which the stream closes. If the run disappears meanwhile, an
+    `error` event ends the stream instead. Videos may show up twice
+    (in a snapshot and as an event); clients should key them by video_id.
+    """
+    async with AsyncSessionLocal() as db:
+        current = await db.scalar(select(Run.status).where(Run.id == job_id))
+    if current is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return StreamingResponse(
+        _event_stream(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _sse(event: str, data: bytes) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + data + b"\n\n"
+
+async def _snapshot(job_id: uuid.UUID) -> Optional[CachedStatus]:
+    # Short-lived session: an open stream must not hold a DB connection
+    async with AsyncSessionLocal() as db:
+        return await load_status(db, job_id)
+
+# Final event when the run disappears (deleted, expired by retention) while it is streamed
+_GONE = _sse("error", b'{"detail": "Job not found"}')
+
+async def _event_stream(job_id: uuid.UUID):
+    # Subscribe before taking the snapshot so nothing published in between is lost
+    async with get_event_broker().subscribe(job_id) as queue:
+        status = await _snapshot(job_id)
+        if status is None:
+            yield _GONE
+            return
+        yield _sse("snapshot", status.body)
+        if json.loads(status.body)["status"] in FINISHED_STATUSES:
+            return
+
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.STREAM_PING_INTERVAL)
+            except asyncio.TimeoutError:
+                # Quiet for a while: keep the connection open, and catch a terminal
+                # transition whose event was missed (requeue reaper, dropped NOTIFY)
+                async with AsyncSessionLocal() as db:
+                    current = await db.scalar(select(Run.status).where(Run.id == job_id))
+                if current is None:
+                    yield _GONE
+                    return
+                if current in FINISHED_STATUSES:
+                    status = await _snapshot(job_id)
+                    yield _sse("snapshot", status.body) if status else _GONE
+                    return
+                yield b": ping\n\n"
+                continue
+
+            yield _sse(event["type"], json.dumps(event["data"], ensure_ascii=False).encode())
+            if event["type"] == "status" and event["data"] and event["data"].get("status") in FINISHED_STATUSES:
+                status = await _snapshot(job_id)
+                yield _sse("snapshot", status.body) if status else _GONE
+                return
+
+async def load_status(db: AsyncSession, job_id: uuid.UUID) -> Optional[CachedStatus]:
+    """
+    Serialized StatusResponse for a run. Finished runs never change, so their
+    response is built once and then served from the in-process LRU, for up to
+    STATUS_CACHE_TTL_SECONDS (the video metadata comes from the shared videos rows).
+    """
+    cached = status_cache.get(job_id)
+    cache_result("status", cached is not None)
+    if cached is not None:
+        return cached
+
+    result = await db.execute(
+        select(Run)
+        .options(selectinload(Run.templates))
+        .where(Run.id == job_id)
+    )
+    run = result.scalars().first()
+    if not run:
+        return None
+    # Loaded separately: the pruned query only touches the partitions since the run started
+    videos = (await db.execute(run_videos_query(run.id, run.started_at))).scalars().all()
+
+    status = CachedStatus(construct_status_response(run, videos).model_dump_json().encode())
+    if run.status in TERMINAL_STATUSES:
+        status_cache.put(run.id, status)
+    return status
+
+@router.post("/collect/youtube/batch", response_model=BatchCollectResponse)
+async def trigger_batch_collection(
+    req: BatchCollectRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    if len(req.keywords) > settings.BATCH_MAX_KEYWORDS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BATCH_MAX_KEYWORDS} keywords per batch")
+    parallelism = min(req.parallelism or settings.BATCH_PARALLELISM, settings.BATCH_MAX_PARALLELISM)
+    if parallelism < 1:
+        raise HTTPException(status_code=400, detail="parallelism must be at least 1")
+
+    # Same keyword twice in one batch -> one job
+    keywords = {}  # canonical key -> keyword as first written
+    for keyword in req.keywords:
+        key = normalize_keyword(keyword)
+        if key and key not in keywords:
+            keywords[key] = keyword
+    if not keywords:
+        raise HTTPException(status_code=400, detail="No keywords given")
+    hl, gl = normalize_locale(req.hl, req.gl)
+    tracker = get_popularity_tracker()
+    for keyword in keywords.values():
+        tracker.record(keyword, hl, gl)
+
+    # Cache hits are resolved right away, in one query for the whole batch;
+    # stale ones are served too, with a refresh enqueued outside the batch
+    cached = {}
+    stale = set()
+    if not req.force_refresh:
+        result = await db.execute(
+            select(Run.keyword_key, Run.id, Run.finished_at, Run.keyword)
+            .where(
+                Run.keyword_key.in_(list(keywords)),
+                Run.hl == hl,
+                Run.gl == gl,
+                Run.status == "success",
+                Run.finished_at >= cache_policy.max_age_cutoff()
+            )
+            .distinct(Run.keyword_key)
+            .order_by(Run.keyword_key, desc(Run.finished_at))
+        )
+        hits = result.all()
+        cached = {key: run_id for key, run_id, _, _ in hits}
+        cache_result("run", False, len(keywords) - len(cached))
+        for key, _, _, run_keyword in hits:
+            KEYWORD_CACHE_MATCHES.labels(match="raw" if run_keyword == keywords[key] else "canonical").inc()
+        KEYWORD_CACHE_MATCHES.labels(match="miss").inc(len(keywords) - len(cached))
+
+        max_views = {}
+        if hits:
+            views = await db.execute(
+                select(RunVideo.run_id, func.max(RunVideo.views_num))
+                .where(RunVideo.run_id.in_(list(cached.values())), RunVideo.source_type == "search")
+                .group_by(RunVideo.run_id)
+            )
+            max_views = dict(views.all())
+        for key, run_id, finished_at, _ in hits:
+            if cache_policy.freshness(key, finished_at, max_views.get(run_id)).stale:
+                stale.add(key)
+                await enqueue_run(db, keywords[key], hl=hl, gl=gl, coalesce=True, mode=req.mode, trigger="refresh")
+        cache_result("run", True, len(cached) - len(stale))
+        if stale:
+            CACHE_REQUESTS.labels(cache="run", result="stale").inc(len(stale))
+
+    batch = Batch(hl=hl, gl=gl, parallelism=parallelism)
+    db.add(batch)
+    await db.commit()
+
+    items = []
+    for position, (key, keyword) in enumerate(keywords.items()):
+        if key in cached:
+            item = BatchItem(batch_id=batch.id, position=position, keyword=keyword,
+                             run_id=cached[key], cached=True, coalesced=False)
+            status = "success"
+        else:
+            # Workers claim the batch's runs together and scrape them through one session
+            run, coalesced = await enqueue_run(
+                db, keyword, hl=hl, gl=gl, coalesce=not req.force_refresh, batch_id=batch.id, mode=req.mode
+            )
+            item = BatchItem(batch_id=batch.id, position=position, keyword=keyword,
+                             run_id=run.id, cached=False, coalesced=coalesced)
+            status = run.status
+        db.add(item)
+        items.append(BatchItemObject(keyword=keyword, job_id=item.run_id, status=status,
+                                     cached=item.cached, coalesced=item.coalesced, stale=key in stale))
+    await db.commit()
+
+    return BatchCollectResponse(batch_id=batch.id, items=items)
+
+@router.get("/collect/batch/{batch_id}", response_model=BatchStatusResponse)
+async def get_batch_status(batch_id: uuid.UUID, db: AsyncSession = Depends(get_async_db)):
+    batch = await db.get(Batch, batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    result = await db.execute(
+        select(BatchItem, Run.status)
+        .join(Run, Run.id == BatchItem.run_id)
+        .where(BatchItem.batch_id == batch_id)
+        .order_by(BatchItem.position)
+    )
+    items = [
+        BatchItemObject(keyword=item.keyword, job_id=item.run_id, status=status,
+                        cached=item.cached, coalesced=item.coalesced)
+        for item, status in result.all()
+    ]
+    counts = Counter(item.status for item in items)
+
+    if counts["queued"] or counts["running"]:
+        status = "running"
+    elif counts["success"] == len(items):
+        status = "success"
+    elif counts["success"] or counts["partial"]:
+        status = "partial"
+    else:
+        status = "failed"
+
+    return BatchStatusResponse(batch_id=batch.id, status=status, total=len(items),
+                               counts=dict(counts), items=items)
 
-def construct_status_response(run: Run, db: Session) -> StatusResponse:
-    # Fetch videos/templates (handled by relationship ideally, but explicit query safe)
-    # Using relationship defined in models: run.videos, run.templates
+def construct_status_response(run: Run, videos: List[RunVideo]) -> StatusResponse:
+    # run.templates must be eager-loaded (selectinload) and videos come with their
+    # Video joined (run_videos_query): lazy loading is not available on an AsyncSession
     
     search_top = []
     people_also_watched = []
     related_fallback = []
     
-    for v in run.videos:
+    for v in videos:
         vo = VideoObject(
             source=v.source_type,
             rank=v.rank,
-            title=v.title,
-            channel_name=v.channel_name,
+            title=v.video.title,
+            channel_name=v.video.channel_name,
             video_id=v.video_id,
-            video_url=v.video_url,
+            video_url=v.video.video_url,
             views_raw=v.views_raw,
             views_num=v.views_num,
-            published_raw=v.published_raw,
-            duration_raw=v.duration_raw
+            published_raw=v.video.published_raw,
+            duration_raw=v.video.duration_raw
         )
         if v.source_type == "search":
             search_top.append(vo)
@@ -147,9 +447,11 @@ def construct_status_response(run: Run, db: Session) -> StatusResponse:
         status=run.status,
         hl=run.hl,
         gl=run.gl,
+        mode=run.mode or "browser",
         search_top=search_top,
         people_also_watched_top=people_also_watched,
         related_fallback_top=related_fallback,
         templates=templates,
-        error_message=run.error_message
+        error_message=run.error_message,
+        stages_completed=run.stages_completed or []
     )
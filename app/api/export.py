@@ -0,0 +1,262 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from app.db.session import AsyncSessionLocal
+from app.db.models import Run, RunVideo, Video, Template
+from app.core.config import settings
+from app.core.metrics import EXPORT_ROWS
+from app.utils.keywords import normalize_keyword, normalize_locale
+from datetime import datetime, timezone
+from typing import List, Literal, Optional
+import csv
+import io
+import json
+
+router = APIRouter()
+
+# Exported columns per dataset: (name, SQL expression, kind); kind picks the
+# text form (ndjson/csv) and the Parquet type
+RUN_COLUMNS = (
+    ("run_id", Run.id, "str"),
+    ("keyword", Run.keyword, "str"),
+    ("keyword_key", Run.keyword_key, "str"),
+    ("hl", Run.hl, "str"),
+    ("gl", Run.gl, "str"),
+    ("status", Run.status, "str"),
+    ("mode", Run.mode, "str"),
+    ("trigger", Run.trigger, "str"),
+    ("started_at", Run.started_at, "time"),
+    ("finished_at", Run.finished_at, "time"),
+    ("error_message", Run.error_message, "str"),
+    ("attempts", Run.attempts, "int"),
+    ("stages_completed", Run.stages_completed, "json"),
+    ("stage_timings", Run.stage_timings, "json"),
+    ("metrics", Run.metrics, "json"),
+    ("batch_id", Run.batch_id, "str"),
+)
+VIDEO_COLUMNS = (
+    ("run_id", RunVideo.run_id, "str"),
+    ("keyword", Run.keyword, "str"),
+    ("hl", Run.hl, "str"),
+    ("gl", Run.gl, "str"),
+    ("source_type", RunVideo.source_type, "str"),
+    ("rank", RunVideo.rank, "int"),
+    ("video_id", RunVideo.video_id, "str"),
+    ("title", Video.title, "str"),
+    ("channel_name", Video.channel_name, "str"),
+    ("video_url", Video.video_url, "str"),
+    ("views_raw", RunVideo.views_raw, "str"),
+    ("views_num", RunVideo.views_num, "int"),
+    ("published_raw", Video.published_raw, "str"),
+    ("duration_raw", Video.duration_raw, "str"),
+    ("collected_from", RunVideo.collected_from, "str"),
+    ("collected_at", RunVideo.created_at, "time"),
+)
+TEMPLATE_COLUMNS = (
+    ("run_id", Template.run_id, "str"),
+    ("keyword", Run.keyword, "str"),
+    ("hl", Run.hl, "str"),
+    ("gl", Run.gl, "str"),
+    ("template_text", Template.template_text, "str"),
+    ("example_1", Template.example_1, "str"),
+    ("example_2", Template.example_2, "str"),
+    ("created_at", Template.created_at, "time"),
+)
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # asyncpg would read a naive datetime bound to timestamptz in the server's local time zone
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def export_query(
+    dataset: str,
+    keyword: Optional[str] = None,
+    hl: Optional[str] = None,
+    gl: Optional[str] = None,
+    status: Optional[List[str]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """
+    (columns, select) of a dataset; filters apply to the run (keyword by canonical key, started_at range).
+    since/until without a UTC offset are taken as UTC.
+    """
+    since, until = _as_utc(since), _as_utc(until)
+    if dataset == "runs":
+        columns = RUN_COLUMNS
+        stmt = select(*[expr for _, expr, _ in columns])
+    elif dataset == "videos":
+        columns = VIDEO_COLUMNS
+        stmt = (
+            select(*[expr for _, expr, _ in columns])
+            .select_from(RunVideo)
+            .join(Video, Video.video_id == RunVideo.video_id)
+            .join(Run, Run.id == RunVideo.run_id)
+        )
+        if since is not None:
+            # A run's rows are never older than the run: skips run_videos partitions before `since`
+            stmt = stmt.where(RunVideo.created_at >= since)
+    else:
+        columns = TEMPLATE_COLUMNS
+        stmt = select(*[expr for _, expr, _ in columns]).join(Run, Run.id == Template.run_id)
+
+    if keyword:
+        stmt = stmt.where(Run.keyword_key == normalize_keyword(keyword))
+    hl, gl = normalize_locale(hl, gl)
+    if hl:
+        stmt = stmt.where(Run.hl == hl)
+    if gl:
+        stmt = stmt.where(Run.gl == gl)
+    if status:
+        stmt = stmt.where(Run.status.in_(status))
+    if since is not None:
+        stmt = stmt.where(Run.started_at >= since)
+    if until is not None:
+        stmt = stmt.where(Run.started_at < until)
+    return columns, stmt
+
+
+def _text_value(kind: str, value):
+    if value is None:
+        return None
+    if kind == "time":
+        return value.isoformat()
+    if kind == "json":
+        return json.dumps(value, ensure_ascii=False)
+    if kind == "str":
+        return str(value)
+    return value
+
+
+def _ndjson(columns, rows) -> bytes:
+    lines = []
+    for row in rows:
+        record = {}
+        for (name, _, kind), value in zip(columns, row):
+            # JSONB columns stay nested objects here
+            record[name] = value if kind == "json" else _text_value(kind, value)
+        lines.append(json.dumps(record, ensure_ascii=False))
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _csv(columns, rows, header: bool = False) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow([name for name, _, _ in columns])
+    for row in rows:
+        writer.writerow(["" if value is None else _text_value(kind, value) for (_, _, kind), value in zip(columns, row)])
+    return buf.getvalue().encode()
+
+
+class _ChunkSink:
+    """Write-only file for ParquetWriter that hands out what was written since the last drain()."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # Parquet footers hold absolute offsets: count everything ever written
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+async def _rows(stmt):
+    """
+    Batches of rows from a server-side cursor (EXPORT_BATCH_SIZE rows per fetch).
+    Holds a connection and its transaction until the export is done.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=settings.EXPORT_BATCH_SIZE))
+        async for partition in result.partitions():
+            yield partition
+
+
+async def _text_stream(dataset: str, fmt: str, columns, stmt):
+    if fmt == "csv":
+        yield _csv(columns, [], header=True)
+    async for partition in _rows(stmt):
+        yield _ndjson(columns, partition) if fmt == "ndjson" else _csv(columns, partition)
+        EXPORT_ROWS.labels(dataset=dataset, format=fmt).inc(len(partition))
+
+
+async def _parquet_stream(dataset: str, columns, stmt):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {"str": pa.string(), "int": pa.int64(), "time": pa.timestamp("us", tz="UTC"), "json": pa.string()}
+    schema = pa.schema([(name, types[kind]) for name, _, kind in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="zstd")
+    try:
+        # One row group per fetched batch, sent as soon as it is written
+        async for partition in _rows(stmt):
+            batch = {
+                name: [value if kind in ("int", "time") else _text_value(kind, value) for value in values]
+                for (name, _, kind), values in zip(columns, zip(*partition))
+            }
+            writer.write_table(pa.Table.from_pydict(batch, schema=schema))
+            EXPORT_ROWS.labels(dataset=dataset, format="parquet").inc(len(partition))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+@router.get("/export/{dataset}")
+async def export(
+    dataset: Literal["runs", "videos", "templates"],
+    format: Literal["ndjson", "csv", "parquet"] = "ndjson",
+    keyword: Optional[str] = None,
+    hl: Optional[str] = None,
+    gl: Optional[str] = None,
+    status: Optional[List[str]] = Query(None),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """
+    Bulk export instead of one /collect/status call per run: streams every run,
+    collected video or template matching the filters (runs started in [since, until),
+    keyword matched by its canonical form, repeatable `status`), in no particular order.
+    Rows are fetched from a server-side cursor in batches of EXPORT_BATCH_SIZE, so memory
+    stays flat however large the export is. Parquet needs pyarrow installed.
+    """
+    if format == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Parquet export needs pyarrow (pip install pyarrow)")
+
+    columns, stmt = export_query(dataset, keyword, hl, gl, status, since, until)
+    body = _parquet_stream(dataset, columns, stmt) if format == "parquet" else _text_stream(dataset, format, columns, stmt)
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{format}"'},
+    )
@@ -0,0 +1,74 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
+from app.db.session import get_async_db
+from app.db.models import Run, RunVideo, Video
+from app.core.config import settings
+from app.utils.keywords import normalize_keyword, normalize_locale
+from datetime import datetime, timedelta, timezone
+from pydantic import BaseModel
+from typing import List, Optional
+import asyncio
+
+router = APIRouter()
+
+class NgramObject(BaseModel):
+    ngram: str
+    n: int
+    count: int
+    weighted: float
+
+class SkeletonObject(BaseModel):
+    skeleton: str
+    count: int
+    weighted: float
+
+class PatternResponse(BaseModel):
+    keyword: Optional[str]
+    days: int
+    titles: int
+    ngrams: List[NgramObject]
+    skeletons: List[SkeletonObject]
+
+@router.get("/patterns", response_model=PatternResponse)
+async def get_patterns(
+    keyword: Optional[str] = None,
+    hl: str = "id",
+    gl: str = "ID",
+    days: int = Query(30, ge=1),
+    limit: int = Query(30, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Winning-title patterns mined locally (no LLM) from stored titles of successful runs:
+    n-grams and skeleton templates weighted by views. Without a keyword, across all runs.
+    At most PATTERN_MAX_TITLES titles are mined, the most recently collected ones.
+    """
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    # One row per video (it shows up in many runs), with its highest seen view count
+    stmt = (
+        select(Video.title, func.max(RunVideo.views_num))
+        .join(RunVideo, RunVideo.video_id == Video.video_id)
+        .join(Run, Run.id == RunVideo.run_id)
+        # created_at is never before the run started: prunes run_videos partitions older than `days`
+        .where(Run.status == "success", Run.started_at >= since, RunVideo.created_at >= since)
+        .group_by(Video.video_id, Video.title)
+        # The cap keeps the most recently collected titles
+        .order_by(func.max(RunVideo.created_at).desc())
+        .limit(settings.PATTERN_MAX_TITLES)
+    )
+    if keyword:
+        hl, gl = normalize_locale(hl, gl)
+        stmt = stmt.where(Run.keyword_key == normalize_keyword(keyword), Run.hl == hl, Run.gl == gl)
+
+    rows = []
+    result = await db.stream(stmt.execution_options(yield_per=10000))
+    async for partition in result.partitions():
+        rows.extend(partition)
+
+    # Imported here: numpy is only needed by this endpoint, keep it out of the API's cold start
+    from app.services.pattern_mining import mine_patterns
+
+    # CPU-bound: keep it off the event loop
+    stats = await asyncio.to_thread(mine_patterns, rows, top_k=limit)
+    return PatternResponse(keyword=keyword, days=days, **stats.to_dict())
@@ -1,19 +1,151 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "YouTube Winning Pattern Detector"
     
     # Database
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 10  # persistent connections per process (async engine)
+    DB_MAX_OVERFLOW: int = 20  # extra connections allowed under burst load
+    DB_POOL_TIMEOUT: int = 10  # seconds to wait for a connection before erroring
+    DB_POOL_RECYCLE: int = 1800  # recycle connections before Supabase/pgbouncer drops them
+    READINESS_TIMEOUT: float = 2.0  # seconds /readyz waits for the DB before reporting not ready
     
     # AgentBay
     AGENTBAY_API_KEY: str
-    
+
+    # Session pool (pre-initialized AgentBay sessions with live CDP browsers)
+    SESSION_POOL_SIZE: int = 2  # 0 disables pooling: one session per run
+    SESSION_POOL_MAX_USES: int = 20  # recycle a session after this many leases
+    SESSION_POOL_IDLE_TTL: int = 600  # seconds an idle session may sit in the pool
+    SESSION_POOL_ACQUIRE_TIMEOUT: int = 120  # seconds to wait for a free session
+    SESSION_POOL_MAINTENANCE_INTERVAL: int = 30  # seconds between prune/refill passes
+
+    # Worker / job queue (claims queued runs from the runs table)
+    WORKER_CONCURRENCY: int = 2  # collections run in parallel per worker process (each run of a batch counts)
+    WORKER_POLL_INTERVAL: float = 2.0  # seconds between claims when the queue is empty
+    JOB_LEASE_SECONDS: int = 120  # a running job is requeued if its lease is not renewed
+    JOB_HEARTBEAT_INTERVAL: int = 30  # seconds between lease renewals
+    JOB_MAX_ATTEMPTS: int = 3  # expired leases beyond this mark the run failed
+    WORKER_METRICS_PORT: int = 9100  # Prometheus /metrics of the worker process (0 = disabled)
+
+    # Run progress events for GET /collect/stream/{job_id}: "postgres" (NOTIFY/LISTEN, needed
+    # when workers and API replicas are separate processes) or "memory" (single process only)
+    EVENTS_BACKEND: str = "postgres"
+    EVENTS_QUEUE_SIZE: int = 256  # buffered events per stream before a slow client starts losing them
+    STREAM_PING_INTERVAL: int = 15  # seconds between keep-alives; the run status is re-checked on each
+
+    # Keyword result cache (stale-while-revalidate, see app/services/cache_policy.py):
+    # a successful run is fresh for its TTL, then served stale (while one refresh runs)
+    # up to CACHE_MAX_AGE_SECONDS, after which requests wait for a new scrape.
+    CACHE_TTL_SECONDS: int = 86400
+    CACHE_MAX_AGE_SECONDS: int = 7 * 86400
+    CACHE_KEYWORD_TTLS: Dict[str, int] = {}  # normalized keyword -> TTL, e.g. {"berita hari ini": 3600}
+    CACHE_TIER_TTLS: Dict[str, int] = {}  # tier -> TTL, e.g. {"hot": 21600, "cold": 259200}
+    CACHE_TIER_MIN_VIEWS: Dict[str, int] = {"hot": 1_000_000, "warm": 100_000}  # top search views per tier, else "cold"
+    # Near-duplicate keywords ("resep nasi gorng") reuse a recent run when their pg_trgm
+    # similarity to its canonical keyword is at least the threshold (needs the pg_trgm extension)
+    CACHE_FUZZY_ENABLED: bool = False
+    CACHE_FUZZY_THRESHOLD: float = 0.8
+
+    # Cache warmer (app/services/cache_warmer.py): keywords requested often enough (request
+    # count decayed with POPULARITY_HALF_LIFE) are re-collected before their cached run goes
+    # stale, within a cap on concurrent warm-ups and an estimated daily spend
+    WARMER_ENABLED: bool = True
+    WARMER_INTERVAL: int = 60  # seconds between warmer passes (in the workers, one at a time)
+    WARMER_TOP_KEYWORDS: int = 200  # most popular keywords considered per pass
+    WARMER_MIN_SCORE: float = 5.0  # decayed request count a keyword needs to be kept warm
+    WARMER_LEAD_SECONDS: int = 3600  # refresh this long before the TTL runs out (at most half the TTL)
+    WARMER_MAX_CONCURRENT: int = 4  # warm-up runs queued or running at once
+    WARMER_MODE: Optional[str] = None  # collection mode of warm-ups (default: COLLECT_MODE)
+    WARMER_DAILY_AGENTBAY_BUDGET_USD: float = 5.0
+    WARMER_DAILY_OPENAI_BUDGET_USD: float = 2.0
+    WARMER_AGENTBAY_COST_PER_RUN_USD: float = 0.01  # estimate for a run that opens the browser
+    WARMER_OPENAI_COST_PER_RUN_USD: float = 0.002  # estimate for a run that misses the template cache
+    POPULARITY_HALF_LIFE: int = 6 * 3600  # seconds for a request to count half
+    POPULARITY_FLUSH_INTERVAL: float = 5.0  # seconds between writes of buffered request counts (per API process)
+
+    # Serialized status responses of finished runs kept in memory (per API process)
+    STATUS_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    STATUS_CACHE_TTL_SECONDS: int = 300  # bounds how stale shared video metadata (title, channel, ...) in a cached response gets
+
+    # Bulk export (/export/{dataset}): rows per server-side cursor fetch, and per Parquet row group
+    EXPORT_BATCH_SIZE: int = 5000
+
+    # Local title pattern mining (/patterns)
+    PATTERN_MAX_TITLES: int = 100_000  # most recent titles mined per request, all held in the API process
+
+    # Batch collections
+    BATCH_MAX_KEYWORDS: int = 500
+    BATCH_PARALLELISM: int = 4  # default parallel contexts in a batch's shared session
+    BATCH_MAX_PARALLELISM: int = 8
+
+    # Watch-page view lookups (cards without a view count)
+    VIEW_LOOKUP_CONCURRENCY: int = 4  # parallel watch-page tabs per run
+    VIEW_LOOKUP_TIMEOUT: int = 5000  # ms to wait for the watch page description
+    VIEW_CACHE_TTL: int = 21600  # seconds a cached per-video view count stays valid
+
+    # run_videos is partitioned by month (app/db/partitions.py); the retention job
+    # (app/services/retention.py) detaches months older than RUN_VIDEOS_RETENTION_MONTHS
+    # into RUN_VIDEOS_ARCHIVE_SCHEMA, or drops them when that is empty
+    RUN_VIDEOS_PARTITIONS_AHEAD: int = 2  # future months created in advance
+    RUN_VIDEOS_RETENTION_MONTHS: int = 12
+    RUN_VIDEOS_ARCHIVE_SCHEMA: str = "archive"
+    RETENTION_ENABLED: bool = True  # off: partitions only come from the migrations, nothing is detached
+    RETENTION_INTERVAL: int = 3600  # seconds between partition/retention passes in the worker
+
+    # Origin of search/watch pages; the offline benchmark points this at a local fixture server
+    YOUTUBE_BASE_URL: str = "https://www.youtube.com"
+
+    # Collection mode for requests that don't pick one: "browser" (AgentBay) or "http"
+    # (ytInitialData over plain HTTP, falls back to the browser when parsing fails)
+    COLLECT_MODE: str = "browser"
+    HTTP_COLLECT_TIMEOUT: float = 10.0  # seconds per page fetch
+    HTTP_COLLECT_MAX_CONNECTIONS: int = 20  # pooled connections per process
+    HTTP_COLLECT_USER_AGENT: str = (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+    )
+
+    # Adaptive throttling per scraping target (app/services/throttle.py, per worker process):
+    # AIMD limit on concurrent page loads / session creations, and a circuit breaker that
+    # opens after consecutive timeouts or block pages and holds new runs in the queue
+    THROTTLE_INITIAL_LIMIT: int = 4
+    THROTTLE_MIN_LIMIT: int = 1
+    THROTTLE_MAX_LIMIT: int = 16
+    THROTTLE_DECREASE_FACTOR: float = 0.5  # limit multiplier on a throttle signal
+    BREAKER_FAILURE_THRESHOLD: int = 5  # throttle signals in a row that open a breaker
+    BREAKER_COOLDOWN_SECONDS: float = 30.0  # open time before a probe, doubled per failed probe
+    BREAKER_MAX_COOLDOWN_SECONDS: float = 600.0
+    BREAKER_MAX_WAIT_SECONDS: float = 120.0  # longest a running collection waits on an open breaker, then its stage fails
+    PAGE_READY_TIMEOUT: int = 10000  # ms to wait for result cards (or a block page) after goto
+
+    # Lightweight scraping contexts: requests aborted before they hit the network
+    SCRAPE_BLOCK_ENABLED: bool = True
+    SCRAPE_BLOCK_RESOURCE_TYPES: str = "image,media,font"  # Playwright resource types
+    SCRAPE_BLOCK_URL_PATTERNS: str = (
+        "doubleclick.net,googlesyndication.com,googleadservices.com,google-analytics.com,"
+        "googletagmanager.com,imasdk.googleapis.com,youtube.com/api/stats,youtube.com/pagead,"
+        "youtube.com/ptracking,youtube.com/generate_204,play.google.com/log,i.ytimg.com/an_webp,"
+        "yt3.ggpht.com"
+    )  # substrings of request URLs (ads, tracking, thumbnails/avatars)
+
     # OpenAI
     OPENAI_API_KEY: str
     OPENAI_BASE_URL: Optional[str] = None
     OPENAI_MODEL: str = "gpt-3.5-turbo"
+    OPENAI_MAX_CONCURRENCY: int = 4  # in-flight requests per process
+    OPENAI_REQUESTS_PER_MINUTE: int = 500
+    OPENAI_TOKENS_PER_MINUTE: int = 200000
+    OPENAI_MAX_RETRIES: int = 5  # retries on 429/5xx/connection errors
+    OPENAI_RETRY_BASE_DELAY: float = 1.0  # seconds, doubled per attempt (full jitter)
+    OPENAI_RETRY_MAX_DELAY: float = 30.0
+    TEMPLATE_BATCH_TOKEN_BUDGET: int = 12000  # prompt + completion tokens per batched request
+    TEMPLATE_BATCH_OUTPUT_TOKENS: int = 900  # completion tokens reserved per keyword in a batch
+    TEMPLATE_BATCH_MAX_OUTPUT_TOKENS: int = 4096  # completion cap of OPENAI_MODEL (max_tokens of one request)
+    TEMPLATE_BATCH_MAX_KEYWORDS: int = 10
+    TEMPLATE_PATTERN_SUMMARY_MIN_TITLES: int = 30  # send mined patterns instead of raw titles from this many titles
+    TEMPLATE_CACHE_TTL: int = 30 * 24 * 3600  # seconds generated templates are reused for identical inputs
     
     class Config:
         env_file = ".env"
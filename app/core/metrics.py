@@ -0,0 +1,77 @@
+import time
+from contextlib import contextmanager
+from typing import Optional
+from prometheus_client import Counter, Gauge, Histogram
+
+# Buckets span fast DOM reads (ms) up to cold AgentBay session creation (tens of seconds)
+_STAGE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+STAGE_SECONDS = Histogram(
+    "collector_stage_seconds", "Duration of collection pipeline stages", ["stage"], buckets=_STAGE_BUCKETS
+)
+STAGE_FAILURES = Counter(
+    "collector_stage_failures_total", "Pipeline stages that raised", ["stage"]
+)
+FALLBACKS = Counter(
+    "collector_fallbacks_total", "Fallback paths taken (watch page views, related videos, per-keyword templates)", ["kind"]
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups by cache and result (hit/miss)", ["cache", "result"]
+)
+KEYWORD_CACHE_MATCHES = Counter(
+    "keyword_cache_matches_total",
+    "Keyword cache lookups by how they matched: raw (same text), canonical (same normalized key), fuzzy (pg_trgm) or miss",
+    ["match"],
+)
+WARMUPS = Counter(
+    "cache_warmer_runs_total",
+    "Cache warmer decisions: enqueued, coalesced (already in flight), skipped_concurrency, skipped_budget",
+    ["result"],
+)
+EXPORT_ROWS = Counter(
+    "export_rows_total", "Rows streamed by /export", ["dataset", "format"]
+)
+THROTTLE_LIMIT = Gauge(
+    "throttle_concurrency_limit", "Current AIMD concurrency limit per scraping target", ["target"]
+)
+THROTTLE_IN_FLIGHT = Gauge(
+    "throttle_in_flight", "Requests in flight per scraping target", ["target"]
+)
+THROTTLE_SIGNALS = Counter(
+    "throttle_signals_total", "Throttle signals (selector timeouts, block pages, 429s, failed session creations)", ["target"]
+)
+BREAKER_STATE = Gauge(
+    "circuit_breaker_state", "Circuit breaker state per target: 0 closed, 1 half open, 2 open", ["target"]
+)
+BREAKER_TRIPS = Counter(
+    "circuit_breaker_trips_total", "Times a target's circuit breaker opened", ["target"]
+)
+RUNS_FINISHED = Counter(
+    "collector_runs_finished_total", "Collection runs by final status", ["status"]
+)
+
+
+@contextmanager
+def stage(name: str, timings: Optional[dict] = None):
+    """
+    Times a pipeline stage into the stage histogram (and a failure counter if it raises).
+    If a `timings` dict is given, the duration in ms is also added to timings[name],
+    which is how per-run stage timings end up on the Run row.
+    Works around awaits: `with stage("search_goto", timings): await page.goto(...)`.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_FAILURES.labels(stage=name).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage=name).observe(elapsed)
+        if timings is not None:
+            timings[name] = round(timings.get(name, 0) + elapsed * 1000, 1)
+
+
+def cache_result(cache: str, hit: bool, count: int = 1):
+    if count:
+        CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc(count)
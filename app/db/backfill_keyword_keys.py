@@ -0,0 +1,48 @@
+"""
+Recomputes runs.keyword_key (and normalizes hl/gl) with the current
+app.utils.keywords rules, for runs created before a rule change:
+
+    python -m app.db.backfill_keyword_keys --batch-size 5000
+"""
+import argparse
+from sqlalchemy import select, update
+from app.db.session import SessionLocal
+from app.db.models import Run
+from app.utils.keywords import normalize_keyword, normalize_locale
+
+
+def backfill(batch_size: int = 5000) -> int:
+    db = SessionLocal()
+    changed = 0
+    try:
+        last_id = None
+        while True:
+            stmt = select(Run.id, Run.keyword, Run.keyword_key, Run.hl, Run.gl).order_by(Run.id).limit(batch_size)
+            if last_id is not None:
+                stmt = stmt.where(Run.id > last_id)
+            rows = db.execute(stmt).all()
+            if not rows:
+                break
+            updates = []
+            for run_id, keyword, keyword_key, hl, gl in rows:
+                key = normalize_keyword(keyword)
+                norm_hl, norm_gl = normalize_locale(hl, gl)
+                if (key, norm_hl, norm_gl) != (keyword_key, hl, gl):
+                    updates.append({"id": run_id, "keyword_key": key, "hl": norm_hl, "gl": norm_gl})
+            if updates:
+                # executemany by primary key
+                db.execute(update(Run), updates)
+                db.commit()
+                changed += len(updates)
+            last_id = rows[-1][0]
+            print(f"... {changed} runs updated")
+    finally:
+        db.close()
+    return changed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill runs.keyword_key with the canonical keyword.")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+    print(f"Updated {backfill(args.batch_size)} runs.")
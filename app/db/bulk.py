@@ -0,0 +1,104 @@
+import uuid
+from datetime import datetime
+from typing import List
+from sqlalchemy import insert, select, func, or_, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models import Video, RunVideo, Template
+
+# Columns a collected video dict may carry (see dom_extract.card_to_video)
+VIDEO_COLUMNS = (
+    "run_id", "source_type", "rank", "title", "channel_name", "video_id", "video_url",
+    "views_raw", "views_num", "published_raw", "duration_raw", "collected_from",
+)
+# ...split into the canonical video and what this run saw of it
+CANONICAL_COLUMNS = ("video_id", "title", "channel_name", "video_url", "published_raw", "duration_raw")
+RUN_VIDEO_COLUMNS = ("run_id", "source_type", "rank", "video_id", "views_raw", "views_num", "collected_from")
+
+
+def video_rows(videos: List[dict]) -> List[dict]:
+    """Canonical rows, one per video_id (sorted, so concurrent runs lock them in the same order)."""
+    rows = {v["video_id"]: {col: v.get(col) for col in CANONICAL_COLUMNS} for v in videos}
+    return [rows[video_id] for video_id in sorted(rows)]
+
+
+def run_video_rows(videos: List[dict]) -> List[dict]:
+    """Rows with an identical key set, as a multi-row VALUES clause requires."""
+    return [{col: v.get(col) for col in RUN_VIDEO_COLUMNS} for v in videos]
+
+
+def upsert_videos_stmt(videos: List[dict]):
+    """
+    INSERT ... ON CONFLICT for the canonical rows. Unchanged videos that were seen
+    recently are left alone: popular videos show up in many runs and rewriting
+    them every time would only produce dead tuples.
+    """
+    stmt = pg_insert(Video).values(video_rows(videos))
+    new = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[Video.video_id],
+        set_={
+            "title": new.title,
+            "channel_name": func.coalesce(func.nullif(new.channel_name, "Unknown"), Video.channel_name),
+            "video_url": new.video_url,
+            "published_raw": func.coalesce(new.published_raw, Video.published_raw),
+            "duration_raw": func.coalesce(new.duration_raw, Video.duration_raw),
+            "last_seen_at": func.now(),
+        },
+        where=or_(
+            Video.title.is_distinct_from(new.title),
+            Video.last_seen_at < func.now() - literal_column("interval '1 day'"),
+        ),
+    )
+
+
+def run_videos_query(run_id: uuid.UUID, started_at: datetime):
+    """
+    (RunVideo with its Video) of a run. A run's rows are never older than the run, so
+    created_at >= started_at lets Postgres skip the partitions of earlier months and
+    answer from the primary key index of the remaining ones.
+    """
+    return (
+        select(RunVideo)
+        .where(RunVideo.run_id == run_id, RunVideo.created_at >= started_at)
+        .order_by(RunVideo.source_type, RunVideo.rank)
+    )
+
+
+def video_dict(run_video: RunVideo) -> dict:
+    """A stored RunVideo back in the shape of the collector's video dicts."""
+    video = run_video.video
+    return {
+        **{col: getattr(run_video, col) for col in RUN_VIDEO_COLUMNS},
+        **{col: getattr(video, col) for col in CANONICAL_COLUMNS},
+    }
+
+
+def template_rows(run_id: uuid.UUID, templates: List[dict]) -> List[dict]:
+    return [
+        {
+            "run_id": run_id,
+            "template_text": t.get("template_text"),
+            "example_1": t.get("example_1"),
+            "example_2": t.get("example_2"),
+        }
+        for t in templates
+        if t.get("template_text")
+    ]
+
+
+async def bulk_insert_videos(db: AsyncSession, videos: List[dict]):
+    """
+    Upserts the canonical videos, then inserts the run's rows, each with a single
+    multi-row statement instead of one ORM object (and one INSERT) per row.
+    Runs in the caller's transaction.
+    """
+    if videos:
+        await db.execute(upsert_videos_stmt(videos))
+        await db.execute(insert(RunVideo).values(run_video_rows(videos)))
+
+
+async def bulk_insert_templates(db: AsyncSession, run_id: uuid.UUID, templates: List[dict]):
+    rows = template_rows(run_id, templates)
+    if rows:
+        await db.execute(insert(Template).values(rows))
@@ -1,10 +0,0 @@
-from app.db.session import engine, Base
-from app.db import models
-
-def init_db():
-    Base.metadata.create_all(bind=engine)
-
-if __name__ == "__main__":
-    print("Creating database tables...")
-    init_db()
-    print("Tables created successfully.")
@@ -0,0 +1,133 @@
+"""
+Versioned schema migrations, run once per release instead of at every boot:
+
+    python -m app.db.migrate           # apply pending migrations
+    python -m app.db.migrate --status  # list applied and pending ones
+
+Migrations are the NNNN_name.sql files in app/db/migrations, applied in version
+order, each in its own transaction, and recorded in schema_migrations. A session
+advisory lock serializes runners, so replicas starting the same release together
+wait for the first one instead of applying a file twice. The upcoming run_videos
+partitions are created afterwards (the workers keep creating them from then on).
+"""
+import argparse
+import hashlib
+import logging
+import re
+from pathlib import Path
+from typing import List, NamedTuple
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from app.db.session import engine
+from app.db.partitions import ensure_partitions
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+_FILENAME = re.compile(r"^(\d+)_(\w+)\.sql$")
+_LOCK_KEY = "schema_migrations"
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    path: Path
+
+    @property
+    def sql(self) -> str:
+        return self.path.read_text()
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.path.read_bytes()).hexdigest()
+
+
+def available_migrations() -> List[Migration]:
+    migrations = []
+    for path in MIGRATIONS_DIR.iterdir():
+        match = _FILENAME.match(path.name)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2), path))
+    migrations.sort()
+    versions = [m.version for m in migrations]
+    if len(set(versions)) != len(versions):
+        raise Exception(f"Duplicate migration versions in {MIGRATIONS_DIR}")
+    return migrations
+
+
+def head_version() -> int:
+    """Version the code expects the schema to be at (0 without migrations)."""
+    migrations = available_migrations()
+    return migrations[-1].version if migrations else 0
+
+
+def _ensure_table(conn: Connection):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version INTEGER PRIMARY KEY,"
+        " name TEXT NOT NULL,"
+        " checksum TEXT NOT NULL,"
+        " applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW())"
+    ))
+
+
+def applied_migrations(conn: Connection) -> dict:
+    """version -> checksum of the applied migrations."""
+    return dict(conn.execute(text("SELECT version, checksum FROM schema_migrations")).all())
+
+
+def migrate() -> List[int]:
+    """Applies pending migrations; returns their versions."""
+    done = []
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(hashtext(:key))"), {"key": _LOCK_KEY})
+        try:
+            _ensure_table(conn)
+            conn.commit()
+            applied = applied_migrations(conn)
+            conn.commit()
+            for migration in available_migrations():
+                if migration.version in applied:
+                    if applied[migration.version] != migration.checksum:
+                        logger.warning(f"Migration {migration.path.name} changed after it was applied")
+                    continue
+                logger.info(f"Applying migration {migration.path.name}")
+                with conn.begin():
+                    # Raw SQL: DO blocks and format() placeholders must reach Postgres untouched
+                    conn.exec_driver_sql(migration.sql, execution_options={"no_parameters": True})
+                    conn.execute(
+                        text("INSERT INTO schema_migrations (version, name, checksum) VALUES (:v, :n, :c)"),
+                        {"v": migration.version, "n": migration.name, "c": migration.checksum},
+                    )
+                done.append(migration.version)
+            with conn.begin():
+                ensure_partitions(conn)
+        finally:
+            conn.rollback()
+            conn.execute(text("SELECT pg_advisory_unlock(hashtext(:key))"), {"key": _LOCK_KEY})
+            conn.commit()
+    return done
+
+
+def status():
+    with engine.connect() as conn:
+        _ensure_table(conn)
+        applied = applied_migrations(conn)
+        conn.commit()
+    for migration in available_migrations():
+        state = "applied" if migration.version in applied else "pending"
+        if state == "applied" and applied[migration.version] != migration.checksum:
+            state = "applied (file changed since)"
+        print(f"{migration.path.name}: {state}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Apply the SQL migrations in app/db/migrations.")
+    parser.add_argument("--status", action="store_true", help="only list applied and pending migrations")
+    args = parser.parse_args()
+    if args.status:
+        status()
+    else:
+        applied = migrate()
+        print(f"Applied {len(applied)} migration(s); schema at version {head_version()}.")
@@ -0,0 +1,97 @@
+"""
+Moves the old per-run `videos` table (full copy of every video per run) to the
+canonical `videos` + partitioned `run_videos` layout:
+
+    python -m app.db.migrate_videos --batch-size 20000
+    python -m app.db.migrate_videos --drop-legacy   # once the copy is verified
+
+The baseline migration (python -m app.db.migrate) renames the old table to
+videos_legacy so the new tables can be created; this script then copies its rows
+in keyset batches.
+It is safe to stop and re-run: existing rows are skipped.
+"""
+import argparse
+from datetime import timezone
+from sqlalchemy import inspect, text
+from app.db.session import engine
+from app.db.partitions import create_partitions, month_start
+
+LEGACY = "videos_legacy"
+
+
+_UPSERT_VIDEOS = text(f"""
+    INSERT INTO videos (video_id, title, channel_name, video_url, published_raw, duration_raw, first_seen_at, last_seen_at)
+    SELECT DISTINCT ON (video_id)
+        video_id, title, channel_name, video_url, published_raw, duration_raw,
+        min(created_at) OVER (PARTITION BY video_id), created_at
+    FROM {LEGACY}
+    WHERE id > :lo AND id <= :hi
+    ORDER BY video_id, created_at DESC
+    ON CONFLICT (video_id) DO UPDATE SET
+        title = CASE WHEN excluded.last_seen_at > videos.last_seen_at THEN excluded.title ELSE videos.title END,
+        channel_name = CASE WHEN excluded.last_seen_at > videos.last_seen_at THEN excluded.channel_name ELSE videos.channel_name END,
+        published_raw = CASE WHEN excluded.last_seen_at > videos.last_seen_at THEN excluded.published_raw ELSE videos.published_raw END,
+        duration_raw = COALESCE(videos.duration_raw, excluded.duration_raw),
+        first_seen_at = LEAST(videos.first_seen_at, excluded.first_seen_at),
+        last_seen_at = GREATEST(videos.last_seen_at, excluded.last_seen_at)
+""")
+
+_COPY_RUN_VIDEOS = text(f"""
+    INSERT INTO run_videos (run_id, source_type, rank, created_at, video_id, views_raw, views_num, collected_from)
+    SELECT run_id, source_type, rank, COALESCE(created_at, now()), video_id, views_raw, views_num, collected_from
+    FROM {LEGACY}
+    WHERE id > :lo AND id <= :hi
+    ON CONFLICT DO NOTHING
+""")
+
+
+def migrate(batch_size: int = 20000) -> int:
+    copied = 0
+    with engine.connect() as conn:
+        if not inspect(conn).has_table(LEGACY):
+            print(f"No {LEGACY} table, nothing to migrate.")
+            return 0
+        # Every month of the old data needs its partition, or the rows would pile up in the default one
+        first, last = conn.execute(text(f"SELECT min(created_at), max(created_at) FROM {LEGACY}")).one()
+        if first is not None:
+            create_partitions(conn, month_start(first.astimezone(timezone.utc).date()), month_start(last.astimezone(timezone.utc).date()))
+        conn.commit()
+
+        lo = "00000000-0000-0000-0000-000000000000"
+        while True:
+            hi = conn.execute(
+                text(f"SELECT max(id) FROM (SELECT id FROM {LEGACY} WHERE id > :lo ORDER BY id LIMIT :n) b"),
+                {"lo": lo, "n": batch_size},
+            ).scalar()
+            if hi is None:
+                break
+            conn.execute(_UPSERT_VIDEOS, {"lo": lo, "hi": hi})
+            copied += conn.execute(_COPY_RUN_VIDEOS, {"lo": lo, "hi": hi}).rowcount
+            conn.commit()
+            lo = hi
+            print(f"... {copied} run videos copied")
+    return copied
+
+
+def drop_legacy():
+    with engine.begin() as conn:
+        legacy = conn.execute(text(f"SELECT count(*) FROM {LEGACY}")).scalar()
+        moved = conn.execute(text(
+            f"SELECT count(*) FROM {LEGACY} l WHERE EXISTS (SELECT 1 FROM run_videos rv "
+            "WHERE rv.run_id = l.run_id AND rv.source_type = l.source_type AND rv.rank = l.rank)"
+        )).scalar()
+        if moved < legacy:
+            raise Exception(f"Only {moved} of {legacy} legacy rows are in run_videos, run the migration first")
+        conn.execute(text(f"DROP TABLE {LEGACY}"))
+    print(f"Dropped {LEGACY} ({legacy} rows).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy the old videos table into videos + run_videos.")
+    parser.add_argument("--batch-size", type=int, default=20000)
+    parser.add_argument("--drop-legacy", action="store_true", help=f"drop {LEGACY} once every row is copied")
+    args = parser.parse_args()
+    if args.drop_legacy:
+        drop_legacy()
+    else:
+        print(f"Copied {migrate(args.batch_size)} run videos.")
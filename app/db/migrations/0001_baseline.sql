@@ -0,0 +1,208 @@
+-- Baseline schema (formerly supabase_schema.sql). Idempotent, so it also applies on top of
+-- databases created before migrations (by create_all at startup or by hand).
+-- Later changes go in new numbered files: python -m app.db.migrate applies them in order.
+
+-- Enable UUID extension if not already enabled
+CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+
+-- RUNS Table
+CREATE TABLE IF NOT EXISTS runs (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    keyword TEXT NOT NULL,
+    keyword_key TEXT, -- canonical keyword (NFKC, case, whitespace), used to coalesce collections and as the cache key
+    hl TEXT DEFAULT 'id',
+    gl TEXT DEFAULT 'ID',
+    status TEXT DEFAULT 'queued', -- queued, running, success, partial, failed
+    mode TEXT NOT NULL DEFAULT 'browser', -- browser, http (ytInitialData over plain HTTP)
+    trigger TEXT NOT NULL DEFAULT 'request', -- request, refresh (stale cache hit), warm (cache warmer)
+    started_at TIMESTAMPTZ DEFAULT NOW(),
+    finished_at TIMESTAMPTZ,
+    error_message TEXT,
+    -- job queue bookkeeping
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    heartbeat_at TIMESTAMPTZ,
+    lease_expires_at TIMESTAMPTZ,
+    metrics JSONB, -- per-run counters (view cache hit rate, ...)
+    stages_completed JSONB, -- saved stages: search, related, templates
+    stage_timings JSONB, -- per-stage durations in ms (search_goto, generate_templates, ...)
+    batch_id UUID -- runs scraped as part of a batch (FK added below)
+);
+
+-- Existing deployments: add the job queue columns
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS worker_id TEXT;
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMPTZ;
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ;
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS keyword_key TEXT;
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS metrics JSONB;
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS stage_timings JSONB;
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS stages_completed JSONB;
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS batch_id UUID;
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS mode TEXT NOT NULL DEFAULT 'browser';
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS trigger TEXT NOT NULL DEFAULT 'request';
+-- Same steps as app.utils.keywords.normalize_keyword: NFKC, zero-width characters removed,
+-- whitespace collapsed, lowercased (python -m app.db.backfill_keyword_keys re-applies the Python rules)
+UPDATE runs SET keyword_key = lower(btrim(regexp_replace(
+    regexp_replace(normalize(keyword, NFKC), '[\u200B\u200C\u200D\u2060\uFEFF]', '', 'g'),
+    '\s+', ' ', 'g'))) WHERE keyword_key IS NULL;
+
+-- BATCHES Table (multi-keyword collections sharing one browser session)
+CREATE TABLE IF NOT EXISTS batches (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    hl TEXT DEFAULT 'id',
+    gl TEXT DEFAULT 'ID',
+    parallelism INTEGER NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+DO $$ BEGIN
+    ALTER TABLE runs ADD CONSTRAINT runs_batch_id_fkey FOREIGN KEY (batch_id) REFERENCES batches(id);
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+
+-- BATCH ITEMS Table (keyword -> run; the run may be a cached or in-flight run from elsewhere)
+CREATE TABLE IF NOT EXISTS batch_items (
+    batch_id UUID NOT NULL REFERENCES batches(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    keyword TEXT NOT NULL,
+    run_id UUID NOT NULL REFERENCES runs(id),
+    cached BOOLEAN NOT NULL DEFAULT FALSE,
+    coalesced BOOLEAN NOT NULL DEFAULT FALSE,
+    PRIMARY KEY (batch_id, position)
+);
+
+-- Existing deployments: the old per-run videos table (full video copy per run) is kept as
+-- videos_legacy; copy it over with python -m app.db.migrate_videos, then --drop-legacy
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_schema = 'public' AND table_name = 'videos' AND column_name = 'run_id') THEN
+        ALTER TABLE videos RENAME TO videos_legacy;
+        ALTER TABLE videos_legacy RENAME CONSTRAINT videos_pkey TO videos_legacy_pkey;
+        ALTER INDEX IF EXISTS idx_videos_run_id RENAME TO idx_videos_legacy_run_id;
+    END IF;
+END $$;
+
+-- VIDEOS Table (one row per YouTube video, latest seen metadata, shared by all runs)
+CREATE TABLE IF NOT EXISTS videos (
+    video_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    channel_name TEXT,
+    video_url TEXT NOT NULL,
+    published_raw TEXT,
+    duration_raw TEXT,
+    first_seen_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_seen_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- RUN VIDEOS Table (what a run collected: position and view count at the time),
+-- partitioned by month. Partitions are created ahead and expired by the worker
+-- (app/services/retention.py); the default partition only catches stragglers.
+CREATE TABLE IF NOT EXISTS run_videos (
+    run_id UUID NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    source_type TEXT NOT NULL, -- search, people_also_watched, related_fallback
+    rank INTEGER NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    video_id TEXT NOT NULL REFERENCES videos(video_id),
+    views_raw TEXT,
+    views_num BIGINT,
+    collected_from TEXT, -- search, module, watch_page, view_cache
+    PRIMARY KEY (run_id, source_type, rank, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE IF NOT EXISTS run_videos_default PARTITION OF run_videos DEFAULT;
+DO $$
+DECLARE
+    m DATE;
+BEGIN
+    FOR m IN SELECT generate_series(date_trunc('month', NOW() AT TIME ZONE 'UTC'),
+                                    date_trunc('month', NOW() AT TIME ZONE 'UTC') + INTERVAL '2 months',
+                                    INTERVAL '1 month')::date
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF run_videos FOR VALUES FROM (%L) TO (%L)',
+            'run_videos_' || to_char(m, 'YYYY_MM'), m::text || ' 00:00:00+00', (m + INTERVAL '1 month')::date::text || ' 00:00:00+00'
+        );
+    END LOOP;
+END $$;
+
+-- TEMPLATES Table
+CREATE TABLE IF NOT EXISTS templates (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    run_id UUID NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    template_text TEXT NOT NULL,
+    example_1 TEXT,
+    example_2 TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- VIDEO VIEW CACHE Table (latest known view count per video, shared across runs)
+CREATE TABLE IF NOT EXISTS video_view_cache (
+    video_id TEXT PRIMARY KEY,
+    views_raw TEXT,
+    views_num BIGINT,
+    collected_from TEXT,
+    fetched_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- KEYWORD POPULARITY Table (request counts decayed with POPULARITY_HALF_LIFE, read by the cache warmer)
+CREATE TABLE IF NOT EXISTS keyword_popularity (
+    keyword_key TEXT NOT NULL,
+    hl TEXT NOT NULL,
+    gl TEXT NOT NULL,
+    keyword TEXT NOT NULL, -- as last requested
+    score DOUBLE PRECISION NOT NULL DEFAULT 0, -- decayed request count as of updated_at
+    requests BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (keyword_key, hl, gl)
+);
+
+-- TEMPLATE CACHE Table (LLM output reused for identical model/keyword/titles)
+CREATE TABLE IF NOT EXISTS template_cache (
+    cache_key TEXT PRIMARY KEY, -- sha256 of (model, normalized keyword, sorted titles)
+    model TEXT NOT NULL,
+    keyword_key TEXT NOT NULL,
+    templates JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Create simple indexes for common lookups
+-- Keyword cache lookup (newest successful run per canonical keyword/hl/gl) as an index-only scan;
+-- replaces the old (keyword, status) index. Existing rows: python -m app.db.backfill_keyword_keys
+DROP INDEX IF EXISTS idx_runs_keyword_status;
+DROP INDEX IF EXISTS idx_runs_cache_lookup; -- earlier version on the raw keyword
+CREATE INDEX IF NOT EXISTS idx_runs_cache_key_lookup ON runs(keyword_key, hl, gl, status, finished_at DESC) INCLUDE (id, keyword);
+
+-- Optional fuzzy keyword cache (CACHE_FUZZY_ENABLED): trigram similarity on the canonical keyword.
+-- Skipped (with a notice) where pg_trgm is unavailable or the role may not create extensions,
+-- so locked-down databases still migrate; fuzzy lookups then fail softly and fall back to misses
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')
+       AND EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        BEGIN
+            CREATE EXTENSION pg_trgm;
+        EXCEPTION WHEN insufficient_privilege THEN
+            RAISE NOTICE 'pg_trgm not installed (insufficient privilege): fuzzy keyword cache unavailable';
+        END;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+        CREATE INDEX IF NOT EXISTS idx_runs_keyword_key_trgm ON runs USING gin (keyword_key gin_trgm_ops) WHERE status = 'success';
+    ELSE
+        RAISE NOTICE 'pg_trgm not available: idx_runs_keyword_key_trgm not created';
+    END IF;
+END $$;
+-- Status queries use the run_videos primary key (run_id first); this one serves video -> runs lookups and retention
+CREATE INDEX IF NOT EXISTS idx_run_videos_video_id ON run_videos(video_id);
+CREATE INDEX IF NOT EXISTS idx_templates_run_id ON templates(run_id);
+
+-- Job queue: workers claim the oldest queued run and reap expired leases
+CREATE INDEX IF NOT EXISTS idx_runs_queue ON runs(started_at) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_runs_batch_queue ON runs(batch_id, started_at) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_runs_lease ON runs(lease_expires_at) WHERE status = 'running';
+
+-- Cache warmer: today's warm-ups (budget) and recent failed ones
+CREATE INDEX IF NOT EXISTS idx_runs_warm ON runs(started_at) WHERE trigger = 'warm';
+
+-- Single-flight: find the in-flight run for a keyword (see job_queue.enqueue_run)
+CREATE INDEX IF NOT EXISTS idx_runs_inflight ON runs(keyword_key, hl, gl) WHERE status IN ('queued', 'running');
@@ -1,44 +1,115 @@
 import uuid
-from sqlalchemy import Column, String, Integer, BigInteger, Text, DateTime, ForeignKey, Boolean
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Integer, BigInteger, Float, Text, DateTime, ForeignKey, Boolean, Index, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.session import Base
 
+# Tables are created and altered by the SQL migrations in app/db/migrations (python -m app.db.migrate):
+# a column or index added here needs a new migration file too
+
 class Run(Base):
     __tablename__ = "runs"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     keyword = Column(Text, nullable=False)
+    keyword_key = Column(Text, nullable=True)  # canonical keyword (app/utils/keywords.py), backfill: python -m app.db.backfill_keyword_keys
     hl = Column(String, default="id")
     gl = Column(String, default="ID")
     status = Column(String, default="queued")  # queued, running, success, partial, failed
+    mode = Column(String, nullable=False, default="browser", server_default="browser")  # browser, http (see http_collector.py)
+    trigger = Column(String, nullable=False, default="request", server_default="request")  # request, refresh (stale hit), warm (cache_warmer.py)
     started_at = Column(DateTime(timezone=True), server_default=func.now())
     finished_at = Column(DateTime(timezone=True), nullable=True)
     error_message = Column(Text, nullable=True)
+
+    # Job queue bookkeeping (see app/services/job_queue.py)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    worker_id = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+
+    metrics = Column(JSONB, nullable=True)  # per-run counters (view cache hit rate, ...)
+    stages_completed = Column(JSONB, nullable=True)  # saved stages: search, related, templates (see job_queue.RUN_STAGES)
+    stage_timings = Column(JSONB, nullable=True)  # per-stage durations in ms (search_goto, generate_templates, ...)
+    batch_id = Column(UUID(as_uuid=True), ForeignKey("batches.id"), nullable=True)  # runs scraped as part of a batch
     
-    videos = relationship("Video", back_populates="run", cascade="all, delete-orphan")
+    videos = relationship("RunVideo", back_populates="run", cascade="all, delete-orphan", passive_deletes=True)
     templates = relationship("Template", back_populates="run", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("idx_runs_queue", "started_at", postgresql_where=text("status = 'queued'")),
+        Index("idx_runs_batch_queue", "batch_id", "started_at", postgresql_where=text("status = 'queued'")),
+        Index("idx_runs_lease", "lease_expires_at", postgresql_where=text("status = 'running'")),
+        Index("idx_runs_inflight", "keyword_key", "hl", "gl", postgresql_where=text("status IN ('queued', 'running')")),
+        # Keyword cache lookup: newest successful run per canonical keyword/hl/gl, answered from the index alone
+        # (the pg_trgm index for fuzzy lookups is only in the migrations, it needs the extension)
+        Index("idx_runs_cache_key_lookup", "keyword_key", "hl", "gl", "status", text("finished_at DESC"), postgresql_include=["id", "keyword"]),
+        # Cache warmer: today's warm-ups (budget) and recent failed ones
+        Index("idx_runs_warm", "started_at", postgresql_where=text("trigger = 'warm'")),
+    )
+
+class Batch(Base):
+    __tablename__ = "batches"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    hl = Column(String, default="id")
+    gl = Column(String, default="ID")
+    parallelism = Column(Integer, nullable=False)  # parallel contexts in the shared session
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    items = relationship("BatchItem", back_populates="batch", cascade="all, delete-orphan", order_by="BatchItem.position")
+
+class BatchItem(Base):
+    __tablename__ = "batch_items"
+
+    batch_id = Column(UUID(as_uuid=True), ForeignKey("batches.id"), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    keyword = Column(Text, nullable=False)
+    run_id = Column(UUID(as_uuid=True), ForeignKey("runs.id"), nullable=False)  # may be a cached/in-flight run from elsewhere
+    cached = Column(Boolean, nullable=False, default=False)
+    coalesced = Column(Boolean, nullable=False, default=False)
+
+    batch = relationship("Batch", back_populates="items")
+    run = relationship("Run")
+
 class Video(Base):
+    """One row per YouTube video, shared by every run that collected it (latest seen metadata)."""
     __tablename__ = "videos"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    run_id = Column(UUID(as_uuid=True), ForeignKey("runs.id"), nullable=False)
-    source_type = Column(String, nullable=False)  # search, people_also_watched, related_fallback
-    rank = Column(Integer, nullable=False)
+    video_id = Column(String, primary_key=True)
     title = Column(Text, nullable=False)
     channel_name = Column(Text, nullable=True)
-    video_id = Column(String, nullable=False)
     video_url = Column(Text, nullable=False)
-    views_raw = Column(Text, nullable=True)
-    views_num = Column(BigInteger, nullable=True)
     published_raw = Column(Text, nullable=True)
     duration_raw = Column(Text, nullable=True)
-    collected_from = Column(String, nullable=True)  # search, module, watch_page
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    
+    first_seen_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_seen_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class RunVideo(Base):
+    """
+    A video as collected by one run: position and the view count at that time.
+    Range-partitioned by month on created_at (partitions: app/db/partitions.py,
+    retention: app/services/retention.py), so the primary key has to include it.
+    """
+    __tablename__ = "run_videos"
+
+    run_id = Column(UUID(as_uuid=True), ForeignKey("runs.id", ondelete="CASCADE"), primary_key=True)
+    source_type = Column(String, primary_key=True)  # search, people_also_watched, related_fallback
+    rank = Column(Integer, primary_key=True)
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+    video_id = Column(String, ForeignKey("videos.video_id"), nullable=False)
+    views_raw = Column(Text, nullable=True)
+    views_num = Column(BigInteger, nullable=True)
+    collected_from = Column(String, nullable=True)  # search, module, watch_page, view_cache
+
     run = relationship("Run", back_populates="videos")
+    video = relationship("Video", lazy="joined", innerjoin=True)
+
+    __table_args__ = (
+        Index("idx_run_videos_video_id", "video_id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
 class Template(Base):
     __tablename__ = "templates"
@@ -51,3 +122,33 @@ class Template(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     run = relationship("Run", back_populates="templates")
+
+class VideoViewCache(Base):
+    __tablename__ = "video_view_cache"
+
+    video_id = Column(String, primary_key=True)
+    views_raw = Column(Text, nullable=True)
+    views_num = Column(BigInteger, nullable=True)
+    collected_from = Column(String, nullable=True)  # search, module, watch_page
+    fetched_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class KeywordPopularity(Base):
+    """Request counts per canonical keyword, exponentially decayed (see app/services/popularity.py)."""
+    __tablename__ = "keyword_popularity"
+
+    keyword_key = Column(Text, primary_key=True)
+    hl = Column(String, primary_key=True)
+    gl = Column(String, primary_key=True)
+    keyword = Column(Text, nullable=False)  # as last requested, used when the warmer enqueues it
+    score = Column(Float, nullable=False, default=0.0)  # decayed request count as of updated_at
+    requests = Column(BigInteger, nullable=False, default=0)  # undecayed total
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class TemplateCache(Base):
+    __tablename__ = "template_cache"
+
+    cache_key = Column(String, primary_key=True)  # sha256 of (model, normalized keyword, sorted titles)
+    model = Column(String, nullable=False)
+    keyword_key = Column(Text, nullable=False)
+    templates = Column(JSONB, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,101 @@
+"""
+Monthly range partitions of run_videos (on created_at).
+
+Functions take a sync Connection, so they run as they are from scripts and the migration runner
+and from async code through `await conn.run_sync(ensure_partitions)`.
+"""
+import logging
+import re
+from datetime import date, datetime, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PARENT = "run_videos"
+DEFAULT_PARTITION = f"{PARENT}_default"
+_MONTHLY = re.compile(rf"^{PARENT}_(\d{{4}})_(\d{{2}})$")
+
+
+def month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def add_months(d: date, months: int) -> date:
+    years, month = divmod(d.month - 1 + months, 12)
+    return date(d.year + years, month + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_{month:%Y_%m}"
+
+
+def _bound(month: date) -> str:
+    # Explicit UTC: a bare date would be read in the session's TimeZone
+    return f"{month.isoformat()} 00:00:00+00"
+
+
+def list_partitions(conn: Connection) -> List[Tuple[str, Optional[date]]]:
+    """(name, month) of every partition of run_videos; month is None for the default partition."""
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :parent AND p.relnamespace = 'public'::regnamespace"
+    ), {"parent": PARENT}).scalars().all()
+    partitions = []
+    for name in sorted(rows):
+        m = _MONTHLY.match(name)
+        partitions.append((name, date(int(m.group(1)), int(m.group(2)), 1) if m else None))
+    return partitions
+
+
+def create_partitions(conn: Connection, first_month: date, last_month: date) -> List[str]:
+    """Creates the missing monthly partitions from first_month to last_month (inclusive) and the default one."""
+    existing = {name for name, _ in list_partitions(conn)}
+    if DEFAULT_PARTITION not in existing:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT} DEFAULT"))
+
+    created = []
+    month = month_start(first_month)
+    while month <= last_month:
+        name = partition_name(month)
+        if name not in existing:
+            _create_partition(conn, name, month, add_months(month, 1))
+            created.append(name)
+        month = add_months(month, 1)
+    if created:
+        logger.info(f"Created run_videos partitions: {', '.join(created)}")
+    return created
+
+
+def _create_partition(conn: Connection, name: str, lo: date, hi: date):
+    bounds = {"lo": _bound(lo), "hi": _bound(hi)}
+    stray = conn.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= CAST(:lo AS timestamptz) "
+        "AND created_at < CAST(:hi AS timestamptz))"
+    ), bounds).scalar()
+    ddl = f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT} FOR VALUES FROM ('{bounds['lo']}') TO ('{bounds['hi']}')"
+    if not stray:
+        conn.execute(text(ddl))
+        return
+
+    # Rows for this month already landed in the default partition (no pass ran in time):
+    # Postgres refuses the new partition until they are moved out of it
+    logger.warning(f"Moving rows of {lo:%Y-%m} out of {DEFAULT_PARTITION}")
+    conn.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {DEFAULT_PARTITION}"))
+    conn.execute(text(ddl))
+    where = "created_at >= CAST(:lo AS timestamptz) AND created_at < CAST(:hi AS timestamptz)"
+    conn.execute(text(f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {where}"), bounds)
+    conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {where}"), bounds)
+    conn.execute(text(f"ALTER TABLE {PARENT} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+
+
+def ensure_partitions(conn: Connection, months_ahead: Optional[int] = None) -> List[str]:
+    """The current month's partition and RUN_VIDEOS_PARTITIONS_AHEAD more, so inserts never hit the default one."""
+    if months_ahead is None:
+        months_ahead = settings.RUN_VIDEOS_PARTITIONS_AHEAD
+    current = month_start(datetime.now(timezone.utc).date())
+    return create_partitions(conn, current, add_months(current, months_ahead))
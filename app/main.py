@@ -1,8 +1,15 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import collect
+from sqlalchemy import text
+from app.api import collect, export, patterns
 from app.core.config import settings
-from app.db.init_db import init_db
+from app.db.migrate import head_version
+from app.db.session import AsyncSessionLocal
+from app.services.events import get_event_broker
+from app.services.popularity import get_popularity_tracker
+import asyncio
 import logging
 
 # Basic logging setup
@@ -22,13 +29,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Startup event to init DB
+# The schema is migrated once per release (python -m app.db.migrate), not here: booting
+# never touches the DB, so new replicas come up fast and survive a DB blip (see /readyz)
+SCHEMA_VERSION = head_version()
+
 @app.on_event("startup")
-def on_startup():
-    init_db()
+async def on_startup():
+    get_popularity_tracker().start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await get_popularity_tracker().stop()
+    await get_event_broker().close()
 
 # Include Routers
 app.include_router(collect.router, prefix="/api")
+app.include_router(patterns.router, prefix="/api")
+app.include_router(export.router, prefix="/api")
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    # Collection stages are timed in the worker process, which serves its own /metrics (WORKER_METRICS_PORT)
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/healthz", include_in_schema=False)
+def healthz():
+    # Liveness: the process is serving. Deliberately no DB check, or a DB blip would restart every replica
+    return {"status": "ok"}
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    """Readiness: the DB answers within READINESS_TIMEOUT and its schema is migrated for this release."""
+    try:
+        async with AsyncSessionLocal() as db:
+            version = await asyncio.wait_for(
+                db.scalar(text("SELECT max(version) FROM schema_migrations")), settings.READINESS_TIMEOUT
+            )
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "detail": f"database: {e!r}"})
+    # A newer schema is fine: migrations stay compatible with the previous release during a rollout
+    if (version or 0) < SCHEMA_VERSION:
+        return JSONResponse(status_code=503, content={
+            "status": "unavailable", "detail": f"schema at version {version}, expected {SCHEMA_VERSION} (python -m app.db.migrate)",
+        })
+    return {"status": "ready", "schema_version": version}
 
 @app.get("/")
 def root():
@@ -3,6 +3,7 @@ from agentbay import AgentBay
 from agentbay.session_params import CreateSessionParams
 from agentbay.browser.browser import BrowserOption
 from app.core.config import settings
+from app.core.metrics import stage
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,7 +19,8 @@ class AgentBayService:
         logger.info("Creating AgentBay session...")
         # Note: client.create is synchronous in the SDK based on docs seen
         params = CreateSessionParams(image_id="browser_latest")
-        result = self.client.create(params)
+        with stage("agentbay_start_session"):
+            result = self.client.create(params)
         
         if not result.success:
             err = result.message if hasattr(result, 'message') else 'Unknown error'
@@ -29,6 +31,10 @@ class AgentBayService:
         logger.info(f"AgentBay session created: {self.session.session_id}")
         return self.session
 
+    async def start_session(self):
+        """Non-blocking start_session_sync: runs the SDK call in a worker thread."""
+        return await asyncio.to_thread(self.start_session_sync)
+
     async def initialize_browser(self):
         """Initializes the browser in the remote session and returns the CDP URL."""
         if not self.session:
@@ -38,7 +44,8 @@ class AgentBayService:
         option = BrowserOption()
         
         # initialize_async is an async method on session.browser
-        success = await self.session.browser.initialize_async(option)
+        with stage("agentbay_initialize_browser"):
+            success = await self.session.browser.initialize_async(option)
         if not success:
              raise Exception("Failed to initialize remote browser")
              
@@ -56,3 +63,7 @@ class AgentBayService:
                 logger.error(f"Error closing session: {e}")
             finally:
                 self.session = None
+
+    async def close_session_async(self):
+        """Non-blocking close_session."""
+        await asyncio.to_thread(self.close_session)
@@ -1,29 +1,75 @@
-from openai import AsyncOpenAI
 from app.core.config import settings
+from app.core.metrics import stage, cache_result, FALLBACKS
+from app.db.models import TemplateCache
+from app.services.llm_client import get_llm_client, estimate_tokens
+from app.services.pattern_mining import mine_patterns, summarize_patterns
+from app.utils.keywords import normalize_keyword
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Tuple
+import asyncio
+import hashlib
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
-client = AsyncOpenAI(
-    api_key=settings.OPENAI_API_KEY,
-    base_url=settings.OPENAI_BASE_URL
-)
+class TemplateGenerationError(Exception):
+    """The LLM call failed or returned no usable templates."""
+
+def template_cache_key(model: str, keyword: str, titles: List[str]) -> str:
+    """Content address of a generation: same model, keyword and title set -> same templates."""
+    payload = json.dumps([model, normalize_keyword(keyword), sorted(titles)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+SYSTEM_PROMPT = "You are a YouTube expert specializing in the Indonesian market."
+
+def _titles(videos: list) -> List[str]:
+    return [v['title'] for v in videos if v.get('title')]
+
+def _strip_code_fence(content: str) -> str:
+    content = content.strip()
+    # Clean potential markdown code blocks
+    if content.startswith("```json"):
+        content = content[7:]
+    elif content.startswith("```"):
+        content = content[3:]
+    if content.endswith("```"):
+        content = content[:-3]
+    return content
+
+def _titles_for_prompt(videos: list, video_titles: List[str]) -> str:
+    """
+    Raw titles for small inputs. From TEMPLATE_PATTERN_SUMMARY_MIN_TITLES titles on, a
+    locally mined pattern summary plus the 10 most viewed titles, which keeps the prompt small.
+    """
+    if len(video_titles) < settings.TEMPLATE_PATTERN_SUMMARY_MIN_TITLES:
+        return json.dumps(video_titles, ensure_ascii=False)
+    stats = mine_patterns((v['title'], v.get('views_num')) for v in videos if v.get('title'))
+    top = sorted((v for v in videos if v.get('title')), key=lambda v: v.get('views_num') or 0, reverse=True)[:10]
+    return summarize_patterns(stats) + "\nMost viewed titles: " + json.dumps([v['title'] for v in top], ensure_ascii=False)
+
+def _valid_templates(value) -> bool:
+    return isinstance(value, list) and bool(value) and all(
+        isinstance(t, dict) and isinstance(t.get("template_text"), str) for t in value
+    )
 
 async def generate_templates(keyword: str, videos: list):
     """
     Generates 10 reusable title templates based on top performing videos.
     videos: List of dicts with 'title' and 'views_num'.
+    Returns [] only when there are no titles; raises TemplateGenerationError if the
+    LLM call fails or its output isn't a non-empty list of templates.
     """
-    if not videos:
-        return []
-
     # Sort validation: ensure we have titles
-    video_titles = [v['title'] for v in videos if v.get('title')]
+    video_titles = _titles(videos)
+    if not video_titles:
+        return []
     
     prompt = f"""
     Analyze these top-performing YouTube video titles for the keyword "{keyword}":
-    {json.dumps(video_titles, ensure_ascii=False)}
+    {_titles_for_prompt(videos, video_titles)}
 
     Create 10 reusable "winning" title templates that would work well for this niche in Indonesia (Bahasa Indonesia).
     Each template should be a generic structure (using brackets like [Topic]) derived from the patterns in the successful videos.
@@ -34,25 +80,192 @@ async def generate_templates(keyword: str, videos: list):
     """
 
     try:
-        response = await client.chat.completions.create(
-            model=settings.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are a YouTube expert specializing in the Indonesian market."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1000
-        )
-        
-        content = response.choices[0].message.content.strip()
-        # Clean potential markdown code blocks
-        if content.startswith("```json"):
-            content = content[7:]
-        if content.endswith("```"):
-            content = content[:-3]
+        with stage("openai_completion"):
+            response = await get_llm_client().chat_completion(
+                model=settings.OPENAI_MODEL,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7,
+                max_tokens=1000
+            )
         
+        content = _strip_code_fence(response.choices[0].message.content)
         templates = json.loads(content)
-        return templates
     except Exception as e:
         logger.error(f"Error generating templates: {e}")
-        return []
+        raise TemplateGenerationError(f"Template generation for '{keyword}' failed: {e}") from e
+    if not _valid_templates(templates):
+        raise TemplateGenerationError(f"Template generation for '{keyword}' returned no valid templates")
+    return templates
+
+async def generate_templates_cached(db: AsyncSession, keyword: str, videos: list) -> Tuple[list, bool]:
+    """
+    generate_templates with a DB-backed cache keyed by (model, normalized keyword, sorted titles),
+    so repeated inputs skip the LLM entirely. Returns (templates, cache_hit); caller commits.
+    """
+    video_titles = _titles(videos)
+    if not video_titles:
+        return [], False
+
+    key = template_cache_key(settings.OPENAI_MODEL, keyword, video_titles)
+    cached = await _get_cached_templates(db, key)
+    cache_result("template", cached is not None)
+    if cached is not None:
+        logger.info(f"Template cache hit for '{keyword}'")
+        return cached, True
+
+    templates = await generate_templates(keyword, videos)
+    await _store_cached_templates(db, key, keyword, templates)
+    return templates, False
+
+async def _get_cached_templates(db: AsyncSession, key: str):
+    cached = await db.get(TemplateCache, key)
+    fresh_after = datetime.now(timezone.utc) - timedelta(seconds=settings.TEMPLATE_CACHE_TTL)
+    if cached and cached.created_at >= fresh_after:
+        return cached.templates
+    return None
+
+async def _store_cached_templates(db: AsyncSession, key: str, keyword: str, templates: list):
+    stmt = insert(TemplateCache).values(
+        cache_key=key,
+        model=settings.OPENAI_MODEL,
+        keyword_key=normalize_keyword(keyword),
+        templates=templates,
+        created_at=datetime.now(timezone.utc),
+    )
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[TemplateCache.cache_key],
+        set_={"templates": stmt.excluded.templates, "created_at": stmt.excluded.created_at},
+    ))
+
+def _batch_prompt(titles_by_keyword: Dict[str, List[str]]) -> str:
+    return f"""
+    Below is a JSON object mapping each keyword to the titles of its top-performing YouTube videos:
+    {json.dumps(titles_by_keyword, ensure_ascii=False)}
+
+    For EACH keyword, create 10 reusable "winning" title templates that would work well for that niche in Indonesia (Bahasa Indonesia).
+    Each template should be a generic structure (using brackets like [Topic]) derived from the patterns in that keyword's successful videos.
+    Provide 2 concrete examples for each template.
+
+    Return ONLY a JSON object whose keys are exactly the keywords above and whose values are arrays of objects with keys: "template_text", "example_1", "example_2".
+    Do not include markdown formatting or explanations.
+    """
+
+def _batch_output_tokens(keywords: int) -> int:
+    return settings.TEMPLATE_BATCH_OUTPUT_TOKENS * keywords
+
+def pack_keyword_batches(titles_by_keyword: Dict[str, List[str]]) -> List[Dict[str, List[str]]]:
+    """
+    Greedily packs keywords into requests that fit TEMPLATE_BATCH_TOKEN_BUDGET
+    (instructions once + every keyword's titles + reserved output per keyword), whose
+    reserved output stays within the model's TEMPLATE_BATCH_MAX_OUTPUT_TOKENS.
+    """
+    base = estimate_tokens([{"content": _batch_prompt({})}], 0)
+    batches, current, used = [], {}, base
+    for keyword, titles in titles_by_keyword.items():
+        cost = estimate_tokens([{"content": json.dumps({keyword: titles}, ensure_ascii=False)}], settings.TEMPLATE_BATCH_OUTPUT_TOKENS)
+        if current and (
+            used + cost > settings.TEMPLATE_BATCH_TOKEN_BUDGET
+            or len(current) >= settings.TEMPLATE_BATCH_MAX_KEYWORDS
+            or _batch_output_tokens(len(current) + 1) > settings.TEMPLATE_BATCH_MAX_OUTPUT_TOKENS
+        ):
+            batches.append(current)
+            current, used = {}, base
+        current[keyword] = titles
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+async def _generate_batch(titles_by_keyword: Dict[str, List[str]]) -> Dict[str, list]:
+    """One request for several keywords; returns only the keywords whose templates validated."""
+    try:
+        with stage("openai_batch_completion"):
+            response = await get_llm_client().chat_completion(
+                model=settings.OPENAI_MODEL,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": _batch_prompt(titles_by_keyword)}
+                ],
+                temperature=0.7,
+                # A single keyword may reserve more than the cap: clamp rather than fail with a 400
+                max_tokens=min(_batch_output_tokens(len(titles_by_keyword)), settings.TEMPLATE_BATCH_MAX_OUTPUT_TOKENS)
+            )
+        parsed = json.loads(_strip_code_fence(response.choices[0].message.content))
+    except Exception as e:
+        logger.error(f"Error generating batched templates for {list(titles_by_keyword)}: {e}")
+        return {}
+    if not isinstance(parsed, dict):
+        logger.error("Batched template response is not a JSON object")
+        return {}
+
+    # Models sometimes change the keyword's case/spacing: match on the normalized form
+    by_key = {normalize_keyword(k): v for k, v in parsed.items()}
+    out = {}
+    for keyword in titles_by_keyword:
+        templates = by_key.get(normalize_keyword(keyword))
+        if _valid_templates(templates):
+            out[keyword] = templates
+    return out
+
+async def generate_templates_batch(videos_by_keyword: Dict[str, list]) -> Dict[str, list]:
+    """
+    Generates templates for many keywords with few requests: keywords are packed into
+    token-budgeted prompts with JSON output keyed by keyword. Keywords whose part of
+    the response is missing or invalid fall back to one generate_templates call each;
+    keywords whose fallback fails too are left out of the result.
+    """
+    titles_by_keyword = {k: _titles(v) for k, v in videos_by_keyword.items() if _titles(v)}
+    batches = pack_keyword_batches(titles_by_keyword)
+    results: Dict[str, list] = {}
+    for partial in await asyncio.gather(*(_generate_batch(b) for b in batches)):
+        results.update(partial)
+
+    missing = [k for k in titles_by_keyword if k not in results]
+    if missing:
+        logger.warning(f"Batched templates missing for {len(missing)} keyword(s), falling back to per-keyword calls")
+        FALLBACKS.labels(kind="template_per_keyword").inc(len(missing))
+        fallback = await asyncio.gather(*(generate_templates(k, videos_by_keyword[k]) for k in missing), return_exceptions=True)
+        for keyword, templates in zip(missing, fallback):
+            if isinstance(templates, TemplateGenerationError):
+                logger.error(str(templates))
+            elif isinstance(templates, BaseException):
+                raise templates
+            else:
+                results[keyword] = templates
+    return results
+
+async def generate_templates_batch_cached(
+    db: AsyncSession, videos_by_keyword: Dict[str, list]
+) -> Tuple[Dict[str, list], Dict[str, bool]]:
+    """
+    generate_templates_batch behind the template cache. Returns (templates, cache_hit) by keyword;
+    keywords whose generation failed are missing from templates. Caller commits.
+    """
+    templates: Dict[str, list] = {}
+    hits: Dict[str, bool] = {}
+    keys = {}
+    to_generate = {}
+    for keyword, videos in videos_by_keyword.items():
+        titles = _titles(videos)
+        if not titles:
+            templates[keyword], hits[keyword] = [], False
+            continue
+        keys[keyword] = template_cache_key(settings.OPENAI_MODEL, keyword, titles)
+        cached = await _get_cached_templates(db, keys[keyword])
+        cache_result("template", cached is not None)
+        if cached is not None:
+            templates[keyword], hits[keyword] = cached, True
+        else:
+            to_generate[keyword] = videos
+
+    if to_generate:
+        generated = await generate_templates_batch(to_generate)
+        for keyword in to_generate:
+            hits[keyword] = False
+            if keyword in generated:
+                templates[keyword] = generated[keyword]
+                await _store_cached_templates(db, keys[keyword], keyword, templates[keyword])
+    return templates, hits
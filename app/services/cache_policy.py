@@ -0,0 +1,106 @@
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.metrics import KEYWORD_CACHE_MATCHES
+from app.db.models import Run
+from app.utils.keywords import normalize_keyword, normalize_locale
+
+logger = logging.getLogger(__name__)
+
+
+class Freshness:
+    """How old a cached run is relative to the TTL that applies to its keyword."""
+
+    def __init__(self, age: float, ttl: int, tier: str):
+        self.age = age
+        self.ttl = ttl
+        self.tier = tier
+
+    @property
+    def stale(self) -> bool:
+        return self.age > self.ttl
+
+
+def max_age_cutoff() -> datetime:
+    """Runs that finished before this are never served, not even stale."""
+    return datetime.now(timezone.utc) - timedelta(seconds=settings.CACHE_MAX_AGE_SECONDS)
+
+
+def tier_for_views(max_views: Optional[int]) -> str:
+    """Popularity tier from the top search result's views (CACHE_TIER_MIN_VIEWS), highest first."""
+    for tier, min_views in sorted(settings.CACHE_TIER_MIN_VIEWS.items(), key=lambda t: -t[1]):
+        if (max_views or 0) >= min_views:
+            return tier
+    return "cold"
+
+
+def ttl_for(keyword: str, tier: str) -> int:
+    """Per-keyword TTL first, then the tier's, then CACHE_TTL_SECONDS (never beyond the max age)."""
+    ttl = settings.CACHE_KEYWORD_TTLS.get(normalize_keyword(keyword))
+    if ttl is None:
+        ttl = settings.CACHE_TIER_TTLS.get(tier, settings.CACHE_TTL_SECONDS)
+    return min(ttl, settings.CACHE_MAX_AGE_SECONDS)
+
+
+def freshness(keyword: str, finished_at: datetime, max_views: Optional[int]) -> Freshness:
+    tier = tier_for_views(max_views)
+    age = (datetime.now(timezone.utc) - finished_at).total_seconds()
+    return Freshness(max(0.0, age), ttl_for(keyword, tier), tier)
+
+
+def max_search_views(status_body: bytes) -> Optional[int]:
+    """Top views among a serialized StatusResponse's search results."""
+    views = [v.get("views_num") or 0 for v in json.loads(status_body).get("search_top", [])]
+    return max(views) if views else None
+
+
+async def find_cached_run(db: AsyncSession, keyword: str, hl: str, gl: str):
+    """
+    Newest successful run within the max age for this keyword, matched on the canonical
+    key (index-only on idx_runs_cache_key_lookup), else, with CACHE_FUZZY_ENABLED, on the
+    most similar canonical keyword above CACHE_FUZZY_THRESHOLD.
+    Returns (row with id/finished_at/keyword, match) where match is raw, canonical or fuzzy,
+    or (None, "miss").
+    """
+    key = normalize_keyword(keyword)
+    hl, gl = normalize_locale(hl, gl)
+    base = (Run.hl == hl, Run.gl == gl, Run.status == "success", Run.finished_at >= max_age_cutoff())
+    result = await db.execute(
+        select(Run.id, Run.finished_at, Run.keyword)
+        .where(Run.keyword_key == key, *base)
+        .order_by(desc(Run.finished_at))
+        .limit(1)
+    )
+    row = result.first()
+    if row is not None:
+        match = "raw" if row.keyword == keyword else "canonical"
+    elif settings.CACHE_FUZZY_ENABLED and key:
+        row = await _find_similar_run(db, key, base)
+        match = "fuzzy" if row is not None else "miss"
+    else:
+        match = "miss"
+    KEYWORD_CACHE_MATCHES.labels(match=match).inc()
+    return row, match
+
+
+async def _find_similar_run(db: AsyncSession, key: str, base: tuple):
+    similarity = func.similarity(Run.keyword_key, key)
+    try:
+        # Savepoint: without pg_trgm (the migration skips it where it can't be installed) the
+        # query fails, and only the savepoint is rolled back, not the caller's transaction
+        async with db.begin_nested():
+            result = await db.execute(
+                select(Run.id, Run.finished_at, Run.keyword)
+                # `%` (pg_trgm's default 0.3 threshold) lets the GIN index narrow the candidates
+                .where(Run.keyword_key.op("%")(key), similarity >= settings.CACHE_FUZZY_THRESHOLD, *base)
+                .order_by(similarity.desc(), desc(Run.finished_at))
+                .limit(1)
+            )
+            return result.first()
+    except Exception as e:
+        logger.warning(f"Fuzzy keyword lookup failed, treating as a miss (is pg_trgm installed?): {e}")
+        return None
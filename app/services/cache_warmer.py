@@ -0,0 +1,167 @@
+"""
+Keeps the head of the keyword distribution warm: keywords whose decayed request
+count (keyword_popularity, see popularity.py) is at least WARMER_MIN_SCORE get a
+new collection shortly before their cached run goes stale, so their requests
+keep hitting a fresh cache instead of paying a cold scrape.
+
+Warm-ups are ordinary queued runs (trigger="warm") limited by
+  - WARMER_MAX_CONCURRENT warm runs queued or running at once, and
+  - an estimated daily AgentBay / OpenAI spend of today's warm runs.
+Every worker runs a pass each WARMER_INTERVAL seconds; an advisory lock lets
+only one of them enqueue at a time, so the budgets hold across workers.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+from sqlalchemy import delete, desc, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.metrics import WARMUPS
+from app.db.models import KeywordPopularity, Run, RunVideo
+from app.db.session import async_engine
+from app.services import cache_policy
+from app.services.job_queue import enqueue_run, INFLIGHT_STATUSES
+from app.services.popularity import decayed_score
+
+logger = logging.getLogger(__name__)
+
+_LOCK_KEY = "cache_warmer"
+
+
+def _run_cost(mode: str, metrics: dict) -> Dict[str, float]:
+    """Estimated spend of one run; unfinished runs (no metrics yet) count in full."""
+    used_browser = mode != "http" or "http_fallback_stage" in metrics
+    return {
+        "agentbay_usd": settings.WARMER_AGENTBAY_COST_PER_RUN_USD if used_browser else 0.0,
+        "openai_usd": 0.0 if metrics.get("template_cache_hit") else settings.WARMER_OPENAI_COST_PER_RUN_USD,
+    }
+
+
+async def spend_today(db: AsyncSession) -> Dict[str, float]:
+    day_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    result = await db.execute(
+        select(Run.mode, Run.metrics).where(Run.trigger == "warm", Run.started_at >= day_start)
+    )
+    spend = {"agentbay_usd": 0.0, "openai_usd": 0.0}
+    for mode, metrics in result.all():
+        for k, v in _run_cost(mode, metrics or {}).items():
+            spend[k] += v
+    return spend
+
+
+def _over_budget(spend: Dict[str, float], cost: Dict[str, float]) -> bool:
+    return (
+        spend["agentbay_usd"] + cost["agentbay_usd"] > settings.WARMER_DAILY_AGENTBAY_BUDGET_USD
+        or spend["openai_usd"] + cost["openai_usd"] > settings.WARMER_DAILY_OPENAI_BUDGET_USD
+    )
+
+
+async def due_keywords(db: AsyncSession) -> List:
+    """
+    Popular keywords (most popular first) whose cached run is within the lead time of
+    going stale, or that have no cached run at all. Keywords whose last warm-up failed
+    within WARMER_LEAD_SECONDS are left alone, so a broken keyword can't eat the budget.
+    """
+    score = decayed_score().label("score")
+    popular = (await db.execute(
+        select(KeywordPopularity.keyword_key, KeywordPopularity.hl, KeywordPopularity.gl, KeywordPopularity.keyword, score)
+        .where(score >= settings.WARMER_MIN_SCORE)
+        .order_by(score.desc())
+        .limit(settings.WARMER_TOP_KEYWORDS)
+    )).all()
+    if not popular:
+        return []
+    keys = list({p.keyword_key for p in popular})
+
+    # Newest successful run per keyword/hl/gl (idx_runs_cache_key_lookup)
+    latest = {
+        (r.keyword_key, r.hl, r.gl): r
+        for r in (await db.execute(
+            select(Run.keyword_key, Run.hl, Run.gl, Run.id, Run.finished_at)
+            .where(Run.keyword_key.in_(keys), Run.status == "success", Run.finished_at >= cache_policy.max_age_cutoff())
+            .distinct(Run.keyword_key, Run.hl, Run.gl)
+            .order_by(Run.keyword_key, Run.hl, Run.gl, desc(Run.finished_at))
+        )).all()
+    }
+    max_views = {}
+    if latest:
+        max_views = dict((await db.execute(
+            select(RunVideo.run_id, func.max(RunVideo.views_num))
+            .where(RunVideo.run_id.in_([r.id for r in latest.values()]), RunVideo.source_type == "search")
+            .group_by(RunVideo.run_id)
+        )).all())
+    failed = set((await db.execute(
+        select(Run.keyword_key, Run.hl, Run.gl)
+        .where(
+            Run.trigger == "warm",
+            Run.status.in_(("failed", "partial")),
+            Run.started_at >= datetime.now(timezone.utc) - timedelta(seconds=settings.WARMER_LEAD_SECONDS),
+        )
+        .distinct()
+    )).all())
+
+    due = []
+    for p in popular:
+        key = (p.keyword_key, p.hl, p.gl)
+        if key in failed:
+            continue
+        cached = latest.get(key)
+        if cached is None:
+            due.append(p)
+            continue
+        fresh = cache_policy.freshness(p.keyword, cached.finished_at, max_views.get(cached.id))
+        lead = min(settings.WARMER_LEAD_SECONDS, fresh.ttl // 2)
+        if fresh.age >= fresh.ttl - lead:
+            due.append(p)
+    return due
+
+
+async def warm_pass(db: AsyncSession) -> dict:
+    inflight = await db.scalar(
+        select(func.count()).select_from(Run).where(Run.trigger == "warm", Run.status.in_(INFLIGHT_STATUSES))
+    )
+    slots = settings.WARMER_MAX_CONCURRENT - (inflight or 0)
+    spend = await spend_today(db)
+    due = await due_keywords(db)
+    # Twenty half-lives on, a keyword's score is a millionth of what it was: forget it
+    await db.execute(delete(KeywordPopularity).where(
+        KeywordPopularity.updated_at < datetime.now(timezone.utc) - timedelta(seconds=20 * settings.POPULARITY_HALF_LIFE)
+    ))
+    await db.commit()
+
+    mode = settings.WARMER_MODE or settings.COLLECT_MODE
+    cost = _run_cost(mode, {})
+    stats = {"due": len(due), "enqueued": 0, "coalesced": 0, "skipped_concurrency": 0, "skipped_budget": 0}
+    for p in due:
+        if slots <= 0:
+            result = "skipped_concurrency"
+        elif _over_budget(spend, cost):
+            result = "skipped_budget"
+        else:
+            # Coalesces with a run already queued for the keyword (a stale-hit refresh, say): no new spend
+            _, coalesced = await enqueue_run(db, p.keyword, hl=p.hl, gl=p.gl, coalesce=True, mode=mode, trigger="warm")
+            result = "coalesced" if coalesced else "enqueued"
+            if not coalesced:
+                slots -= 1
+                for k, v in cost.items():
+                    spend[k] += v
+        stats[result] += 1
+        WARMUPS.labels(result=result).inc()
+    stats.update({k: round(v, 4) for k, v in spend.items()})
+    return stats
+
+
+async def run_warmer() -> dict:
+    """One warmer pass on a dedicated connection holding the warmer's advisory lock."""
+    async with async_engine.connect() as conn:
+        locked = (await conn.execute(text("SELECT pg_try_advisory_lock(hashtext(:key))"), {"key": _LOCK_KEY})).scalar()
+        await conn.commit()
+        if not locked:
+            return {"skipped": True}
+        try:
+            # Bound to the connection, so the session's commits don't hand it back to the pool
+            async with AsyncSession(bind=conn, expire_on_commit=False) as db:
+                return await warm_pass(db)
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(hashtext(:key))"), {"key": _LOCK_KEY})
+            await conn.commit()
@@ -0,0 +1,96 @@
+import logging
+import uuid
+from typing import List, Optional
+from app.core.config import settings
+from app.utils.views_parser import parse_views
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CARD_SELECTOR = "ytd-video-renderer"
+RELATED_CARD_SELECTOR = "ytd-compact-video-renderer"
+# What YouTube serves instead of results when it pushes back: consent interstitial, captcha
+BLOCK_PAGE_SELECTOR = "form[action*='consent'], #captcha-form, iframe[src*='recaptcha']"
+_BLOCK_URL_MARKERS = ("consent.youtube.com", "consent.google.", "google.com/sorry", "/sorry/index")
+
+
+def is_block_url(url: str) -> bool:
+    """Redirected to a consent or "unusual traffic" page."""
+    return any(marker in (url or "") for marker in _BLOCK_URL_MARKERS)
+
+
+# Runs inside the page: reads every card matching `selector` in one CDP round-trip
+# instead of ~6-10 query_selector/text_content/get_attribute calls per card.
+# Selectors on YT change; the fallbacks mirror what the per-element code used.
+_EXTRACT_CARDS_JS = """
+({ selector, limit }) => {
+    const text = (el) => (el && el.textContent ? el.textContent.trim() : "");
+    const first = (root, selectors) => {
+        for (const s of selectors) {
+            const el = root.querySelector(s);
+            if (el) return el;
+        }
+        return null;
+    };
+    let cards = Array.from(document.querySelectorAll(selector));
+    if (limit) cards = cards.slice(0, limit);
+    return cards.map((card) => {
+        const titleEl = first(card, ["a#video-title", "#video-title"]);
+        const linkEl = first(card, ["a#video-title[href]", "a#thumbnail[href]", "a[href*='/watch']"]);
+        const channelEl = first(card, [
+            "#channel-info #text-container",
+            ".ytd-channel-name a",
+            "#channel-name #text",
+        ]);
+        const meta = Array.from(card.querySelectorAll("#metadata-line span")).map(text);
+        const durationEl = first(card, [
+            "ytd-thumbnail-overlay-time-status-renderer #text",
+            "ytd-thumbnail-overlay-time-status-renderer span",
+        ]);
+        return {
+            title: text(titleEl),
+            href: linkEl ? linkEl.getAttribute("href") : null,
+            channel: text(channelEl),
+            meta: meta,
+            duration: text(durationEl),
+        };
+    });
+}
+"""
+
+
+async def extract_cards(page, selector: str, limit: Optional[int] = None) -> List[dict]:
+    """Returns the raw fields of every `selector` card on the page as JSON, in DOM order."""
+    return await page.evaluate(_EXTRACT_CARDS_JS, {"selector": selector, "limit": limit})
+
+
+def parse_video_id(href: Optional[str]) -> Optional[str]:
+    if not href or "/watch" not in href or "v=" not in href:
+        return None
+    return href.split("v=")[1].split("&")[0]
+
+
+def card_to_video(card: dict, run_id: uuid.UUID, source_type: str, rank: int, collected_from: str) -> Optional[dict]:
+    """Turns a raw card from extract_cards into a Video row dict (None for non-video cards)."""
+    video_id = parse_video_id(card.get("href"))
+    if not video_id:
+        return None
+
+    # Metadata line is usually "X views • Y time ago"
+    meta = card.get("meta") or []
+    views_raw = meta[0] if meta else ""
+    published_raw = meta[1] if len(meta) > 1 else ""
+
+    return {
+        "run_id": run_id,
+        "source_type": source_type,
+        "rank": rank,
+        "title": (card.get("title") or "").strip(),
+        "channel_name": (card.get("channel") or "").strip() or "Unknown",
+        "video_id": video_id,
+        "video_url": f"{settings.YOUTUBE_BASE_URL}{card['href']}",
+        "views_raw": views_raw.strip(),
+        "views_num": parse_views(views_raw),
+        "published_raw": published_raw.strip() or None,
+        "duration_raw": (card.get("duration") or "").strip() or None,
+        "collected_from": collected_from,
+    }
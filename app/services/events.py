@@ -0,0 +1,128 @@
+import asyncio
+import json
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Set
+import asyncpg
+from sqlalchemy import text
+from app.core.config import settings
+from app.db.session import async_engine, ASYNC_DATABASE_URL, ASYNC_CONNECT_ARGS
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "run_events"
+# NOTIFY payloads are limited to 8000 bytes; bigger events go out without their data
+_MAX_PAYLOAD = 7900
+
+
+def video_event_data(video: dict) -> dict:
+    """The collector's video dict in the shape of VideoObject."""
+    return {
+        "source": video["source_type"],
+        "rank": video["rank"],
+        "title": video["title"],
+        "channel_name": video.get("channel_name"),
+        "video_id": video["video_id"],
+        "video_url": video["video_url"],
+        "views_raw": video.get("views_raw"),
+        "views_num": video.get("views_num"),
+        "published_raw": video.get("published_raw"),
+        "duration_raw": video.get("duration_raw"),
+    }
+
+
+class EventBroker:
+    """
+    Fans run events out to the subscribers of this process (one asyncio.Queue per SSE stream).
+    With EVENTS_BACKEND=postgres, events are published with NOTIFY and every API process
+    feeds its subscribers from one LISTEN connection, so publishers (workers) and
+    subscribers (any API replica) don't have to share a process.
+    """
+
+    def __init__(self, backend: str):
+        self.backend = backend
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._listener: Optional[asyncpg.Connection] = None
+        self._listener_lock = asyncio.Lock()
+
+    async def publish(self, run_id: uuid.UUID, type: str, data: dict):
+        """Best effort: a failed publish is logged and never fails the run."""
+        event = {"run_id": str(run_id), "type": type, "data": data}
+        if self.backend != "postgres":
+            self._dispatch(event)
+            return
+        payload = json.dumps(event, ensure_ascii=False, default=str)
+        if len(payload.encode()) > _MAX_PAYLOAD:
+            payload = json.dumps({"run_id": str(run_id), "type": type, "data": None, "truncated": True})
+        try:
+            async with async_engine.connect() as conn:
+                await conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+                await conn.commit()
+        except Exception as e:
+            logger.warning(f"Publishing {type} event for run {run_id} failed: {e}")
+
+    @asynccontextmanager
+    async def subscribe(self, run_id: uuid.UUID):
+        """Yields a queue receiving the events of one run while the block is open."""
+        if self.backend == "postgres":
+            await self._ensure_listener()
+        key = str(run_id)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+        self._subscribers.setdefault(key, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(key)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[key]
+
+    def _dispatch(self, event: dict):
+        for queue in self._subscribers.get(event.get("run_id"), ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Slow client: drop the event, the stream re-sends a snapshot when the run finishes
+                logger.warning(f"Event queue full for run {event.get('run_id')}, dropping {event.get('type')}")
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            self._dispatch(json.loads(payload))
+        except ValueError:
+            logger.warning("Ignoring malformed run event payload")
+
+    def _on_listener_closed(self, connection):
+        logger.warning("Run events LISTEN connection closed, reconnecting on next subscribe")
+        self._listener = None
+
+    async def _ensure_listener(self):
+        async with self._listener_lock:
+            if self._listener is not None and not self._listener.is_closed():
+                return
+            dsn = ASYNC_DATABASE_URL.set(drivername="postgresql").render_as_string(hide_password=False)
+            conn = await asyncpg.connect(dsn, **ASYNC_CONNECT_ARGS)
+            conn.add_termination_listener(self._on_listener_closed)
+            await conn.add_listener(CHANNEL, self._on_notify)
+            self._listener = conn
+            logger.info(f"Listening for run events on '{CHANNEL}'")
+
+    async def close(self):
+        if self._listener is not None and not self._listener.is_closed():
+            await self._listener.close()
+        self._listener = None
+
+
+_broker: Optional[EventBroker] = None
+
+
+def get_event_broker() -> EventBroker:
+    global _broker
+    if _broker is None:
+        _broker = EventBroker(settings.EVENTS_BACKEND)
+    return _broker
+
+
+async def publish_event(run_id: uuid.UUID, type: str, data: dict):
+    await get_event_broker().publish(run_id, type, data)
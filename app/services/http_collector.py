@@ -0,0 +1,204 @@
+import json
+import logging
+import uuid
+from typing import Iterator, List, Optional
+from urllib.parse import urlencode
+import httpx
+from app.core.config import settings
+from app.core.metrics import stage
+from app.services.dom_extract import card_to_video, is_block_url
+from app.services.throttle import get_target, CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+# Browser-free collection: search and watch pages are fetched as plain HTML and the
+# results are read from the ytInitialData JSON YouTube embeds for its own client.
+# Any surprise (consent page, captcha, changed layout) raises HttpExtractError and
+# the collector falls back to the browser for the remaining stages.
+
+_MARKERS = ("var ytInitialData = ", 'window["ytInitialData"] = ', "ytInitialData = ")
+_decoder = json.JSONDecoder()
+
+
+class HttpExtractError(Exception):
+    """The page could not be fetched or did not contain the data we need."""
+
+
+class HttpBlockedError(HttpExtractError):
+    """YouTube pushed back (429/403, timeout, consent or captcha page): a throttle signal."""
+
+
+def extract_initial_data(html: str) -> dict:
+    """
+    Parses the ytInitialData object out of a page. raw_decode reads exactly one JSON
+    value starting at the marker and stops there, so the rest of the (large) page is
+    never scanned or copied, and "};" inside strings can't cut the object short the
+    way a regex would.
+    """
+    for marker in _MARKERS:
+        start = html.find(marker)
+        if start != -1:
+            try:
+                data, _ = _decoder.raw_decode(html, start + len(marker))
+            except ValueError as e:
+                raise HttpExtractError(f"ytInitialData is not valid JSON: {e}")
+            if not isinstance(data, dict):
+                raise HttpExtractError("ytInitialData is not an object")
+            return data
+    raise HttpExtractError("ytInitialData not found in page")
+
+
+def _iter_renderers(node, key: str) -> Iterator[dict]:
+    """Depth-first, in document order: every value stored under `key` (e.g. videoRenderer)."""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            for k, v in reversed(list(node.items())):
+                if k == key and isinstance(v, dict):
+                    yield v
+                else:
+                    stack.append(v)
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+
+
+def _text(value) -> str:
+    """YouTube text objects are {"simpleText": ...} or {"runs": [{"text": ...}, ...]}."""
+    if not isinstance(value, dict):
+        return ""
+    if "simpleText" in value:
+        return value["simpleText"] or ""
+    return "".join(run.get("text", "") for run in value.get("runs", []))
+
+
+def _renderer_to_card(renderer: dict) -> Optional[dict]:
+    """Maps a videoRenderer / compactVideoRenderer to the card dict extract_cards returns."""
+    video_id = renderer.get("videoId")
+    if not video_id:
+        return None
+    meta = [t for t in (_text(renderer.get("viewCountText")), _text(renderer.get("publishedTimeText"))) if t]
+    # card_to_video reads views from meta[0]: keep the slot empty when only the date is known
+    if not renderer.get("viewCountText") and meta:
+        meta = ["", *meta]
+    channel = renderer.get("ownerText") or renderer.get("longBylineText") or renderer.get("shortBylineText")
+    return {
+        "title": _text(renderer.get("title")),
+        "href": f"/watch?v={video_id}",
+        "channel": _text(channel),
+        "meta": meta,
+        "duration": _text(renderer.get("lengthText")),
+    }
+
+
+def search_cards(data: dict) -> List[dict]:
+    """Video results of a search page in ranking order (ads, shorts and shelves are skipped)."""
+    primary = data.get("contents", {}).get("twoColumnSearchResultsRenderer", {}).get("primaryContents")
+    if primary is None:
+        raise HttpExtractError("Unexpected search page layout")
+    return [c for c in map(_renderer_to_card, _iter_renderers(primary, "videoRenderer")) if c]
+
+
+def related_cards(data: dict) -> List[dict]:
+    """The "Up next" videos of a watch page."""
+    secondary = data.get("contents", {}).get("twoColumnWatchNextResults", {}).get("secondaryResults")
+    if secondary is None:
+        raise HttpExtractError("Unexpected watch page layout")
+    return [c for c in map(_renderer_to_card, _iter_renderers(secondary, "compactVideoRenderer")) if c]
+
+
+def watch_views(data: dict) -> Optional[str]:
+    for renderer in _iter_renderers(data.get("contents", {}), "videoViewCountRenderer"):
+        return _text(renderer.get("viewCount")) or _text(renderer.get("shortViewCount")) or None
+    return None
+
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """One pooled HTTP/2 client per process: connections to youtube.com are reused across runs."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            http2=True,
+            timeout=settings.HTTP_COLLECT_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_COLLECT_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_COLLECT_MAX_CONNECTIONS,
+            ),
+            headers={"User-Agent": settings.HTTP_COLLECT_USER_AGENT},
+            follow_redirects=True,
+        )
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def fetch_initial_data(url: str, hl: str, gl: str) -> dict:
+    headers = {
+        "Accept-Language": f"{hl}-{gl},{hl};q=0.9",
+        # PREF pins the interface language/region, CONSENT/SOCS skip the EU consent interstitial
+        "Cookie": f"PREF=hl={hl}&gl={gl}; CONSENT=YES+cb; SOCS=CAI",
+    }
+    try:
+        # No waiting on an open breaker here: the collector falls back to the browser instead
+        async with get_target("youtube_http").guard(throttled=(HttpBlockedError,), wait=False):
+            try:
+                response = await get_http_client().get(url, headers=headers)
+            except httpx.TimeoutException as e:
+                raise HttpBlockedError(f"Fetching {url} timed out: {e}")
+            except httpx.HTTPError as e:
+                raise HttpExtractError(f"Fetching {url} failed: {e}")
+            if response.status_code in (403, 429) or is_block_url(str(response.url)):
+                raise HttpBlockedError(f"Fetching {url} was blocked (HTTP {response.status_code}, {response.url})")
+            if response.status_code != 200:
+                raise HttpExtractError(f"Fetching {url} returned HTTP {response.status_code}")
+    except CircuitOpenError as e:
+        raise HttpExtractError(str(e))
+    return extract_initial_data(response.text)
+
+
+async def search_videos(run_id: uuid.UUID, keyword: str, hl: str, gl: str, timings: dict, limit: int = 2) -> List[dict]:
+    query = urlencode({"search_query": keyword, "hl": hl, "gl": gl})
+    with stage("http_search_fetch", timings):
+        data = await fetch_initial_data(f"{settings.YOUTUBE_BASE_URL}/results?{query}", hl, gl)
+    videos = []
+    for i, card in enumerate(search_cards(data)):
+        if len(videos) >= limit:
+            break
+        video = card_to_video(card, run_id, "search", i + 1, "search")
+        if video and video["title"]:
+            videos.append(video)
+    if not videos:
+        raise HttpExtractError(f"No search results parsed for '{keyword}'")
+    return videos
+
+
+async def related_videos(run_id: uuid.UUID, video_url: str, hl: str, gl: str, timings: dict, limit: int = 2) -> List[dict]:
+    with stage("http_related_fetch", timings):
+        data = await fetch_initial_data(video_url, hl, gl)
+    videos = []
+    for i, card in enumerate(related_cards(data)):
+        if len(videos) >= limit:
+            break
+        video = card_to_video(card, run_id, "related_fallback", i + 1, "watch_page_related")
+        if video:
+            videos.append(video)
+    if not videos:
+        raise HttpExtractError(f"No related videos parsed from {video_url}")
+    return videos
+
+
+async def fetch_watch_page_views(video_url: str, hl: str, gl: str) -> Optional[str]:
+    """HTTP counterpart of view_lookup.fetch_watch_page_views."""
+    try:
+        return watch_views(await fetch_initial_data(video_url, hl, gl))
+    except HttpExtractError as e:
+        logger.info(f"Watch page lookup failed for {video_url}: {e}")
+        return None
@@ -0,0 +1,215 @@
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models import Run, Batch
+from app.core.config import settings
+from app.utils.keywords import normalize_keyword, normalize_locale
+
+logger = logging.getLogger(__name__)
+
+
+INFLIGHT_STATUSES = ("queued", "running")
+# Runs with some of their stages saved can be requeued to finish the rest. Failed runs saved
+# nothing (and their status response is cached as final): start a new run with force_refresh.
+RETRYABLE_STATUSES = ("partial",)
+# Collection stages in pipeline order; runs.stages_completed lists the ones whose results are saved
+RUN_STAGES = ("search", "related", "templates")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def enqueue_run(
+    db: AsyncSession,
+    keyword: str,
+    hl: str = "id",
+    gl: str = "ID",
+    coalesce: bool = True,
+    batch_id: Optional[uuid.UUID] = None,
+    mode: Optional[str] = None,
+    trigger: str = "request",
+) -> Tuple[Run, bool]:
+    """
+    Queues a collection run and returns (run, coalesced).
+
+    With coalesce=True, a request for a keyword/hl/gl that already has a queued or
+    running run attaches to that run instead of starting another one. A transaction
+    scoped advisory lock on the normalized key serializes the check-then-insert
+    across API replicas; it is released by the commit below. A coalesced request
+    gets the in-flight run's mode, whatever it asked for.
+    """
+    keyword_key = normalize_keyword(keyword)
+    hl, gl = normalize_locale(hl, gl)
+    if coalesce:
+        lock_key = f"collect:{keyword_key}:{hl}:{gl}"
+        await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(lock_key))))
+        result = await db.execute(
+            select(Run)
+            .where(
+                Run.keyword_key == keyword_key,
+                Run.hl == hl,
+                Run.gl == gl,
+                Run.status.in_(INFLIGHT_STATUSES),
+            )
+            .order_by(Run.started_at.desc())
+            .limit(1)
+        )
+        inflight = result.scalars().first()
+        if inflight:
+            await db.commit()
+            logger.info(f"Coalesced request for '{keyword}' into in-flight run {inflight.id}")
+            return inflight, True
+
+    run = Run(
+        keyword=keyword,
+        keyword_key=keyword_key,
+        hl=hl,
+        gl=gl,
+        status="queued",
+        batch_id=batch_id,
+        mode=mode or settings.COLLECT_MODE,
+        trigger=trigger,
+    )
+    db.add(run)
+    await db.commit()
+    return run, False
+
+
+async def claim_next_run(db: AsyncSession, worker_id: str) -> Optional[Run]:
+    """
+    Claims the oldest queued run for this worker.
+    FOR UPDATE SKIP LOCKED lets many workers poll the same table without
+    blocking on (or double-claiming) each other's rows.
+    """
+    result = await db.execute(
+        select(Run)
+        .where(Run.status == "queued")
+        .order_by(Run.started_at)
+        .with_for_update(skip_locked=True)
+        .limit(1)
+    )
+    run = result.scalars().first()
+    if not run:
+        await db.rollback()
+        return None
+
+    _mark_claimed(run, worker_id)
+    await db.commit()
+    return run
+
+
+async def claim_batch_runs(db: AsyncSession, worker_id: str, batch_id: uuid.UUID, limit: int) -> List[Run]:
+    """
+    Claims up to `limit` more queued runs of a batch, so they can share the browser
+    session of the run that was just claimed. Runs left in the queue are picked up by
+    later claims (from this or any other worker).
+    """
+    if limit <= 0:
+        return []
+    result = await db.execute(
+        select(Run)
+        .where(Run.status == "queued", Run.batch_id == batch_id)
+        .order_by(Run.started_at)
+        .with_for_update(skip_locked=True)
+        .limit(limit)
+    )
+    runs = result.scalars().all()
+    for run in runs:
+        _mark_claimed(run, worker_id)
+    await db.commit()
+    return runs
+
+
+async def get_batch_parallelism(db: AsyncSession, batch_id: uuid.UUID) -> int:
+    batch = await db.get(Batch, batch_id)
+    return batch.parallelism if batch else 1
+
+
+def _mark_claimed(run: Run, worker_id: str):
+    now = _now()
+    run.status = "running"
+    run.worker_id = worker_id
+    run.attempts = (run.attempts or 0) + 1
+    run.heartbeat_at = now
+    run.lease_expires_at = now + timedelta(seconds=settings.JOB_LEASE_SECONDS)
+
+
+async def heartbeat(db: AsyncSession, run_ids: List[uuid.UUID], worker_id: str) -> List[uuid.UUID]:
+    """
+    Extends the lease on this worker's running jobs.
+    Returns the ids whose lease was lost: requeued, taken over by another worker, or
+    given up on by requeue_expired. Runs this worker finished itself are not lost.
+    """
+    now = _now()
+    result = await db.execute(
+        update(Run)
+        .where(Run.id.in_(run_ids), Run.worker_id == worker_id, Run.status == "running")
+        .values(
+            heartbeat_at=now,
+            lease_expires_at=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+        )
+        .returning(Run.id)
+        .execution_options(synchronize_session=False)
+    )
+    renewed = set(result.scalars().all())
+    lost = [run_id for run_id in run_ids if run_id not in renewed]
+    if lost:
+        # Rare: runs that just finished here keep their worker_id (the reaper clears it)
+        result = await db.execute(
+            select(Run.id).where(
+                Run.id.in_(lost), Run.worker_id == worker_id, Run.status.not_in(INFLIGHT_STATUSES)
+            )
+        )
+        finished = set(result.scalars().all())
+        lost = [run_id for run_id in lost if run_id not in finished]
+    await db.commit()
+    return lost
+
+
+async def requeue_expired(db: AsyncSession) -> int:
+    """
+    Puts running jobs whose lease expired (worker crashed or was killed) back in the queue.
+    Jobs that already used up their attempts are marked failed instead.
+    """
+    now = _now()
+    result = await db.execute(
+        select(Run)
+        .where(Run.status == "running", Run.lease_expires_at < now)
+        .with_for_update(skip_locked=True)
+    )
+    expired = result.scalars().all()
+    for run in expired:
+        if (run.attempts or 0) >= settings.JOB_MAX_ATTEMPTS:
+            logger.warning(f"Run {run.id} lease expired after {run.attempts} attempts, giving up")
+            run.status = "partial" if run.stages_completed else "failed"
+            run.finished_at = now
+            run.error_message = f"Lease expired after {run.attempts} attempts"
+        else:
+            logger.warning(f"Run {run.id} lease expired (worker {run.worker_id}), requeueing")
+            run.status = "queued"
+        run.worker_id = None
+        run.lease_expires_at = None
+    await db.commit()
+    return len(expired)
+
+
+async def retry_run(db: AsyncSession, run_id: uuid.UUID) -> bool:
+    """
+    Puts a partial run back in the queue on the same row. The collector
+    skips the stages already in stages_completed, so e.g. a run that only lacks
+    templates never opens a browser again. Returns False if the run is not retryable.
+    """
+    result = await db.execute(
+        update(Run)
+        .where(Run.id == run_id, Run.status.in_(RETRYABLE_STATUSES))
+        .values(status="queued", error_message=None, finished_at=None, attempts=0,
+                worker_id=None, lease_expires_at=None, heartbeat_at=None)
+        .returning(Run.id)
+    )
+    retried = result.scalar() is not None
+    await db.commit()
+    return retried
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Optional
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, RateLimitError
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at `per_minute` tokens per minute."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        amount = min(amount, self.capacity)  # oversized requests wait for a full bucket
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+
+def estimate_tokens(messages, max_tokens: int) -> int:
+    """Rough prompt + completion token count (~4 chars per token) for the TPM limiter."""
+    chars = sum(len(m.get("content") or "") for m in messages)
+    return chars // 4 + max_tokens
+
+
+def _is_retryable(e: Exception) -> bool:
+    if isinstance(e, (RateLimitError, APIConnectionError)):
+        return True
+    return isinstance(e, APIStatusError) and e.status_code >= 500
+
+
+def _retry_after(e: Exception) -> Optional[float]:
+    response = getattr(e, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitedClient:
+    """
+    Shared wrapper around AsyncOpenAI: bounded concurrency, request/token buckets
+    matching the provider's RPM/TPM limits, and retries with full jitter on 429/5xx.
+    Point OPENAI_BASE_URL at any OpenAI-compatible server (e.g. benchmarks/fake_openai.py).
+    """
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        max_concurrency: int,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        max_retries: int,
+        base_delay: float,
+        max_delay: float,
+    ):
+        self.client = client
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+
+    async def chat_completion(self, *, messages, max_tokens: int, **kwargs):
+        estimated = estimate_tokens(messages, max_tokens)
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self._requests.acquire(1)
+                await self._tokens.acquire(estimated)
+                try:
+                    return await self.client.chat.completions.create(
+                        messages=messages, max_tokens=max_tokens, **kwargs
+                    )
+                except Exception as e:
+                    if attempt >= self.max_retries or not _is_retryable(e):
+                        raise
+                    delay = _retry_after(e)
+                    if delay is None:
+                        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                    logger.warning(f"OpenAI request failed ({e.__class__.__name__}), retry {attempt + 1} in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+
+
+_client: Optional[RateLimitedClient] = None
+
+
+def get_llm_client() -> RateLimitedClient:
+    global _client
+    if _client is None:
+        _client = RateLimitedClient(
+            # retries are handled by the wrapper so they go through the rate limiter
+            AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL, max_retries=0),
+            max_concurrency=settings.OPENAI_MAX_CONCURRENCY,
+            requests_per_minute=settings.OPENAI_REQUESTS_PER_MINUTE,
+            tokens_per_minute=settings.OPENAI_TOKENS_PER_MINUTE,
+            max_retries=settings.OPENAI_MAX_RETRIES,
+            base_delay=settings.OPENAI_RETRY_BASE_DELAY,
+            max_delay=settings.OPENAI_RETRY_MAX_DELAY,
+        )
+    return _client
@@ -0,0 +1,179 @@
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+# Common Indonesian chat/title abbreviations -> standard form, so "yg"/"yang" or
+# "gak"/"tidak" count as the same token.
+_ID_NORMALIZE = {
+    "yg": "yang", "dg": "dengan", "dgn": "dengan", "utk": "untuk",
+    "krn": "karena", "karna": "karena", "tp": "tapi", "tpi": "tapi", "sdh": "sudah",
+    "udh": "sudah", "udah": "sudah", "blm": "belum", "blum": "belum", "bgt": "banget",
+    "gak": "tidak", "ga": "tidak", "gk": "tidak", "nggak": "tidak", "ngga": "tidak",
+    "enggak": "tidak", "tdk": "tidak", "aja": "saja", "aj": "saja", "jg": "juga",
+    "dr": "dari", "dri": "dari", "sm": "sama", "bs": "bisa",
+    "org": "orang", "sy": "saya", "gw": "gue", "gua": "gue", "lu": "lo",
+    "bener": "benar", "cuma": "hanya", "cuman": "hanya", "pake": "pakai",
+}
+
+# Function words: kept in skeletons (they carry the pattern) but not counted as n-grams on their own
+_ID_STOPWORDS = {
+    "yang", "dan", "di", "ke", "dari", "ini", "itu", "untuk", "dengan", "pada", "juga",
+    "atau", "ada", "saja", "sama", "tidak", "akan", "bisa", "sudah", "belum", "jadi",
+    "karena", "tapi", "kalau", "kok", "sih", "dong", "nya", "the", "a", "of", "to", "and",
+}
+
+NUM = "<num>"
+SLOT = "[...]"
+_TOKEN = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+_REDUP = re.compile(r"\b([a-z]+)2\b")  # "anak2" -> "anak-anak"
+
+
+def tokenize(title: str) -> List[str]:
+    """Lowercased, NFKC-normalized tokens with Indonesian abbreviations expanded and numbers folded."""
+    text = unicodedata.normalize("NFKC", title or "").lower()
+    text = _REDUP.sub(r"\1-\1", text)
+    tokens = []
+    for tok in _TOKEN.findall(text):
+        if tok.isdigit():
+            tokens.append(NUM)
+        else:
+            tokens.append(_ID_NORMALIZE.get(tok, tok))
+    return tokens
+
+
+class PatternStats:
+    """Result of mine_patterns: weighted n-gram and skeleton frequencies."""
+
+    def __init__(self, titles: int, ngrams: List[dict], skeletons: List[dict]):
+        self.titles = titles
+        self.ngrams = ngrams
+        self.skeletons = skeletons
+
+    def to_dict(self) -> dict:
+        return {"titles": self.titles, "ngrams": self.ngrams, "skeletons": self.skeletons}
+
+
+def _top(ids: np.ndarray, weights: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Vectorized group-by: unique ids with their count and summed weight, top-k by weight."""
+    if ids.size == 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([], dtype=np.float64)
+    uniq, inverse = np.unique(ids, return_inverse=True)
+    counts = np.bincount(inverse)
+    weighted = np.bincount(inverse, weights=weights)
+    k = min(k, uniq.size)
+    top = np.argpartition(-weighted, k - 1)[:k]
+    top = top[np.argsort(-weighted[top], kind="stable")]
+    return uniq[top], counts[top], weighted[top]
+
+
+def mine_patterns(
+    rows: Iterable[Tuple[str, Optional[int]]],
+    max_n: int = 3,
+    top_k: int = 30,
+    min_doc_freq: float = 0.05,
+) -> PatternStats:
+    """
+    Computes n-gram (1..max_n) and skeleton-template frequencies over (title, views_num) rows,
+    weighted by log(1 + views). Skeletons keep tokens that occur in at least `min_doc_freq`
+    of the titles (plus function words and numbers) and collapse everything else into a slot,
+    e.g. "<num> cara [...] yang benar".
+    """
+    vocab: Dict[str, int] = {}
+    token_ids: List[int] = []
+    lengths: List[int] = []
+    views: List[float] = []
+    for title, views_num in rows:
+        tokens = tokenize(title)
+        if not tokens:
+            continue
+        token_ids.extend(vocab.setdefault(t, len(vocab)) for t in tokens)
+        lengths.append(len(tokens))
+        views.append(views_num or 0)
+
+    n_titles = len(lengths)
+    if n_titles == 0:
+        return PatternStats(0, [], [])
+
+    ids = np.asarray(token_ids, dtype=np.int64)
+    lengths_arr = np.asarray(lengths, dtype=np.int64)
+    title_weight = np.log1p(np.asarray(views, dtype=np.float64))
+    # Titles without a view count still count, just less than any viewed title
+    title_weight = np.where(title_weight > 0, title_weight, 0.5)
+    title_of_token = np.repeat(np.arange(n_titles), lengths_arr)
+    starts = np.concatenate(([0], np.cumsum(lengths_arr)[:-1]))
+    pos_in_title = np.arange(ids.size) - np.repeat(starts, lengths_arr)
+
+    id_to_token = np.empty(len(vocab), dtype=object)
+    for tok, i in vocab.items():
+        id_to_token[i] = tok
+    stop_ids = np.fromiter((vocab[t] for t in _ID_STOPWORDS | {NUM} if t in vocab), dtype=np.int64)
+    is_stop = np.isin(ids, stop_ids)
+
+    # --- n-grams: encode each window as one int64 code (base = vocab size) ---
+    base = len(vocab) + 1
+    ngrams = []
+    for n in range(1, max_n + 1):
+        if base ** n >= 2 ** 62:
+            break
+        valid = pos_in_title <= np.repeat(lengths_arr, lengths_arr) - n
+        starts_n = np.nonzero(valid)[0]
+        if starts_n.size == 0:
+            continue
+        codes = np.zeros(starts_n.size, dtype=np.int64)
+        all_stop = np.ones(starts_n.size, dtype=bool)
+        for offset in range(n):
+            codes = codes * base + ids[starts_n + offset]
+            all_stop &= is_stop[starts_n + offset]
+        keep = ~all_stop
+        codes, weights = codes[keep], title_weight[title_of_token[starts_n[keep]]]
+        top_codes, counts, weighted = _top(codes, weights, top_k)
+        for code, count, w in zip(top_codes, counts, weighted):
+            parts = []
+            for _ in range(n):
+                code, tok = divmod(int(code), base)
+                parts.append(id_to_token[tok])
+            ngrams.append({"ngram": " ".join(reversed(parts)), "n": n, "count": int(count), "weighted": round(float(w), 2)})
+    ngrams.sort(key=lambda g: -g["weighted"])
+
+    # --- skeletons: frequent tokens stay, runs of other tokens collapse into one slot ---
+    slot_id = len(vocab)
+    pair_codes = np.unique(title_of_token * base + ids)  # one entry per (title, token)
+    doc_freq = np.bincount(pair_codes % base, minlength=base)
+    frequent = (doc_freq[ids] >= max(2, int(min_doc_freq * n_titles))) | is_stop
+    sk = np.where(frequent, ids, slot_id)
+    repeated_slot = (sk == slot_id) & (pos_in_title > 0) & np.concatenate(([False], sk[:-1] == slot_id))
+    sk = sk[~repeated_slot]
+    sk_lengths = np.bincount(title_of_token[~repeated_slot], minlength=n_titles)
+    sk_starts = np.concatenate(([0], np.cumsum(sk_lengths)[:-1]))
+    sk_pos = np.arange(sk.size) - np.repeat(sk_starts, sk_lengths)
+    # Polynomial hash per title (uint64 arithmetic wraps) groups identical skeletons without Python loops
+    powers = np.power(np.uint64(1_000_003), sk_pos.astype(np.uint64))
+    hashes = np.add.reduceat((sk.astype(np.uint64) + np.uint64(1)) * powers, sk_starts)
+    hashes = (hashes ^ sk_lengths.astype(np.uint64)).view(np.int64)
+
+    top_hashes, counts, weighted = _top(hashes, title_weight, top_k)
+    skeletons = []
+    for h, count, w in zip(top_hashes, counts, weighted):
+        t = int(np.argmax(hashes == h))  # any title with this skeleton spells it out
+        parts = [SLOT if i == slot_id else id_to_token[i] for i in sk[sk_starts[t]:sk_starts[t] + sk_lengths[t]]]
+        if parts == [SLOT]:
+            continue  # only slots: no pattern
+        skeletons.append({"skeleton": " ".join(parts), "count": int(count), "weighted": round(float(w), 2)})
+
+    return PatternStats(n_titles, ngrams[:top_k], skeletons)
+
+
+def summarize_patterns(stats: PatternStats, max_items: int = 10) -> str:
+    """Compact text summary of the top patterns, small enough to send to the LLM instead of raw titles."""
+    lines = [f"Patterns mined from {stats.titles} titles (weighted by views):"]
+    phrases = [g["ngram"] for g in stats.ngrams if g["n"] > 1][:max_items]
+    words = [g["ngram"] for g in stats.ngrams if g["n"] == 1][:max_items]
+    if phrases:
+        lines.append("Top phrases: " + "; ".join(phrases))
+    if words:
+        lines.append("Top words: " + ", ".join(words))
+    for s in stats.skeletons[:max_items]:
+        lines.append(f"- {s['skeleton']} (x{s['count']})")
+    return "\n".join(lines)
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import math
+from typing import Dict, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.models import KeywordPopularity
+from app.db.session import AsyncSessionLocal
+from app.utils.keywords import normalize_keyword, normalize_locale
+
+logger = logging.getLogger(__name__)
+
+
+def decayed_score():
+    """SQL expression: KeywordPopularity.score decayed from updated_at to now()."""
+    elapsed = func.extract("epoch", func.now() - KeywordPopularity.updated_at)
+    return KeywordPopularity.score * func.exp(-math.log(2) * elapsed / settings.POPULARITY_HALF_LIFE)
+
+
+class PopularityTracker:
+    """
+    Counts /collect requests per canonical keyword in memory and adds them to
+    keyword_popularity every POPULARITY_FLUSH_INTERVAL seconds, with one upsert for
+    all keywords. Hot keywords get most of the requests: writing their row on every
+    request would serialize those requests on its row lock.
+    """
+
+    def __init__(self):
+        self._pending: Dict[Tuple[str, str, str], list] = {}  # (key, hl, gl) -> [keyword, count]
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, keyword: str, hl: str, gl: str, count: int = 1):
+        key = normalize_keyword(keyword)
+        if not key:
+            return
+        hl, gl = normalize_locale(hl, gl)
+        entry = self._pending.setdefault((key, hl, gl), [keyword, 0])
+        entry[0] = keyword
+        entry[1] += count
+
+    async def flush(self, db: AsyncSession):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        rows = [
+            {"keyword_key": key, "hl": hl, "gl": gl, "keyword": keyword, "score": float(count), "requests": count}
+            for (key, hl, gl), (keyword, count) in sorted(pending.items())
+        ]
+        stmt = insert(KeywordPopularity).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[KeywordPopularity.keyword_key, KeywordPopularity.hl, KeywordPopularity.gl],
+            set_={
+                # Decay the stored score to now, then add the new requests
+                "score": decayed_score() + stmt.excluded.score,
+                "requests": KeywordPopularity.requests + stmt.excluded.requests,
+                "keyword": stmt.excluded.keyword,
+                "updated_at": func.now(),
+            },
+        )
+        try:
+            await db.execute(stmt)
+            await db.commit()
+        except Exception as e:
+            # Counts are a heuristic: losing one interval's worth is fine, failing requests is not
+            logger.warning(f"Flushing keyword popularity failed: {e}")
+            await db.rollback()
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(settings.POPULARITY_FLUSH_INTERVAL)
+            async with AsyncSessionLocal() as db:
+                await self.flush(db)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        async with AsyncSessionLocal() as db:
+            await self.flush(db)
+
+
+_tracker: Optional[PopularityTracker] = None
+
+
+def get_popularity_tracker() -> PopularityTracker:
+    global _tracker
+    if _tracker is None:
+        _tracker = PopularityTracker()
+    return _tracker
@@ -0,0 +1,91 @@
+"""
+Partition maintenance and retention for run_videos:
+
+    python -m app.services.retention            # one pass
+    python -m app.services.retention --dry-run  # only report what a pass would do
+
+A pass creates the upcoming monthly partitions and detaches months older than
+RUN_VIDEOS_RETENTION_MONTHS: into RUN_VIDEOS_ARCHIVE_SCHEMA (still queryable, dump
+and drop it at will) or, with an empty archive schema, drops them and the
+canonical videos no remaining run refers to. Every worker runs a pass each
+RETENTION_INTERVAL seconds; an advisory lock lets only one of them do the work.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timezone
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from app.core.config import settings
+from app.db.session import async_engine
+from app.db.partitions import PARENT, add_months, ensure_partitions, list_partitions, month_start
+
+logger = logging.getLogger(__name__)
+
+_LOCK_KEY = "run_videos_retention"
+_PRUNE_BATCH = 10000
+
+
+def retention_cutoff() -> datetime:
+    """Start of the oldest month that is kept."""
+    current = month_start(datetime.now(timezone.utc).date())
+    oldest = add_months(current, -settings.RUN_VIDEOS_RETENTION_MONTHS)
+    return datetime(oldest.year, oldest.month, 1, tzinfo=timezone.utc)
+
+
+def _retention_pass(conn: Connection, dry_run: bool = False) -> dict:
+    if not conn.execute(text("SELECT pg_try_advisory_xact_lock(hashtext(:key))"), {"key": _LOCK_KEY}).scalar():
+        return {"skipped": True}
+    # DETACH takes a short exclusive lock on run_videos: give up rather than queue behind long queries
+    conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+
+    cutoff = retention_cutoff()
+    expired = [name for name, month in list_partitions(conn) if month is not None and month < cutoff.date()]
+    stats = {"cutoff": cutoff.date().isoformat(), "expired": expired, "created": [], "videos_pruned": 0}
+    if dry_run:
+        return stats
+
+    stats["created"] = ensure_partitions(conn)
+    archive = settings.RUN_VIDEOS_ARCHIVE_SCHEMA
+    if expired and archive:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {archive}"))
+    for name in expired:
+        conn.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+        if archive:
+            conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {archive}"))
+        else:
+            conn.execute(text(f"DROP TABLE {name}"))
+        logger.info(f"Retention: {'archived' if archive else 'dropped'} {name}")
+
+    if not archive:
+        # Archived partitions keep their foreign keys to videos, so canonical rows are only pruned when dropping
+        while True:
+            pruned = conn.execute(text(
+                "DELETE FROM videos WHERE video_id IN ("
+                " SELECT v.video_id FROM videos v WHERE v.last_seen_at < :cutoff"
+                " AND NOT EXISTS (SELECT 1 FROM run_videos rv WHERE rv.video_id = v.video_id)"
+                " LIMIT :n)"
+            ), {"cutoff": cutoff, "n": _PRUNE_BATCH}).rowcount
+            stats["videos_pruned"] += pruned
+            if pruned < _PRUNE_BATCH:
+                break
+    return stats
+
+
+async def run_retention(dry_run: bool = False) -> dict:
+    async with async_engine.begin() as conn:
+        return await conn.run_sync(_retention_pass, dry_run)
+
+
+async def _main(dry_run: bool):
+    try:
+        print(await run_retention(dry_run))
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create upcoming run_videos partitions and apply retention.")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(_main(args.dry_run))
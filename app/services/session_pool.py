@@ -0,0 +1,264 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, List, Optional
+
+from playwright.async_api import async_playwright, Browser, BrowserContext, Playwright
+from app.services.agentbay import AgentBayService
+from app.core.config import settings
+from app.core.metrics import stage
+from app.services.throttle import get_target
+
+logger = logging.getLogger(__name__)
+
+
+class PooledSession:
+    """An AgentBay session with an initialized remote browser and a live CDP connection."""
+
+    def __init__(self, service: AgentBayService, cdp_url: str, browser: Browser):
+        self.service = service
+        self.cdp_url = cdp_url
+        self.browser = browser
+        self.uses = 0
+        self.last_used = time.monotonic()
+        self._contexts: List[BrowserContext] = []
+
+    async def new_context(self, **kwargs) -> BrowserContext:
+        """Opens a fresh browser context that is closed again when the lease ends."""
+        context = await self.browser.new_context(**kwargs)
+        self._contexts.append(context)
+        return context
+
+    async def release_context(self, context: BrowserContext):
+        """Closes a context before the lease ends (sessions shared by several jobs)."""
+        if context in self._contexts:
+            self._contexts.remove(context)
+        try:
+            await context.close()
+        except Exception as e:
+            logger.warning(f"Error closing browser context: {e}")
+
+    async def close_contexts(self):
+        contexts, self._contexts = self._contexts, []
+        for context in contexts:
+            try:
+                await context.close()
+            except Exception as e:
+                logger.warning(f"Error closing browser context: {e}")
+
+    def is_expired(self, max_uses: int, idle_ttl: int) -> bool:
+        if self.uses >= max_uses:
+            return True
+        return time.monotonic() - self.last_used > idle_ttl
+
+    async def is_healthy(self, timeout: float = 5.0) -> bool:
+        """Cheap CDP round-trip to make sure the remote browser still answers."""
+        if not self.browser.is_connected():
+            return False
+        try:
+            cdp = await self.browser.new_browser_cdp_session()
+            await asyncio.wait_for(cdp.send("Browser.getVersion"), timeout=timeout)
+            await cdp.detach()
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled session {self.service.session.session_id} failed health check: {e}")
+            return False
+
+
+class SessionPool:
+    """
+    Keeps `size` pre-initialized AgentBay sessions around and leases them to jobs.
+    Sessions are recycled after `max_uses` leases or `idle_ttl` seconds of idling,
+    health-checked before being handed out, and replaced in the background.
+    With size=0 every lease creates (and tears down) its own session.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        max_uses: int,
+        idle_ttl: int,
+        acquire_timeout: int,
+        maintenance_interval: int,
+        service_factory: Callable[[], AgentBayService] = AgentBayService,
+    ):
+        self.size = size
+        self.max_uses = max_uses
+        self.idle_ttl = idle_ttl
+        self.acquire_timeout = acquire_timeout
+        self.maintenance_interval = maintenance_interval
+        self.service_factory = service_factory
+
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._total = 0  # idle + leased + being created
+        self._playwright: Optional[Playwright] = None
+        self._maintainer: Optional[asyncio.Task] = None
+        self._refill_event = asyncio.Event()
+        self._start_lock = asyncio.Lock()
+        self._closed = False
+
+    async def start(self):
+        async with self._start_lock:
+            if self._playwright is not None:
+                return
+            self._closed = False
+            self._playwright = await async_playwright().start()
+            if self.size > 0:
+                self._maintainer = asyncio.create_task(self._maintain())
+                self._refill_event.set()
+            logger.info(f"Session pool started (size={self.size})")
+
+    async def close(self):
+        self._closed = True
+        if self._maintainer:
+            self._maintainer.cancel()
+            try:
+                await self._maintainer
+            except asyncio.CancelledError:
+                pass
+            self._maintainer = None
+        while not self._idle.empty():
+            await self._discard(self._idle.get_nowait())
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+        logger.info("Session pool closed.")
+
+    @asynccontextmanager
+    async def lease(self):
+        """Leases a session for the duration of the block."""
+        await self.start()
+        if self.size <= 0:
+            pooled = await self._create()
+            try:
+                yield pooled
+            finally:
+                await pooled.close_contexts()
+                await self._discard(pooled, counted=False)
+            return
+
+        with stage("session_lease_wait"):
+            pooled = await self._acquire()
+        try:
+            yield pooled
+        finally:
+            await self._release(pooled)
+
+    async def _acquire(self) -> PooledSession:
+        started = time.monotonic()
+        deadline = started + self.acquire_timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                breaker_deadline = started + self.acquire_timeout + settings.BREAKER_MAX_WAIT_SECONDS
+                if get_target("agentbay").breaker.state == "closed" or deadline >= breaker_deadline:
+                    raise Exception("Timed out waiting for a pooled AgentBay session")
+                # AgentBay is failing and its breaker holds off new sessions: wait a while longer
+                # (BREAKER_MAX_WAIT_SECONDS) rather than fail the run right away
+                deadline = breaker_deadline
+                continue
+            self._refill_event.set()
+            try:
+                pooled = await asyncio.wait_for(self._idle.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                continue
+            if pooled.is_expired(self.max_uses, self.idle_ttl) or not await pooled.is_healthy():
+                await self._discard(pooled)
+                continue
+            return pooled
+
+    async def _release(self, pooled: PooledSession):
+        await pooled.close_contexts()
+        pooled.uses += 1
+        pooled.last_used = time.monotonic()
+        if self._closed or not pooled.browser.is_connected() or pooled.is_expired(self.max_uses, self.idle_ttl):
+            await self._discard(pooled)
+        else:
+            self._idle.put_nowait(pooled)
+
+    async def _create(self) -> PooledSession:
+        service = self.service_factory()
+        # Any failure to get a working session counts towards the "agentbay" breaker: while it
+        # is open, creations wait instead of hammering the API
+        async with get_target("agentbay").guard(throttled=(Exception,)):
+            await service.start_session()
+            try:
+                cdp_url = await service.initialize_browser()
+                logger.info("Connecting to remote browser...")
+                with stage("connect_over_cdp"):
+                    browser = await self._playwright.chromium.connect_over_cdp(cdp_url)
+            except Exception:
+                await service.close_session_async()
+                raise
+        return PooledSession(service, cdp_url, browser)
+
+    async def _discard(self, pooled: PooledSession, counted: bool = True):
+        if counted:
+            self._total -= 1
+            self._refill_event.set()
+        try:
+            await pooled.browser.close()
+        except Exception as e:
+            logger.warning(f"Error disconnecting pooled browser: {e}")
+        await pooled.service.close_session_async()
+
+    async def _prune_idle(self):
+        """Drops idle sessions that expired or died while nobody was using them."""
+        for _ in range(self._idle.qsize()):
+            pooled = self._idle.get_nowait()
+            if pooled.is_expired(self.max_uses, self.idle_ttl) or not pooled.browser.is_connected():
+                await self._discard(pooled)
+            else:
+                self._idle.put_nowait(pooled)
+
+    async def _refill(self):
+        missing = self.size - self._total
+        if missing <= 0 or get_target("agentbay").breaker.is_open():
+            # Refilled on a later maintenance pass, once the breaker has cooled down
+            return
+        self._total += missing
+        results = await asyncio.gather(*(self._create() for _ in range(missing)), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                self._total -= 1
+                logger.error(f"Failed to create pooled session: {result}")
+            else:
+                self._idle.put_nowait(result)
+
+    async def _maintain(self):
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._refill_event.wait(), timeout=self.maintenance_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._refill_event.clear()
+            try:
+                await self._prune_idle()
+                await self._refill()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Session pool maintenance failed: {e}")
+
+
+_pool: Optional[SessionPool] = None
+
+
+def get_session_pool() -> SessionPool:
+    global _pool
+    if _pool is None:
+        _pool = SessionPool(
+            size=settings.SESSION_POOL_SIZE,
+            max_uses=settings.SESSION_POOL_MAX_USES,
+            idle_ttl=settings.SESSION_POOL_IDLE_TTL,
+            acquire_timeout=settings.SESSION_POOL_ACQUIRE_TIMEOUT,
+            maintenance_interval=settings.SESSION_POOL_MAINTENANCE_INTERVAL,
+        )
+    return _pool
+
+
+def set_session_pool(pool: Optional[SessionPool]):
+    """Replaces the process-wide pool, e.g. with one built on a local browser for benchmarks."""
+    global _pool
+    _pool = pool
@@ -0,0 +1,73 @@
+import hashlib
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+from app.core.config import settings
+
+# A run in one of these states never changes again, so its status response can be cached
+# (for STATUS_CACHE_TTL_SECONDS: the video metadata in it comes from the shared videos table,
+# which later runs update)
+TERMINAL_STATUSES = ("success", "failed")
+# Runs that are done for now; partial runs can still be retried, so they are not cached
+FINISHED_STATUSES = TERMINAL_STATUSES + ("partial",)
+
+
+class CachedStatus:
+    __slots__ = ("body", "etag", "created_at")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.created_at = time.monotonic()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header value matches the ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class StatusCache:
+    """In-process LRU of serialized status responses, bounded by total body size and entry age."""
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._entries: "OrderedDict[uuid.UUID, CachedStatus]" = OrderedDict()
+
+    def get(self, run_id: uuid.UUID) -> Optional[CachedStatus]:
+        entry = self._entries.get(run_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.created_at >= self.ttl:
+            # Rebuilt from the DB: picks up metadata later runs wrote to the shared video rows
+            self.invalidate(run_id)
+            return None
+        self._entries.move_to_end(run_id)
+        return entry
+
+    def put(self, run_id: uuid.UUID, entry: CachedStatus):
+        if len(entry.body) > self.max_bytes:
+            return
+        old = self._entries.pop(run_id, None)
+        if old is not None:
+            self.size -= len(old.body)
+        self._entries[run_id] = entry
+        self.size += len(entry.body)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted.body)
+
+    def invalidate(self, run_id: uuid.UUID):
+        old = self._entries.pop(run_id, None)
+        if old is not None:
+            self.size -= len(old.body)
+
+
+status_cache = StatusCache(settings.STATUS_CACHE_MAX_BYTES, settings.STATUS_CACHE_TTL_SECONDS)
@@ -0,0 +1,246 @@
+"""
+Adaptive rate limiting and circuit breaking per scraping target (per worker process):
+
+- "youtube": browser page loads (search, watch pages) through AgentBay
+- "youtube_http": page fetches of the browser-free collector
+- "agentbay": AgentBay session creation
+
+Each target has an AIMD concurrency limit: every success raises it by 1/limit (about
++1 per round of requests), a throttle signal (selector timeout, consent/captcha
+page, 429, failed session creation) halves it, down to THROTTLE_MIN_LIMIT. After
+BREAKER_FAILURE_THRESHOLD signals in a row the target's breaker opens: callers wait
+instead of burning a timeout each, and the worker stops claiming new runs, so they
+stay queued. A running collection waits at most BREAKER_MAX_WAIT_SECONDS, then its
+stage fails (CircuitOpenError) and it gives its session back. After the cooldown a
+single request probes the target; success closes the breaker, failure reopens it with
+twice the cooldown (up to BREAKER_MAX_COOLDOWN_SECONDS).
+
+State is exported as Prometheus gauges on the worker's metrics port.
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple, Type
+from app.core.config import settings
+from app.core.metrics import BREAKER_STATE, BREAKER_TRIPS, THROTTLE_IN_FLIGHT, THROTTLE_LIMIT, THROTTLE_SIGNALS
+
+logger = logging.getLogger(__name__)
+
+TARGETS = ("youtube", "youtube_http", "agentbay")
+# Breakers that stop the worker from claiming runs: every run may need the browser
+CLAIM_GATES = ("youtube", "agentbay")
+
+_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class CircuitOpenError(Exception):
+    """The target's breaker is open (raised to callers that chose not to wait, or waited too long)."""
+
+
+class AdaptiveLimiter:
+    """AIMD limit on concurrent requests to one target."""
+
+    def __init__(self, name: str, initial: int, minimum: int, maximum: int, decrease_factor: float):
+        self.name = name
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._changed = asyncio.Condition()
+        THROTTLE_LIMIT.labels(target=name).set(self.limit)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Holds one of the limit's slots; yields the time it was granted."""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        THROTTLE_IN_FLIGHT.labels(target=self.name).set(self.in_flight)
+        try:
+            yield time.monotonic()
+        finally:
+            async with self._changed:
+                self.in_flight -= 1
+                self._changed.notify_all()
+            THROTTLE_IN_FLIGHT.labels(target=self.name).set(self.in_flight)
+
+    def on_success(self):
+        self._set(min(self.maximum, self.limit + 1 / self.limit))
+
+    def on_throttle(self, started_at: float):
+        # Requests started before the last decrease ran under the old limit: one burst halves it once
+        if started_at < self._last_decrease:
+            return
+        self._last_decrease = time.monotonic()
+        self._set(max(self.minimum, self.limit * self.decrease_factor))
+        logger.warning(f"Throttled by {self.name}: concurrency limit now {int(self.limit)}")
+
+    def _set(self, limit: float):
+        # No wake-up needed when it grows: anyone waiting waits for a slot that is in use, and its release notifies
+        self.limit = limit
+        THROTTLE_LIMIT.labels(target=self.name).set(limit)
+
+
+class CircuitBreaker:
+    """Closed -> open after `threshold` failures in a row -> half open (one probe) after the cooldown."""
+
+    def __init__(self, name: str, threshold: int, cooldown: float, max_cooldown: float):
+        self.name = name
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._changed = asyncio.Event()
+        BREAKER_STATE.labels(target=name).set(0)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning(f"Circuit breaker {self.name}: {self.state} -> {state}")
+        self.state = state
+        BREAKER_STATE.labels(target=self.name).set(_STATE_VALUES[state])
+        # Wake the waiters, they re-check
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def is_open(self) -> bool:
+        """Open and still cooling down (a half-open breaker takes a probe)."""
+        return self.state == "open" and time.monotonic() - self.opened_at < self.cooldown
+
+    def remaining(self) -> float:
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at)) if self.state == "open" else 0.0
+
+    def try_acquire(self) -> bool:
+        """Whether a request may go out now; in half open only the probe may."""
+        if self.state == "open" and not self.is_open():
+            self._set_state("half_open")
+        if self.state == "closed":
+            return True
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    async def wait(self, max_wait: Optional[float] = None):
+        """Waits until a request may go out; raises CircuitOpenError after `max_wait` seconds."""
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        while not self.try_acquire():
+            left = None if deadline is None else deadline - time.monotonic()
+            if left is not None and left <= 0:
+                raise CircuitOpenError(f"Circuit breaker {self.name} still {self.state} after {max_wait:g}s")
+            # Re-check when the cooldown ends (a half-open breaker has none) or the wait runs out
+            timeouts = [t for t in (self.remaining(), left) if t]
+            changed = self._changed
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=min(timeouts) if timeouts else None)
+            except asyncio.TimeoutError:
+                pass
+
+    def record_success(self):
+        self.failures = 0
+        self._probing = False
+        self.cooldown = self.base_cooldown
+        if self.state != "closed":
+            self._set_state("closed")
+
+    def record_failure(self):
+        self.failures += 1
+        probe_failed = self._probing
+        self._probing = False
+        if probe_failed:
+            self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+        if probe_failed or (self.state == "closed" and self.failures >= self.threshold):
+            self.opened_at = time.monotonic()
+            BREAKER_TRIPS.labels(target=self.name).inc()
+            self._set_state("open")
+
+    def record_neutral(self):
+        """The request failed for an unrelated reason: let another one probe."""
+        if self._probing:
+            self._probing = False
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+
+class Target:
+    def __init__(self, name: str):
+        self.name = name
+        self.limiter = AdaptiveLimiter(
+            name,
+            initial=settings.THROTTLE_INITIAL_LIMIT,
+            minimum=settings.THROTTLE_MIN_LIMIT,
+            maximum=settings.THROTTLE_MAX_LIMIT,
+            decrease_factor=settings.THROTTLE_DECREASE_FACTOR,
+        )
+        self.breaker = CircuitBreaker(
+            name,
+            threshold=settings.BREAKER_FAILURE_THRESHOLD,
+            cooldown=settings.BREAKER_COOLDOWN_SECONDS,
+            max_cooldown=settings.BREAKER_MAX_COOLDOWN_SECONDS,
+        )
+
+    @asynccontextmanager
+    async def guard(self, throttled: Tuple[Type[BaseException], ...] = (), wait: bool = True):
+        """
+        Runs the block as one request to the target: waits for the breaker, up to
+        BREAKER_MAX_WAIT_SECONDS (CircuitOpenError after that, or right away with
+        wait=False), and a concurrency slot. Exceptions in
+        `throttled` count as throttle signals, a clean exit as a success; anything else
+        only frees the slot.
+        """
+        if wait:
+            await self.breaker.wait(settings.BREAKER_MAX_WAIT_SECONDS)
+        elif not self.breaker.try_acquire():
+            raise CircuitOpenError(f"Circuit breaker {self.name} is open")
+        started_at = time.monotonic()
+        try:
+            async with self.limiter.slot() as started_at:
+                yield
+        except throttled:
+            THROTTLE_SIGNALS.labels(target=self.name).inc()
+            self.limiter.on_throttle(started_at)
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.record_neutral()
+            raise
+        else:
+            self.limiter.on_success()
+            self.breaker.record_success()
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": int(self.limiter.limit),
+            "in_flight": self.limiter.in_flight,
+            "breaker": self.breaker.state,
+            "failures": self.breaker.failures,
+            "reopens_in": round(self.breaker.remaining(), 1),
+        }
+
+
+_targets: Dict[str, Target] = {}
+
+
+def get_target(name: str) -> Target:
+    if name not in _targets:
+        _targets[name] = Target(name)
+    return _targets[name]
+
+
+def blocking_breaker() -> Optional[Target]:
+    """A claim-gating target whose breaker is open, if any: the worker leaves runs queued meanwhile."""
+    for name in CLAIM_GATES:
+        target = get_target(name)
+        if target.breaker.is_open():
+            return target
+    return None
+
+
+def snapshot() -> Dict[str, dict]:
+    return {name: get_target(name).snapshot() for name in TARGETS}
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.metrics import stage, cache_result, FALLBACKS
+from app.db.models import VideoViewCache
+from app.services.throttle import get_target
+from app.utils.views_parser import parse_views
+
+logger = logging.getLogger(__name__)
+
+# Running average of watch-page lookup time, used to estimate the time a cache hit saves
+# when a run had no lookups of its own to measure.
+_avg_fetch_ms: Optional[float] = None
+
+
+def _record_fetch_ms(ms: float):
+    global _avg_fetch_ms
+    _avg_fetch_ms = ms if _avg_fetch_ms is None else 0.8 * _avg_fetch_ms + 0.2 * ms
+
+
+def needs_views(video: dict) -> bool:
+    return not video.get("views_num") or not video.get("views_raw")
+
+
+async def get_cached_views(db: AsyncSession, video_ids: List[str]) -> Dict[str, VideoViewCache]:
+    """Returns the non-expired cache entries for the given video ids."""
+    if not video_ids:
+        return {}
+    fresh_after = datetime.now(timezone.utc) - timedelta(seconds=settings.VIEW_CACHE_TTL)
+    result = await db.execute(
+        select(VideoViewCache).where(
+            VideoViewCache.video_id.in_(video_ids),
+            VideoViewCache.fetched_at >= fresh_after,
+        )
+    )
+    return {row.video_id: row for row in result.scalars().all()}
+
+
+async def store_views(db: AsyncSession, videos: List[dict]):
+    """
+    Upserts the view counts of videos that have one (caller commits). Counts served
+    from the cache are skipped: re-stamping them would keep the entry fresh forever.
+    """
+    rows = {}
+    for v in videos:
+        if not needs_views(v) and v.get("collected_from") != "view_cache":
+            rows[v["video_id"]] = {
+                "video_id": v["video_id"],
+                "views_raw": v["views_raw"],
+                "views_num": v["views_num"],
+                "collected_from": v.get("collected_from"),
+                "fetched_at": datetime.now(timezone.utc),
+            }
+    if not rows:
+        return
+    stmt = insert(VideoViewCache).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[VideoViewCache.video_id],
+        set_={
+            "views_raw": stmt.excluded.views_raw,
+            "views_num": stmt.excluded.views_num,
+            "collected_from": stmt.excluded.collected_from,
+            "fetched_at": stmt.excluded.fetched_at,
+        },
+    )
+    await db.execute(stmt)
+
+
+async def fetch_watch_page_views(context, video_url: str) -> Optional[str]:
+    """Opens the watch page in a new tab and reads the view count text."""
+    video_page = await context.new_page()
+    try:
+        # Counts against the "youtube" concurrency limit; a lookup that fails is no throttle signal
+        async with get_target("youtube").guard():
+            await video_page.goto(video_url, wait_until="domcontentloaded")
+            # Selector for views on watch page: #info-text #count or #view-count
+            # Modern YT: #description-inner #info span (often "1.2M views")
+            await video_page.wait_for_selector("#description", timeout=settings.VIEW_LOOKUP_TIMEOUT)
+        v_el = await video_page.query_selector("ytd-watch-metadata #description-inner #info span")
+        if v_el:
+            return (await v_el.text_content() or "").strip()
+    except Exception as e:
+        logger.info(f"Watch page lookup failed for {video_url}: {e}")
+    finally:
+        await video_page.close()
+    return None
+
+
+async def resolve_missing_views(
+    db: AsyncSession,
+    context,
+    videos: List[dict],
+    fetch_views: Optional[Callable[[str], Awaitable[Optional[str]]]] = None,
+) -> dict:
+    """
+    Fills in views for videos whose card had none: first from the view cache, then by
+    opening the remaining watch pages in parallel tabs (VIEW_LOOKUP_CONCURRENCY at a time).
+    `fetch_views(video_url)` replaces the browser tab, e.g. with a plain HTTP fetch
+    (http_collector), in which case `context` is not used.
+    Updates the dicts in place and returns per-run lookup stats.
+    """
+    if fetch_views is None:
+        async def fetch_views(video_url: str) -> Optional[str]:
+            return await fetch_watch_page_views(context, video_url)
+
+    missing = [v for v in videos if needs_views(v)]
+    stats = {"view_lookups": len(missing), "view_cache_hits": 0, "view_fetches": 0}
+    if not missing:
+        return stats
+
+    cached = await get_cached_views(db, list({v["video_id"] for v in missing}))
+    to_fetch = []
+    for v in missing:
+        hit = cached.get(v["video_id"])
+        if hit and hit.views_num:
+            v["views_raw"] = hit.views_raw
+            v["views_num"] = hit.views_num
+            v["collected_from"] = "view_cache"
+            stats["view_cache_hits"] += 1
+        else:
+            to_fetch.append(v)
+    cache_result("view", True, stats["view_cache_hits"])
+    cache_result("view", False, len(to_fetch))
+    if to_fetch:
+        FALLBACKS.labels(kind="watch_page_views").inc(len(to_fetch))
+
+    semaphore = asyncio.Semaphore(settings.VIEW_LOOKUP_CONCURRENCY)
+    fetch_ms = []
+
+    async def fetch(video):
+        async with semaphore:
+            logger.info(f"Views missing for {video['video_id']}, opening watch page...")
+            started = time.perf_counter()
+            with stage("watch_page_views"):
+                views_raw = await fetch_views(video["video_url"])
+            fetch_ms.append((time.perf_counter() - started) * 1000)
+        if views_raw:
+            video["views_raw"] = views_raw
+            video["views_num"] = parse_views(views_raw)
+            video["collected_from"] = "watch_page"
+
+    await asyncio.gather(*(fetch(v) for v in to_fetch))
+    for ms in fetch_ms:
+        _record_fetch_ms(ms)
+
+    stats["view_fetches"] = len(to_fetch)
+    stats["view_cache_hit_rate"] = round(stats["view_cache_hits"] / len(missing), 3)
+    avg_ms = sum(fetch_ms) / len(fetch_ms) if fetch_ms else (_avg_fetch_ms or 0.0)
+    stats["view_fetch_avg_ms"] = round(avg_ms, 1)
+    stats["view_time_saved_ms"] = round(stats["view_cache_hits"] * avg_ms, 1)
+    logger.info(
+        f"View lookups: {stats['view_cache_hits']}/{len(missing)} cache hits, "
+        f"{len(to_fetch)} watch page fetches, ~{stats['view_time_saved_ms']:.0f}ms saved"
+    )
+    return stats
@@ -1,236 +1,412 @@
 import asyncio
 import logging
-from playwright.async_api import async_playwright
-from app.services.agentbay import AgentBayService
-from app.utils.views_parser import parse_views
-from app.db.session import SessionLocal
-from app.db.models import Run, Video
-from sqlalchemy.orm import Session
-from datetime import datetime
+from app.services.session_pool import get_session_pool
+from app.services.dom_extract import (
+    extract_cards, card_to_video, is_block_url, SEARCH_CARD_SELECTOR, RELATED_CARD_SELECTOR, BLOCK_PAGE_SELECTOR
+)
+from app.services.browser_context import scraping_context
+from app.services.view_lookup import resolve_missing_views, store_views
+from app.services import http_collector
+from app.services.http_collector import HttpExtractError
+from app.services.throttle import get_target
+from app.core.config import settings
+from app.core.metrics import stage, FALLBACKS, RUNS_FINISHED
+from app.services.events import publish_event, video_event_data
+from app.db.session import AsyncSessionLocal
+from app.db.models import Run
+from app.db.bulk import bulk_insert_videos, bulk_insert_templates, template_rows, run_videos_query, video_dict
+from sqlalchemy.ext.asyncio import AsyncSession
+from contextlib import asynccontextmanager, AsyncExitStack
+from datetime import datetime, timezone
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from typing import List, Optional, Tuple
+from urllib.parse import urlencode
 import uuid
 
 logger = logging.getLogger(__name__)
 
-async def collect_youtube_data(run_id: uuid.UUID, keyword: str):
-    db: Session = SessionLocal()
-    run = db.query(Run).filter(Run.id == run_id).first()
+class BlockedPageError(Exception):
+    """YouTube answered with a consent or captcha page instead of results."""
+
+class _SharedLease:
+    """
+    The session of a batch, leased when the first of its runs needs a browser: a batch
+    of http-mode runs that all parse fine never takes a session from the pool.
+    """
+
+    def __init__(self):
+        self._stack = AsyncExitStack()
+        self._lock = asyncio.Lock()
+        self._leased = None
+
+    async def get(self):
+        async with self._lock:
+            if self._leased is None:
+                self._leased = await self._stack.enter_async_context(get_session_pool().lease())
+            return self._leased
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._stack.aclose()
+
+@asynccontextmanager
+async def _scraping_session(leased, hl: str, gl: str, timings: Optional[dict] = None):
+    """Opens a scraping context on the shared session, or on a session leased just for this run."""
+    async with AsyncExitStack() as stack:
+        with stage("open_session", timings):
+            if isinstance(leased, _SharedLease):
+                leased = await leased.get()
+            if leased is None:
+                # Lease a warm AgentBay session (remote browser already connected over CDP)
+                leased = await stack.enter_async_context(get_session_pool().lease())
+            ctx = await stack.enter_async_context(scraping_context(leased, hl, gl))
+        yield ctx
+
+async def collect_youtube_data(run_id: uuid.UUID, keyword: str, leased=None, with_templates: bool = True):
+    """
+    Scrapes one run. `leased` is a session from the pool shared by several runs
+    (see collect_batch); without it the run leases its own.
+    With with_templates=False the videos are saved, the run stays "running" and the
+    collected videos are returned, so the caller can generate templates for many runs at once.
+
+    Each stage (search, related, templates) is committed as soon as it finishes and
+    recorded in runs.stages_completed. If a later stage fails the run ends up "partial"
+    with the earlier results kept, and a retry (job_queue.retry_run) only runs the
+    missing stages: the browser is not opened again if only templates are missing.
+
+    Runs in "http" mode read search and related videos from ytInitialData over plain
+    HTTP (http_collector) and only open the browser for the stages that couldn't be parsed.
+    """
+    db: AsyncSession = AsyncSessionLocal()
+    run = await db.get(Run, run_id)
     if not run:
         logger.error(f"Run {run_id} not found")
-        db.close()
+        await db.close()
         return
 
+    # Tracked locally too: run attributes can't be read back after a rollback on an AsyncSession
+    completed = list(run.stages_completed or [])
+    previous_timings = dict(run.stage_timings or {})
+    run_metrics = dict(run.metrics or {})
+    if completed:
+        logger.info(f"Resuming run {run_id}, already completed: {completed}")
+
     run.status = "running"
-    db.commit()
+    await db.commit()
+    await publish_event(run_id, "status", {"status": "running"})
+
+    # Per-stage durations in ms, stored on the run (also observed in the Prometheus histograms)
+    timings = {}
+    current = None
+
+    async def complete(name: str):
+        completed.append(name)
+        run.stages_completed = list(completed)
+        run.stage_timings = {**previous_timings, **timings}
+        with stage("db_commit", timings):
+            await db.commit()
 
-    agent_service = AgentBayService()
-    
     try:
-        # 1. Start AgentBay Session
-        agent_service.start_session_sync()
-        cdp_url = await agent_service.initialize_browser()
-        
-        async with async_playwright() as p:
-            logger.info("Connecting to remote browser...")
-            browser = await p.chromium.connect_over_cdp(cdp_url)
-            # Create a new context with forced Locale ID
-            context = await browser.new_context(
-                locale="id-ID",
-                timezone_id="Asia/Jakarta",
-                geolocation={"latitude": -6.2088, "longitude": 106.8456},
-                permissions=["geolocation"]
-            )
-            page = await context.new_page()
-            
-            # 2. Go to YouTube (Force ID)
-            logger.info(f"Searching for '{keyword}'...")
-            await page.goto(f"https://www.youtube.com/results?search_query={keyword}&hl=id&gl=ID", wait_until="domcontentloaded")
-            
-            collected_videos = []
-            
-            # --- Helper to extract video data ---
-            async def extract_video_data(element, source_type, rank):
+        # Results of the stages a previous attempt already saved
+        collected_videos = await _load_videos(db, run) if completed else []
+
+        if run.mode == "http" and ("search" not in completed or "related" not in completed):
+            # Browser-free: the same stages from ytInitialData over plain HTTP. Whatever
+            # isn't completed here (blocked, consent page, layout change) is done by the
+            # browser block below, which skips the stages this one saved
+            try:
+                if "search" not in completed:
+                    current = "search"
+                    search_videos = await _http_search_stage(db, run, keyword, timings, run_metrics)
+                    await _save_videos(db, search_videos, timings)
+                    await complete("search")
+                    collected_videos.extend(search_videos)
+
+                if "related" not in completed:
+                    current = "related"
+                    search_top = [v for v in collected_videos if v["source_type"] == "search"]
+                    related_videos = await _http_related_stage(run, search_top, timings)
+                    await _save_videos(db, related_videos, timings)
+                    await complete("related")
+                    collected_videos.extend(related_videos)
+            except HttpExtractError as e:
+                logger.warning(f"HTTP collection of '{keyword}' failed in stage '{current}', falling back to the browser: {e}")
+                FALLBACKS.labels(kind="http_to_browser").inc()
+                run_metrics["http_fallback_stage"] = current
+
+        if "search" not in completed or "related" not in completed:
+            # 1. Fresh lightweight context with forced locale on a warm session:
+            # images/media/fonts/ads are blocked, we only read text from the cards
+            async with _scraping_session(leased, run.hl, run.gl, timings) as (context, blocker):
                 try:
-                    # Generic selectors - adjusted for what typically works on YT Desktop
-                    # Note: Selectors on YT change. Using generalized ones.
-                    
-                    # Title
-                    title_el = await element.query_selector("a#video-title")
-                    if not title_el: return None
-                    title = await title_el.text_content()
-                    video_url = await title_el.get_attribute("href")
-                    if not video_url: return None
-                    if "/watch" not in video_url: return None
-                    
-                    video_id = video_url.split("v=")[1].split("&")[0]
-                    full_url = f"https://www.youtube.com{video_url}"
-                    
-                    # Channel
-                    channel_el = await element.query_selector("#channel-info #text-container") or \
-                                 await element.query_selector(".ytd-channel-name a")
-                    channel_name = await channel_el.text_content() if channel_el else "Unknown"
-                    
-                    # Views - Metadata line usually contains "X views • Y time ago"
-                    meta_el = await element.query_selector("#metadata-line")
-                    views_raw = ""
-                    if meta_el:
-                         spans = await meta_el.query_selector_all("span")
-                         if spans:
-                             views_raw = await spans[0].text_content()
-                    
-                    # If views missing from card, open page (Required by spec)
-                    views_num = parse_views(views_raw)
-                    collected_from = "search"
-                    
-                    if views_num == 0 or not views_raw:
-                        logger.info(f"Views missing for {video_id}, opening watch page...")
-                        # Open new page to check
-                        video_page = await context.new_page()
-                        await video_page.goto(full_url, wait_until="domcontentloaded")
-                        # Try to get views from watch page
-                        # Selector for views on watch page: #info-text #count or #view-count
-                        # Modern YT: #description-inner #info span (often "1.2M views")
-                        try:
-                            # Wait briefly
-                            await video_page.wait_for_selector("#description", timeout=5000)
-                            # Logic to find views
-                            # Try multiple potential selectors
-                            v_el = await video_page.query_selector("ytd-watch-metadata #description-inner #info span")
-                            if v_el:
-                                views_raw = await v_el.text_content()
-                                views_num = parse_views(views_raw)
-                                collected_from = "watch_page"
-                        except:
-                            pass
-                        await video_page.close()
-
-                    return {
-                        "run_id": run_id,
-                        "source_type": source_type,
-                        "rank": rank,
-                        "title": title.strip(),
-                        "channel_name": channel_name.strip(),
-                        "video_id": video_id,
-                        "video_url": full_url,
-                        "views_raw": views_raw.strip(),
-                        "views_num": views_num,
-                        "collected_from": collected_from
-                    }
-                except Exception as e:
-                    logger.error(f"Error extracting video: {e}")
-                    return None
-
-            # 3. Collect Search Results (Top 2)
-            # Wait for results
-            await page.wait_for_selector("ytd-video-renderer", timeout=10000)
-            results = await page.query_selector_all("ytd-video-renderer")
-            
-            search_count = 0
-            for i, res in enumerate(results):
-                if search_count >= 2: break
-                vid_data = await extract_video_data(res, "search", i+1)
-                if vid_data:
-                    collected_videos.append(vid_data)
-                    search_count += 1
-            
-            # 4. Check "People also watched" (Module on Search Page)
-            # This is tricky as it might not exist. It's usually a shelf.
-            # "People also watched" usually appears as a shelf with title "People also watched" or similar.
-            # In ID: "Orang lain juga menonton" ?
-            # User requirement: "If the module is missing: open watch page of search #1"
-            
-            # Let's try to find a shelf with title containing "watched" or assume it's a specific renderer
-            # Assuming we might miss it if we don't know exact ID text.
-            # Strategy: Look for horizontal shelves (ytd-shelf-renderer)
-            
-            # However, simpler fallback might be safer given time constraints. 
-            # If we don't see it, go to fallback.
-            
-            people_watched_found = False
-            # Implementation: Look for specific text or just skip to fallback for MVP reliability?
-            # Let's try to find it.
-            
-            # Fallback logic
-            if not people_watched_found and collected_videos:
-                # Open watch page of #1
-                first_vid = collected_videos[0]
-                logger.info(f"Module missing, using fallback: Opening {first_vid['video_id']}")
-                
-                await page.goto(first_vid['video_url'], wait_until="domcontentloaded")
-                
-                # Collect 2 from "Related/Up next" (ytd-compact-video-renderer)
-                await page.wait_for_selector("ytd-compact-video-renderer", timeout=10000)
-                related = await page.query_selector_all("ytd-compact-video-renderer")
-                
-                related_count = 0
-                for i, res in enumerate(related):
-                    if related_count >= 2: break
-                    # Compact renderer structure is slightly different
-                    # Title: #video-title (span)
-                    try:
-                        title_el = await res.query_selector("#video-title")
-                        title = await title_el.text_content() if title_el else ""
-                        
-                        # Link is on the main a tag
-                        a_el = await res.query_selector("a")
-                        href = await a_el.get_attribute("href")
-                        
-                        if href and "/watch" in href:
-                            vid_id = href.split("v=")[1].split("&")[0]
-                            full_url = f"https://www.youtube.com{href}"
-                            
-                            # Views? ytd-compact-video-renderer #metadata-line span
-                            meta = await res.query_selector("#metadata-line")
-                            v_raw = ""
-                            if meta:
-                                spans = await meta.query_selector_all("span")
-                                if spans: v_raw = await spans[0].text_content() # usually 1st is views
-                                
-                            v_num = parse_views(v_raw)
-                            
-                            collected_videos.append({
-                                "run_id": run_id,
-                                "source_type": "related_fallback",
-                                "rank": i+1,
-                                "title": title.strip(),
-                                "channel_name": "Unknown", # Compact often hides channel name or it's hard to get
-                                "video_id": vid_id,
-                                "video_url": full_url,
-                                "views_raw": v_raw.strip(),
-                                "views_num": v_num,
-                                "collected_from": "watch_page_related"
-                            })
-                            related_count += 1
-                    except:
-                        pass
-
-            # 5. Save to DB
-            for v in collected_videos:
-                db_vid = Video(**v)
-                db.add(db_vid)
-            
-            # 6. Generate Templates
-            from app.services.ai_templates import generate_templates, client # Late import to avoid circular if any
-            from app.db.models import Template
+                    page = await context.new_page()
+
+                    if "search" not in completed:
+                        current = "search"
+                        search_videos = await _search_stage(db, page, context, run, keyword, timings, run_metrics)
+                        # Flush right away (and remember the view counts for later runs),
+                        # so a failure further down keeps the search results
+                        await _save_videos(db, search_videos, timings)
+                        await complete("search")
+                        collected_videos.extend(search_videos)
+
+                    if "related" not in completed:
+                        current = "related"
+                        search_top = [v for v in collected_videos if v["source_type"] == "search"]
+                        related_videos = await _related_stage(page, run_id, search_top, timings)
+                        await _save_videos(db, related_videos, timings)
+                        await complete("related")
+                        collected_videos.extend(related_videos)
+                finally:
+                    # Blocked-request counters of a failed attempt are kept too
+                    run_metrics.update(blocker.stats())
+
+        if not with_templates:
+            run.metrics = run_metrics
+            run.stage_timings = {**previous_timings, **timings}
+            with stage("db_commit", timings):
+                await db.commit()
+            return collected_videos
+
+        # 6. Generate Templates
+        current = "templates"
+        from app.services.ai_templates import generate_templates_cached # Late import to avoid circular if any
+        
+        with stage("generate_templates", timings):
+            templates, run_metrics["template_cache_hit"] = await generate_templates_cached(db, keyword, collected_videos)
+        await bulk_insert_templates(db, run_id, templates)
+
+        run.status = "success"
+        run.finished_at = datetime.now(timezone.utc)
+        run.metrics = run_metrics
+        await complete("templates")
+        RUNS_FINISHED.labels(status="success").inc()
+        await _publish_templates(run_id, templates)
+        await publish_event(run_id, "status", {"status": "success"})
             
-            templates = await generate_templates(keyword, collected_videos)
-            for t in templates:
-                db_tpl = Template(
-                    run_id=run_id,
-                    template_text=t.get("template_text"),
-                    example_1=t.get("example_1"),
-                    example_2=t.get("example_2")
-                )
-                db.add(db_tpl)
+    except Exception as e:
+        logger.error(f"Job failed in stage '{current}': {e}")
+        await db.rollback()
+        # Saved stages stay: the run is partial and can be retried from the failed stage
+        status = "partial" if completed else "failed"
+        error_message = f"Stage '{current}' failed: {e}" if current else str(e)
+        run.status = status
+        run.error_message = error_message
+        run.finished_at = datetime.now(timezone.utc)
+        run.stage_timings = {**previous_timings, **timings}
+        # Failed attempts keep their stats too (view cache, blocked requests, HTTP fallback), merged into earlier attempts' metrics
+        run.metrics = run_metrics
+        await db.commit()
+        RUNS_FINISHED.labels(status=status).inc()
+        await publish_event(run_id, "status", {"status": status, "error_message": error_message})
+    finally:
+        await db.close()
+
+async def _load_videos(db: AsyncSession, run: Run) -> List[dict]:
+    result = await db.execute(run_videos_query(run.id, run.started_at))
+    videos = [video_dict(v) for v in result.scalars().all()]
+    videos.sort(key=lambda v: (v["source_type"] != "search", v["rank"]))
+    return videos
+
+async def _save_videos(db: AsyncSession, videos: List[dict], timings: dict):
+    with stage("db_insert_videos", timings):
+        await store_views(db, videos)
+        await bulk_insert_videos(db, videos)
+
+async def _load_page(page, url: str, ready_selector: str, name: str, timings: dict):
+    """
+    Opens `url` and waits for `ready_selector`, as one request to the "youtube" throttle
+    target: a consent/captcha page fails right away instead of after the full timeout,
+    and counts (like a timeout) towards the target's concurrency limit and breaker.
+    """
+    async with get_target("youtube").guard(throttled=(BlockedPageError, PlaywrightTimeoutError)):
+        with stage(f"{name}_goto", timings):
+            await page.goto(url, wait_until="domcontentloaded")
+        if is_block_url(page.url):
+            raise BlockedPageError(f"Redirected to {page.url}")
+        with stage(f"{name}_wait_selector", timings):
+            found = await page.wait_for_selector(f"{ready_selector}, {BLOCK_PAGE_SELECTOR}", timeout=settings.PAGE_READY_TIMEOUT)
+        if not await found.evaluate("(el, selector) => el.matches(selector)", ready_selector):
+            raise BlockedPageError(f"Consent or captcha page at {page.url}")
+
+async def _search_stage(db: AsyncSession, page, context, run: Run, keyword: str, timings: dict, run_metrics: dict) -> List[dict]:
+    # 2. Go to YouTube (Force ID)
+    logger.info(f"Searching for '{keyword}'...")
+    # URL-encoded: keywords with "&", "#", "+" or non-ASCII text must not break the query string
+    query = urlencode({"search_query": keyword, "hl": run.hl, "gl": run.gl})
+    await _load_page(page, f"{settings.YOUTUBE_BASE_URL}/results?{query}", SEARCH_CARD_SELECTOR, "search", timings)
+    
+    videos = []
+    
+    # 3. Collect Search Results (Top 2)
+    # Read every card in a single page.evaluate round-trip
+    with stage("search_extract", timings):
+        results = await extract_cards(page, SEARCH_CARD_SELECTOR)
+    
+    for i, card in enumerate(results):
+        if len(videos) >= 2: break
+        vid_data = card_to_video(card, run.id, "search", i+1, "search")
+        if vid_data and vid_data["title"]:
+            videos.append(vid_data)
+
+    # Views are filled in below; stream the cards right away anyway (views may still be null)
+    for vid_data in videos:
+        await publish_event(run.id, "video", video_event_data(vid_data))
+
+    # If views missing from a card, use the view cache or open the watch pages (Required by spec)
+    with stage("view_lookup", timings):
+        run_metrics.update(await resolve_missing_views(db, context, videos))
+    return videos
 
+async def _related_stage(page, run_id: uuid.UUID, search_videos: List[dict], timings: dict) -> List[dict]:
+    # 4. Check "People also watched" (Module on Search Page)
+    # This is tricky as it might not exist. It's usually a shelf.
+    # "People also watched" usually appears as a shelf with title "People also watched" or similar.
+    # In ID: "Orang lain juga menonton" ?
+    # User requirement: "If the module is missing: open watch page of search #1"
+    
+    # Let's try to find a shelf with title containing "watched" or assume it's a specific renderer
+    # Assuming we might miss it if we don't know exact ID text.
+    # Strategy: Look for horizontal shelves (ytd-shelf-renderer)
+    
+    # However, simpler fallback might be safer given time constraints. 
+    # If we don't see it, go to fallback.
+    
+    people_watched_found = False
+    # Implementation: Look for specific text or just skip to fallback for MVP reliability?
+    # Let's try to find it.
+    
+    videos = []
+    # Fallback logic
+    if not people_watched_found and search_videos:
+        # Open watch page of #1
+        first_vid = search_videos[0]
+        logger.info(f"Module missing, using fallback: Opening {first_vid['video_id']}")
+        FALLBACKS.labels(kind="related_watch_page").inc()
+        
+        await _load_page(page, first_vid['video_url'], RELATED_CARD_SELECTOR, "related", timings)
+        
+        # Collect 2 from "Related/Up next" (ytd-compact-video-renderer)
+        with stage("related_extract", timings):
+            related = await extract_cards(page, RELATED_CARD_SELECTOR)
+        
+        for i, card in enumerate(related):
+            if len(videos) >= 2: break
+            vid_data = card_to_video(card, run_id, "related_fallback", i+1, "watch_page_related")
+            if vid_data:
+                videos.append(vid_data)
+                await publish_event(run_id, "video", video_event_data(vid_data))
+    return videos
+
+async def _http_search_stage(db: AsyncSession, run: Run, keyword: str, timings: dict, run_metrics: dict) -> List[dict]:
+    logger.info(f"Searching for '{keyword}' over HTTP...")
+    videos = await http_collector.search_videos(run.id, keyword, run.hl, run.gl, timings)
+    for vid_data in videos:
+        await publish_event(run.id, "video", video_event_data(vid_data))
+
+    async def fetch_views(video_url: str) -> Optional[str]:
+        return await http_collector.fetch_watch_page_views(video_url, run.hl, run.gl)
+
+    with stage("view_lookup", timings):
+        run_metrics.update(await resolve_missing_views(db, None, videos, fetch_views=fetch_views))
+    return videos
+
+async def _http_related_stage(run: Run, search_videos: List[dict], timings: dict) -> List[dict]:
+    # No "People also watched" shelf in ytInitialData of the search page either: watch page of #1
+    if not search_videos:
+        return []
+    FALLBACKS.labels(kind="related_watch_page").inc()
+    videos = await http_collector.related_videos(run.id, search_videos[0]["video_url"], run.hl, run.gl, timings)
+    for vid_data in videos:
+        await publish_event(run.id, "video", video_event_data(vid_data))
+    return videos
+
+async def _publish_templates(run_id: uuid.UUID, templates: list):
+    for row in template_rows(run_id, templates):
+        await publish_event(run_id, "template", {k: v for k, v in row.items() if k != "run_id"})
+
+async def collect_batch(jobs: List[Tuple[uuid.UUID, str]], parallelism: int, run_tasks: Optional[dict] = None):
+    """
+    Scrapes several runs through one leased session, `parallelism` browser contexts at a time,
+    then generates all their templates with batched multi-keyword prompts.
+    Each run is scraped in its own task, registered in `run_tasks` (run id -> task): the
+    worker cancels only the runs whose lease it lost and removes them from it, and those
+    are left out of the template step.
+    """
+    if run_tasks is None:
+        run_tasks = dict.fromkeys(run_id for run_id, _ in jobs)
+    # Runs whose lease was already lost are not started
+    jobs = [(run_id, keyword) for run_id, keyword in jobs if run_id in run_tasks]
+    semaphore = asyncio.Semaphore(max(1, parallelism))
+    async with _SharedLease() as leased:
+        async def run_one(run_id: uuid.UUID, keyword: str):
+            async with semaphore:
+                return await collect_youtube_data(run_id, keyword, leased=leased, with_templates=False)
+
+        for run_id, keyword in jobs:
+            run_tasks[run_id] = asyncio.create_task(run_one(run_id, keyword))
+        tasks = [run_tasks[run_id] for run_id, _ in jobs]
+        # A cancelled run must not take the others down with it
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    scraped = [
+        (run_id, keyword, videos) for (run_id, keyword), videos in zip(jobs, results)
+        if isinstance(videos, list) and run_id in run_tasks
+    ]
+    if scraped:
+        await _finish_batch_templates(scraped)
+
+async def _finish_batch_templates(scraped: List[Tuple[uuid.UUID, str, list]]):
+    from app.services.ai_templates import generate_templates_batch_cached # Late import to avoid circular if any
+
+    db: AsyncSession = AsyncSessionLocal()
+    try:
+        # One shared template step: every run in the batch gets its duration
+        timings = {}
+        with stage("generate_templates_batch", timings):
+            templates, hits = await generate_templates_batch_cached(db, {keyword: videos for _, keyword, videos in scraped})
+        done = [(run_id, keyword) for run_id, keyword, _ in scraped if keyword in templates]
+        failed = [run_id for run_id, keyword, _ in scraped if keyword not in templates]
+        error_message = "Stage 'templates' failed: no valid templates generated"
+        for run_id, keyword in done:
+            await bulk_insert_templates(db, run_id, templates[keyword])
+            run = await db.get(Run, run_id)
             run.status = "success"
-            run.finished_at = datetime.utcnow()
-            db.commit()
-            
+            run.finished_at = datetime.now(timezone.utc)
+            run.metrics = {**(run.metrics or {}), "template_cache_hit": hits.get(keyword, False), "template_batched": True}
+            run.stage_timings = {**(run.stage_timings or {}), **timings}
+            run.stages_completed = [*(run.stages_completed or []), "templates"]
+        for run_id in failed:
+            # Videos are saved: partial, retryable for the templates alone
+            run = await db.get(Run, run_id)
+            run.status = "partial"
+            run.finished_at = datetime.now(timezone.utc)
+            run.error_message = error_message
+            run.stage_timings = {**(run.stage_timings or {}), **timings}
+        with stage("db_commit"):
+            await db.commit()
+        RUNS_FINISHED.labels(status="success").inc(len(done))
+        RUNS_FINISHED.labels(status="partial").inc(len(failed))
+        for run_id, keyword in done:
+            await _publish_templates(run_id, templates[keyword])
+            await publish_event(run_id, "status", {"status": "success"})
+        for run_id in failed:
+            await publish_event(run_id, "status", {"status": "partial", "error_message": error_message})
     except Exception as e:
-        logger.error(f"Job failed: {e}")
-        run.status = "failed"
-        run.error_message = str(e)
-        db.commit()
+        logger.error(f"Batch template step failed: {e}")
+        await db.rollback()
+        # Videos of every run here are already saved: partial, retryable for the templates alone
+        error_message = f"Stage 'templates' failed: {e}"
+        for run_id, _, _ in scraped:
+            run = await db.get(Run, run_id)
+            run.status = "partial"
+            run.finished_at = datetime.now(timezone.utc)
+            run.error_message = error_message
+        await db.commit()
+        RUNS_FINISHED.labels(status="partial").inc(len(scraped))
+        for run_id, _, _ in scraped:
+            await publish_event(run_id, "status", {"status": "partial", "error_message": error_message})
     finally:
-        agent_service.close_session()
-        db.close()
+        await db.close()
@@ -0,0 +1,43 @@
+import re
+import unicodedata
+from typing import Tuple
+
+_WHITESPACE = re.compile(r"\s+")
+# Zero-width characters that sneak in from copy/paste and mobile keyboards
+_INVISIBLE = re.compile("[\u200b\u200c\u200d\u2060\ufeff]")
+
+def normalize_keyword(keyword: str) -> str:
+    """
+    Canonical form of a search keyword, used as runs.keyword_key to detect duplicate
+    collections and as the keyword cache key (together with hl/gl, see normalize_locale).
+    Unicode NFKC (full-width letters, ligatures, non-breaking spaces), zero-width
+    characters removed, whitespace collapsed, lowercased.
+    Examples:
+    - "Resep Nasi Goreng " -> "resep nasi goreng"
+    - "resep  nasi goreng" -> "resep nasi goreng"
+    - "ｒｅｓｅｐ nasi goreng" -> "resep nasi goreng"
+    """
+    if not keyword:
+        return ""
+    keyword = _INVISIBLE.sub("", unicodedata.normalize("NFKC", keyword))
+    return _WHITESPACE.sub(" ", keyword).strip().lower()
+
+
+def normalize_locale(hl: str, gl: str) -> Tuple[str, str]:
+    """hl/gl as stored on runs: "ID"/" id" -> ("id", "ID")."""
+    return (hl or "").strip().lower(), (gl or "").strip().upper()
+
+
+def trigram_similarity(a: str, b: str) -> float:
+    """Python version of pg_trgm's similarity(), for offline comparisons (see benchmarks/keyword_cache.py)."""
+    def trigrams(s: str) -> set:
+        out = set()
+        for word in re.findall(r"\w+", s.lower()):
+            padded = f"  {word} "
+            out.update(padded[i:i + 3] for i in range(len(padded) - 2))
+        return out
+
+    ta, tb = trigrams(a), trigrams(b)
+    if not ta or not tb:
+        return 0.0
+    return len(ta & tb) / len(ta | tb)
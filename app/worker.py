@@ -0,0 +1,213 @@
+"""
+Collection worker entry point.
+
+Claims queued runs from the `runs` table and executes them, independently of the API:
+
+    python -m app.worker --concurrency 4
+
+Stage latencies and counters are served for Prometheus on WORKER_METRICS_PORT.
+
+Run as many worker processes (on as many nodes) as needed; they coordinate
+through row locks and leases in Postgres.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import uuid
+from prometheus_client import start_http_server
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.services import job_queue, throttle
+from app.services.session_pool import get_session_pool
+from app.services.http_collector import close_http_client
+from app.services.retention import run_retention
+from app.services.cache_warmer import run_warmer
+from app.services.youtube_collector import collect_youtube_data, collect_batch
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+async def _with_db(fn, *args):
+    async with AsyncSessionLocal() as db:
+        return await fn(db, *args)
+
+
+class Worker:
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        # task -> concurrency slots it takes: a batch takes one per run (one browser context each)
+        self._jobs = {}
+        self._stopping = asyncio.Event()
+
+    def stop(self):
+        if not self._stopping.is_set():
+            logger.info("Shutdown requested, finishing in-flight jobs...")
+            self._stopping.set()
+
+    async def _sleep(self, seconds: float):
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    def _free_slots(self) -> int:
+        return self.concurrency - sum(self._jobs.values())
+
+    async def _claim(self, free_slots: int):
+        """Returns ([(run_id, keyword), ...], parallelism) or None if the queue is empty."""
+        run = await _with_db(job_queue.claim_next_run, self.worker_id)
+        if not run:
+            return None
+        jobs = [(run.id, run.keyword)]
+        parallelism = 1
+        if run.batch_id:
+            # Batch runs share one browser session: take up to `parallelism` of them together,
+            # but no more than the free slots
+            parallelism = min(await _with_db(job_queue.get_batch_parallelism, run.batch_id), free_slots)
+            more = await _with_db(job_queue.claim_batch_runs, self.worker_id, run.batch_id, parallelism - 1)
+            jobs += [(r.id, r.keyword) for r in more]
+        return jobs, parallelism
+
+    async def _heartbeat(self, run_tasks: dict):
+        """
+        Extends the leases of the runs in `run_tasks` (run id -> task running it). A run
+        whose lease was lost is dropped from it and only its own task is cancelled.
+        """
+        while run_tasks:
+            await asyncio.sleep(settings.JOB_HEARTBEAT_INTERVAL)
+            run_ids = list(run_tasks)
+            try:
+                lost = await _with_db(job_queue.heartbeat, run_ids, self.worker_id)
+            except Exception as e:
+                logger.error(f"Heartbeat for runs {run_ids} failed: {e}")
+                continue
+            if lost:
+                logger.warning(f"Lost lease on runs {lost}, cancelling them")
+            for run_id in lost:
+                task = run_tasks.pop(run_id, None)
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def _process(self, jobs, parallelism: int):
+        run_ids = [run_id for run_id, _ in jobs]
+        logger.info(f"Worker {self.worker_id} picked up {len(jobs)} run(s): {[k for _, k in jobs]}")
+        # run id -> task running it; a batch fills in one task per run (see collect_batch)
+        run_tasks = {run_ids[0]: asyncio.current_task()} if len(jobs) == 1 else dict.fromkeys(run_ids)
+        heartbeat = asyncio.create_task(self._heartbeat(run_tasks))
+        try:
+            if len(jobs) == 1:
+                await collect_youtube_data(*jobs[0])
+            else:
+                await collect_batch(jobs, parallelism, run_tasks)
+        except asyncio.CancelledError:
+            logger.warning(f"Runs {run_ids} cancelled")
+        except Exception as e:
+            logger.error(f"Runs {run_ids} crashed: {e}")
+        finally:
+            heartbeat.cancel()
+
+    async def _reap(self):
+        """Periodically requeues runs whose worker stopped heartbeating."""
+        while not self._stopping.is_set():
+            try:
+                count = await _with_db(job_queue.requeue_expired)
+                if count:
+                    logger.info(f"Requeued {count} expired run(s)")
+            except Exception as e:
+                logger.error(f"Requeue pass failed: {e}")
+            await self._sleep(settings.JOB_LEASE_SECONDS / 2)
+
+    async def _maintain(self):
+        """Periodically creates upcoming run_videos partitions and applies retention."""
+        while not self._stopping.is_set():
+            try:
+                stats = await run_retention()
+                if stats.get("created") or stats.get("expired"):
+                    logger.info(f"Retention pass: {stats}")
+            except Exception as e:
+                logger.error(f"Retention pass failed: {e}")
+            await self._sleep(settings.RETENTION_INTERVAL)
+
+    async def _warm(self):
+        """Periodically enqueues refreshes for popular keywords whose cache is about to go stale."""
+        while not self._stopping.is_set():
+            try:
+                stats = await run_warmer()
+                if stats.get("enqueued") or stats.get("skipped_budget"):
+                    logger.info(f"Cache warmer pass: {stats}")
+            except Exception as e:
+                logger.error(f"Cache warmer pass failed: {e}")
+            await self._sleep(settings.WARMER_INTERVAL)
+
+    async def run(self):
+        logger.info(f"Worker {self.worker_id} starting (concurrency={self.concurrency})")
+        pool = get_session_pool()
+        await pool.start()
+        reaper = asyncio.create_task(self._reap())
+        maintenance = asyncio.create_task(self._maintain()) if settings.RETENTION_ENABLED else None
+        warmer = asyncio.create_task(self._warm()) if settings.WARMER_ENABLED else None
+        try:
+            while not self._stopping.is_set():
+                free_slots = self._free_slots()
+                if free_slots <= 0:
+                    await asyncio.wait(self._jobs, return_when=asyncio.FIRST_COMPLETED)
+                    continue
+                if throttle.blocking_breaker() is not None:
+                    # YouTube or AgentBay is pushing back: leave runs queued (for this worker, or
+                    # others whose breakers are closed) until the cooldown allows a probe
+                    await self._sleep(settings.WORKER_POLL_INTERVAL)
+                    continue
+                try:
+                    claimed = await self._claim(free_slots)
+                except Exception as e:
+                    logger.error(f"Claiming a run failed: {e}")
+                    claimed = None
+                if not claimed:
+                    await self._sleep(settings.WORKER_POLL_INTERVAL)
+                    continue
+                task = asyncio.create_task(self._process(*claimed))
+                self._jobs[task] = len(claimed[0])
+                task.add_done_callback(lambda t: self._jobs.pop(t, None))
+        finally:
+            reaper.cancel()
+            if maintenance is not None:
+                maintenance.cancel()
+            if warmer is not None:
+                warmer.cancel()
+            if self._jobs:
+                await asyncio.gather(*self._jobs, return_exceptions=True)
+            await pool.close()
+            await close_http_client()
+            logger.info(f"Worker {self.worker_id} stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run YouTube collection jobs from the queue.")
+    parser.add_argument("--concurrency", type=int, default=settings.WORKER_CONCURRENCY)
+    parser.add_argument("--metrics-port", type=int, default=settings.WORKER_METRICS_PORT)
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        # The collection stages run here, not in the API process: expose them separately
+        start_http_server(args.metrics_port)
+
+    async def _run():
+        worker = Worker(concurrency=args.concurrency)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, worker.stop)
+        await worker.run()
+
+    asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark: per-element Playwright extraction vs one page.evaluate per page.
+
+Loads the saved HTML fixtures into a local headless Chromium (or a remote browser
+via --cdp-url) and extracts every card with both strategies.
+--rtt-ms adds an artificial delay per CDP round-trip to emulate a remote
+AgentBay browser when running against a local one.
+
+    python -m benchmarks.dom_extraction --iterations 20 --rtt-ms 40
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+from playwright.async_api import async_playwright
+from app.services.dom_extract import extract_cards, parse_video_id, SEARCH_CARD_SELECTOR, RELATED_CARD_SELECTOR
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+class RoundTrips:
+    def __init__(self, rtt_ms: float):
+        self.rtt = rtt_ms / 1000
+        self.count = 0
+
+    async def __call__(self, awaitable):
+        result = await awaitable
+        self.count += 1
+        if self.rtt:
+            await asyncio.sleep(self.rtt)
+        return result
+
+
+async def per_element(page, selector: str, rt: RoundTrips):
+    """The extraction path the collector used before: several awaits per card."""
+    out = []
+    for card in await rt(page.query_selector_all(selector)):
+        title_el = await rt(card.query_selector("#video-title"))
+        title = await rt(title_el.text_content()) if title_el else ""
+        link_el = await rt(card.query_selector("a#video-title[href]")) or await rt(card.query_selector("a[href*='/watch']"))
+        href = await rt(link_el.get_attribute("href")) if link_el else None
+        channel_el = await rt(card.query_selector("#channel-info #text-container")) or \
+            await rt(card.query_selector("#channel-name #text"))
+        channel = await rt(channel_el.text_content()) if channel_el else ""
+        meta = await rt(card.query_selector("#metadata-line"))
+        spans = await rt(meta.query_selector_all("span")) if meta else []
+        views = await rt(spans[0].text_content()) if spans else ""
+        out.append({"title": title.strip(), "href": href, "channel": channel.strip(), "views": views})
+    return out
+
+
+async def single_evaluate(page, selector: str, rt: RoundTrips):
+    return await rt(extract_cards(page, selector))
+
+
+async def bench(page, fn, selector, iterations, rtt_ms):
+    timings, trips, cards = [], 0, []
+    for _ in range(iterations):
+        rt = RoundTrips(rtt_ms)
+        started = time.perf_counter()
+        cards = await fn(page, selector, rt)
+        timings.append((time.perf_counter() - started) * 1000)
+        trips = rt.count
+    return {
+        "mean_ms": round(statistics.mean(timings), 2),
+        "p50_ms": round(statistics.median(timings), 2),
+        "round_trips": trips,
+        "video_ids": [parse_video_id(c["href"]) for c in cards],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="simulated latency per CDP round-trip")
+    parser.add_argument("--cdp-url", help="benchmark against an existing browser instead of a local one")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {}
+    async with async_playwright() as p:
+        if args.cdp_url:
+            browser = await p.chromium.connect_over_cdp(args.cdp_url)
+        else:
+            browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+        for fixture, selector in (("search.html", SEARCH_CARD_SELECTOR), ("watch.html", RELATED_CARD_SELECTOR)):
+            await page.set_content((FIXTURES / fixture).read_text(encoding="utf-8"))
+            legacy = await bench(page, per_element, selector, args.iterations, args.rtt_ms)
+            batched = await bench(page, single_evaluate, selector, args.iterations, args.rtt_ms)
+            assert legacy.pop("video_ids") == batched.pop("video_ids"), f"{fixture}: strategies disagree"
+            results[fixture] = {
+                "per_element": legacy,
+                "single_evaluate": batched,
+                "speedup": round(legacy["mean_ms"] / max(batched["mean_ms"], 0.001), 1),
+            }
+        await browser.close()
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+"""
+Bulk export vs one /collect/status call per run, against a running API.
+
+Exports the runs of the last --days days with /export/videos in each --formats
+format and reports time to first byte, total time, bytes and rows, plus the
+peak RSS of the API process when --api-pid is given (Linux only): it should
+not grow with the size of the export. Then fetches the status of up to
+--status-runs of those runs one by one, which is what the export replaces.
+
+    python -m benchmarks.export_stream --days 30 --api-pid $(pgrep -f "uvicorn app.main")
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import httpx
+
+
+def _rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+class RssSampler:
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _rss_mb(self.pid))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.baseline = _rss_mb(self.pid)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+async def export(client: httpx.AsyncClient, fmt: str, since: str) -> dict:
+    started = time.perf_counter()
+    first_byte = None
+    size = 0
+    newlines = 0
+    async with client.stream("GET", "/export/videos", params={"format": fmt, "since": since}) as resp:
+        resp.raise_for_status()
+        async for chunk in resp.aiter_bytes():
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            size += len(chunk)
+            newlines += chunk.count(b"\n")
+    result = {
+        "ttfb_ms": round((first_byte or 0) * 1000, 1),
+        "total_s": round(time.perf_counter() - started, 2),
+        "mb": round(size / 1024 / 1024, 2),
+    }
+    if fmt == "ndjson":
+        result["rows"] = newlines
+    return result
+
+
+async def status_per_run(client: httpx.AsyncClient, since: str, limit: int) -> dict:
+    run_ids = []
+    async with client.stream("GET", "/export/runs", params={"since": since, "status": "success"}) as resp:
+        resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            if line:
+                run_ids.append(json.loads(line)["run_id"])
+            if len(run_ids) >= limit:
+                break
+    started = time.perf_counter()
+    for run_id in run_ids:
+        (await client.get(f"/collect/status/{run_id}")).raise_for_status()
+    return {"runs": len(run_ids), "total_s": round(time.perf_counter() - started, 2)}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000/api")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--formats", nargs="+", default=["ndjson", "csv", "parquet"])
+    parser.add_argument("--api-pid", type=int, help="sample this process's RSS during each export")
+    parser.add_argument("--status-runs", type=int, default=500, help="runs fetched one by one for comparison")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    since = (datetime.now(timezone.utc) - timedelta(days=args.days)).isoformat()
+    results = {}
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=None) as client:
+        for fmt in args.formats:
+            if args.api_pid:
+                with RssSampler(args.api_pid) as rss:
+                    results[fmt] = await export(client, fmt, since)
+                results[fmt]["api_rss_baseline_mb"] = round(rss.baseline, 1)
+                results[fmt]["api_rss_peak_mb"] = round(rss.peak, 1)
+            else:
+                results[fmt] = await export(client, fmt, since)
+        if args.status_runs:
+            results["status_per_run"] = await status_per_run(client, since, args.status_runs)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
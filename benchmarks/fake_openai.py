@@ -0,0 +1,92 @@
+"""
+Fake OpenAI-compatible server for local runs and benchmarks.
+
+    FAKE_OPENAI_LATENCY_MS=800 FAKE_OPENAI_429_RATE=0.1 \\
+        uvicorn benchmarks.fake_openai:app --port 8100
+    OPENAI_BASE_URL=http://localhost:8100/v1 python -m app.worker
+
+Answers /v1/chat/completions with a JSON array of templates (or an object keyed
+by keyword for batched prompts), injects latency,
+429s and 5xx at the configured rates, and counts requests on GET /stats.
+"""
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from collections import Counter
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+LATENCY_MS = float(os.getenv("FAKE_OPENAI_LATENCY_MS", "300"))
+RATE_429 = float(os.getenv("FAKE_OPENAI_429_RATE", "0"))
+RATE_5XX = float(os.getenv("FAKE_OPENAI_5XX_RATE", "0"))
+
+app = FastAPI(title="Fake OpenAI")
+stats = Counter()
+
+
+def fake_templates(n: int = 10):
+    return [
+        {
+            "template_text": f"[Jumlah] Cara [Topik] yang Jarang Diketahui #{i + 1}",
+            "example_1": f"{i + 3} Cara Membuat Nasi Goreng yang Jarang Diketahui",
+            "example_2": f"{i + 5} Cara Merawat Kucing yang Jarang Diketahui",
+        }
+        for i in range(n)
+    ]
+
+
+def completion_content(messages) -> str:
+    """An array of templates, or an object keyed by keyword for batched multi-keyword prompts."""
+    prompt = messages[-1].get("content", "") if messages else ""
+    for line in prompt.splitlines():
+        line = line.strip()
+        if line.startswith("{"):
+            try:
+                keywords = json.loads(line)
+            except ValueError:
+                break
+            return json.dumps({k: fake_templates() for k in keywords}, ensure_ascii=False)
+    return json.dumps(fake_templates(), ensure_ascii=False)
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    await asyncio.sleep(LATENCY_MS / 1000 * random.uniform(0.5, 1.5))
+
+    roll = random.random()
+    if roll < RATE_429:
+        stats["429"] += 1
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+            status_code=429,
+            headers={"retry-after": "1"},
+        )
+    if roll < RATE_429 + RATE_5XX:
+        stats["5xx"] += 1
+        return JSONResponse({"error": {"message": "Server error", "type": "server_error"}}, status_code=503)
+
+    content = completion_content(body.get("messages", []))
+    prompt_chars = sum(len(m.get("content") or "") for m in body.get("messages", []))
+    stats["ok"] += 1
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_chars // 4,
+            "completion_tokens": len(content) // 4,
+            "total_tokens": (prompt_chars + len(content)) // 4,
+        },
+    }
+
+
+@app.get("/stats")
+def get_stats():
+    return dict(stats)
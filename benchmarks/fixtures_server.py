@@ -0,0 +1,64 @@
+"""
+Serves the recorded YouTube pages in benchmarks/fixtures/ over HTTP, so the collector
+can run against YOUTUBE_BASE_URL=http://127.0.0.1:<port> without touching youtube.com.
+
+    python -m benchmarks.fixtures_server --port 8200
+
+/results returns search.html and /watch returns watch.html, whatever the query string.
+--latency-ms delays every response to emulate a real page load.
+"""
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+FIXTURES = Path(__file__).parent / "fixtures"
+ROUTES = {"/results": "search.html", "/watch": "watch.html"}
+
+
+def make_handler(latency_ms: float = 0.0):
+    pages = {path: (FIXTURES / name).read_bytes() for path, name in ROUTES.items()}
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = pages.get(urlsplit(self.path).path)
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            if body is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FixtureHandler
+
+
+def start_fixture_server(port: int = 0, latency_ms: float = 0.0) -> ThreadingHTTPServer:
+    """Starts the server in a daemon thread; the base URL is http://127.0.0.1:{server.server_port}."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency_ms))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.latency_ms))
+    print(f"Serving fixtures on http://127.0.0.1:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
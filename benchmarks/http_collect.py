@@ -0,0 +1,94 @@
+"""
+Benchmark: browser extraction vs ytInitialData over HTTP for the same pages.
+
+Serves benchmarks/fixtures locally and, per page, times
+  - browser: page.goto + wait_for_selector + extract_cards in a local headless Chromium
+    (or a remote browser via --cdp-url), like the browser collector
+  - http: pooled httpx fetch + ytInitialData parse, like app.services.http_collector
+and checks that both return the same videos in the same order.
+--page-latency-ms delays every fixture response to emulate youtube.com.
+
+    python -m benchmarks.http_collect --iterations 20 --page-latency-ms 300
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from playwright.async_api import async_playwright
+from app.services import http_collector
+from app.services.dom_extract import extract_cards, parse_video_id, SEARCH_CARD_SELECTOR, RELATED_CARD_SELECTOR
+from benchmarks.fixtures_server import start_fixture_server
+
+PAGES = (
+    ("search", "/results?search_query=nasi+goreng", SEARCH_CARD_SELECTOR, http_collector.search_cards),
+    ("watch", "/watch?v=PtYgjmUhBel", RELATED_CARD_SELECTOR, http_collector.related_cards),
+)
+
+
+async def browser_extract(page, url: str, selector: str):
+    await page.goto(url, wait_until="domcontentloaded")
+    await page.wait_for_selector(selector, timeout=10000)
+    return await extract_cards(page, selector)
+
+
+async def http_extract(url: str, cards_fn):
+    return cards_fn(await http_collector.fetch_initial_data(url, "id", "ID"))
+
+
+async def bench(fn, iterations: int):
+    timings, cards = [], []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        cards = await fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "mean_ms": round(statistics.mean(timings), 2),
+        "p50_ms": round(statistics.median(timings), 2),
+        # Non-video cards (shorts in the DOM) have no watch link on either path
+        "video_ids": [vid for vid in (parse_video_id(c["href"]) for c in cards) if vid],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--page-latency-ms", type=float, default=0.0, help="delay added to every fixture page")
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--cdp-url", help="benchmark against an existing browser instead of a local one")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    fixtures = start_fixture_server(args.port, args.page_latency_ms)
+    base = f"http://127.0.0.1:{args.port}"
+    results = {}
+    try:
+        async with async_playwright() as p:
+            if args.cdp_url:
+                browser = await p.chromium.connect_over_cdp(args.cdp_url)
+            else:
+                browser = await p.chromium.launch(headless=True)
+            page = await browser.new_page()
+            for name, path, selector, cards_fn in PAGES:
+                url = base + path
+                via_browser = await bench(lambda: browser_extract(page, url, selector), args.iterations)
+                via_http = await bench(lambda: http_extract(url, cards_fn), args.iterations)
+                assert via_browser.pop("video_ids") == via_http.pop("video_ids"), f"{name}: browser and http disagree"
+                results[name] = {
+                    "browser": via_browser,
+                    "http": via_http,
+                    "speedup": round(via_browser["mean_ms"] / max(via_http["mean_ms"], 0.001), 1),
+                }
+            await browser.close()
+    finally:
+        await http_collector.close_http_client()
+        fixtures.shutdown()
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
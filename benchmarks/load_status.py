@@ -0,0 +1,81 @@
+"""
+Load test: latency of GET /collect/status while collections are running.
+
+Starts N collections (force_refresh, so each one really runs on the workers)
+and polls their status endpoints with C concurrent clients until all runs
+finish or the duration elapses, then prints p50/p95/p99 latencies.
+
+    python -m benchmarks.load_status --base-url http://localhost:8000/api --collections 20
+"""
+import argparse
+import asyncio
+import json
+import time
+import httpx
+
+TERMINAL = {"success", "failed", "partial"}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def start_collections(client: httpx.AsyncClient, count: int, keyword: str):
+    job_ids = []
+    for i in range(count):
+        resp = await client.post("/collect/youtube", json={"keyword": f"{keyword} {i}", "force_refresh": True})
+        resp.raise_for_status()
+        job_ids.append(resp.json()["job_id"])
+    return job_ids
+
+
+async def poll(client: httpx.AsyncClient, job_ids, deadline: float, latencies: list, done: set):
+    i = 0
+    while time.monotonic() < deadline and len(done) < len(job_ids):
+        job_id = job_ids[i % len(job_ids)]
+        i += 1
+        started = time.perf_counter()
+        resp = await client.get(f"/collect/status/{job_id}")
+        latencies.append((time.perf_counter() - started) * 1000)
+        if resp.status_code == 200 and resp.json()["status"] in TERMINAL:
+            done.add(job_id)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000/api")
+    parser.add_argument("--collections", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=50, help="concurrent status pollers")
+    parser.add_argument("--duration", type=float, default=300.0, help="max seconds to poll")
+    parser.add_argument("--keyword", default="load test")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as client:
+        job_ids = await start_collections(client, args.collections, args.keyword)
+        latencies, done = [], set()
+        deadline = time.monotonic() + args.duration
+        await asyncio.gather(*(poll(client, job_ids, deadline, latencies, done) for _ in range(args.clients)))
+
+    results = {
+        "collections": args.collections,
+        "finished": len(done),
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies, default=0.0), 2),
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
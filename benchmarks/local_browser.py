@@ -0,0 +1,87 @@
+"""
+Local stand-in for AgentBayService: launches a headless Chromium with
+--remote-debugging-port and hands its CDP URL to the session pool, so the
+collector runs unchanged (connect_over_cdp, contexts, routing) without AgentBay.
+
+    pool = SessionPool(..., service_factory=lambda: LocalBrowserService(chromium_path))
+"""
+import asyncio
+import logging
+import shutil
+import subprocess
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class LocalSession:
+    def __init__(self):
+        self.session_id = f"local-{uuid.uuid4().hex[:8]}"
+
+
+class LocalBrowserService:
+    """Same interface as AgentBayService (start_session / initialize_browser / close_session_async)."""
+
+    def __init__(self, executable: str, startup_timeout: float = 20.0):
+        self.executable = executable
+        self.startup_timeout = startup_timeout
+        self.session = None
+        self.process = None
+        self._profile_dir = None
+
+    def start_session_sync(self):
+        self._profile_dir = tempfile.mkdtemp(prefix="bench-chromium-")
+        self.process = subprocess.Popen(
+            [
+                self.executable,
+                "--headless=new",
+                "--remote-debugging-port=0",  # Chromium picks a free port and writes it to DevToolsActivePort
+                f"--user-data-dir={self._profile_dir}",
+                "--no-first-run",
+                "--no-default-browser-check",
+                "--disable-gpu",
+                "--no-sandbox",
+                "about:blank",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        self.session = LocalSession()
+        return self.session
+
+    async def start_session(self):
+        return await asyncio.to_thread(self.start_session_sync)
+
+    async def initialize_browser(self):
+        if not self.session:
+            raise Exception("Session not started")
+        port_file = Path(self._profile_dir) / "DevToolsActivePort"
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise Exception(f"Local Chromium exited with code {self.process.returncode}")
+            if port_file.exists():
+                lines = port_file.read_text().splitlines()
+                if lines and lines[0].isdigit():
+                    return f"http://127.0.0.1:{lines[0]}"
+            await asyncio.sleep(0.05)
+        raise Exception("Local Chromium did not open a debugging port in time")
+
+    def close_session(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self._profile_dir:
+            shutil.rmtree(self._profile_dir, ignore_errors=True)
+        self.session = None
+        self.process = None
+        self._profile_dir = None
+
+    async def close_session_async(self):
+        await asyncio.to_thread(self.close_session)
@@ -0,0 +1,100 @@
+"""
+Simulated throttling: fixed concurrency vs the AIMD limiter + circuit breaker of
+app/services/throttle.py against a fake target.
+
+The fake target serves up to --capacity concurrent page loads in --latency-ms.
+Beyond that it starts blocking: loads burn the full --timeout-ms and fail, the
+way wait_for_selector does on a consent/captcha page. From --outage-start for
+--outage seconds it blocks everything. Reports completed loads, failed loads and
+seconds spent waiting on timeouts for each strategy.
+
+    python -m benchmarks.throttle_sim --workers 16 --capacity 4 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import time
+from app.services.throttle import Target
+
+
+class Blocked(Exception):
+    pass
+
+
+class FakeTarget:
+    def __init__(self, capacity: int, latency: float, timeout: float, outage_start: float, outage: float):
+        self.capacity = capacity
+        self.latency = latency
+        self.timeout = timeout
+        self.outage_start = outage_start
+        self.outage = outage
+        self.active = 0
+        self.started = time.monotonic()
+
+    async def load(self):
+        elapsed = time.monotonic() - self.started
+        in_outage = self.outage_start <= elapsed < self.outage_start + self.outage
+        self.active += 1
+        try:
+            if in_outage or self.active > self.capacity:
+                await asyncio.sleep(self.timeout)
+                raise Blocked()
+            await asyncio.sleep(self.latency)
+        finally:
+            self.active -= 1
+
+
+async def simulate(args, guarded: bool) -> dict:
+    fake = FakeTarget(args.capacity, args.latency_ms / 1000, args.timeout_ms / 1000, args.outage_start, args.outage)
+    target = Target("simulated") if guarded else None
+    stats = {"completed": 0, "failed": 0, "timeout_seconds": 0.0}
+    deadline = time.monotonic() + args.duration
+
+    async def one_load():
+        started = time.monotonic()
+        try:
+            if target is None:
+                await fake.load()
+            else:
+                async with target.guard(throttled=(Blocked,)):
+                    await fake.load()
+            stats["completed"] += 1
+        except Blocked:
+            stats["failed"] += 1
+            stats["timeout_seconds"] += time.monotonic() - started
+
+    async def worker():
+        while time.monotonic() < deadline:
+            await one_load()
+
+    await asyncio.gather(*(worker() for _ in range(args.workers)))
+    stats["timeout_seconds"] = round(stats["timeout_seconds"], 1)
+    if target is not None:
+        stats["final"] = target.snapshot()
+    return stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=16, help="concurrent collections wanting page loads")
+    parser.add_argument("--capacity", type=int, default=4, help="concurrent loads the target tolerates")
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--timeout-ms", type=float, default=10000, help="time a blocked load burns (PAGE_READY_TIMEOUT)")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per strategy")
+    parser.add_argument("--outage-start", type=float, default=10.0)
+    parser.add_argument("--outage", type=float, default=5.0, help="seconds the target blocks everything")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {
+        "fixed": await simulate(args, guarded=False),
+        "adaptive": await simulate(args, guarded=True),
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())